@@ -6,29 +6,56 @@ as the backend for the project.
 """
 
 
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
-from fastapi.responses import JSONResponse
 import pandas as pd
+import hashlib
+import numpy as np
 import os
 import pytz
 from datetime import datetime
-import json
+from typing import List
 
-from .mymodules.df_creating import df_creating
+from .mymodules.build_stats import load_reports
+from .mymodules.df_creating import create_new_dataframe
+from .mymodules.refresh import RefreshScheduler, SnapshotWatcher, file_lock
+from .mymodules.response_cache import ResponseCache, choose_encoding
+from .mymodules.search import fold
+from .mymodules.serving import (ServingSnapshot, decode_cursor, encode_cursor,
+                                encode_json)
+from .mymodules.snapshot import memory_report, read_snapshot
 
 app = FastAPI()
 
+# Seconds between two background refreshes of the calendar snapshot
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", 24 * 60 * 60))
+# Maximum random seconds added to or removed from the refresh interval
+REFRESH_JITTER = float(os.environ.get("REFRESH_JITTER", 10 * 60))
+# Number of retries after a failed refresh
+REFRESH_RETRIES = int(os.environ.get("REFRESH_RETRIES", 3))
+# Seconds before the first retry, doubled at every retry
+REFRESH_BACKOFF = float(os.environ.get("REFRESH_BACKOFF", 60))
+# Set to 0 to disable the background refresh
+REFRESH_ENABLED = os.environ.get("REFRESH_ENABLED", "1") == "1"
+# Seconds between two checks for a snapshot published by another worker
+SNAPSHOT_WATCH_INTERVAL = float(os.environ.get("SNAPSHOT_WATCH_INTERVAL", 5))
+# Set to 0 to stop exporting the snapshot as CSV as well
+EXPORT_CSV = os.environ.get("EXPORT_CSV", "1") == "1"
+
 # Add Cross-Origin Resource Sharing (CORS) middleware to the FastAPI app.
 # This middleware allows all origins to access the API endpoints.
-# It also allows credentials, all HTTP methods, and all headers.
+# It also allows credentials, all HTTP methods, and all headers,
+# and exposes the pagination headers to the browser.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all origins
     allow_credentials=True,  # Allow credentials
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    # Let browsers read the pagination headers of /df_show
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -43,36 +70,36 @@ def read_root() -> dict:
     return {"Hello": "World"}
 
 
+final_path_snapshot = 'app/final.feather'
 final_path_csv = 'app/final.csv'
-final_urls_dataframe = pd.read_csv(final_path_csv)
 
 
-@app.get('/df_show')
-def read_and_return_df():
+def load_snapshot() -> pd.DataFrame:
     """
-    Read and return the dataframe created with the df_creating module.
+    Load the last published snapshot, even if it is stale.
+
+    The snapshot is memory mapped, so all the worker processes of the
+    host share one physical copy of it.
 
     Returns:
-        list: A list of dictionaries representing the lectures dataframe.
+        pd.DataFrame: The snapshot, or an empty DataFrame if none
+        was published yet.
     """
-    # Create or load the DataFrame using the df_creating module
-    final_urls_dataframe = df_creating(final_path_csv)
-    # Fill NaN values with 'null'
-    final_urls_dataframe = final_urls_dataframe.fillna('null')
-    # Convert DataFrame to a list of dictionaries and return
-    return final_urls_dataframe.to_dict(orient='records')
+    if os.path.exists(final_path_snapshot):
+        return read_snapshot(final_path_snapshot)
+    return pd.DataFrame()
 
 
 def get_csv_creation_date():
     """
-    Retrieve the creation date of a CSV file.
+    Retrieve the creation date of the snapshot file.
 
-    This function checks if a CSV file exists
-    at the hardcoded path 'app/final.csv'.
+    This function checks if the snapshot file exists
+    at the path 'app/final.feather'.
     If the file exists, it retrieves and returns
     the creation dateas a datetime object.
     Returns:
-        datetime: The creation date of the CSV file
+        datetime: The creation date of the snapshot file
         if it exists, otherwise None.
     Note:
         The function uses os.path.exists() and os.path.getctime() to check
@@ -80,7 +107,7 @@ def get_csv_creation_date():
         The creation time is converted from a timestamp
         to a datetime object using datetime.fromtimestamp().
     """
-    file_path_final = 'app/final.csv'
+    file_path_final = final_path_snapshot
     if os.path.exists(file_path_final):
         # Get the creation time of the file
         creation_time = os.path.getctime(file_path_final)
@@ -91,14 +118,309 @@ def get_csv_creation_date():
         return None
 
 
+def format_creation_date(creation_date: datetime) -> str:
+    """
+    Format a creation date in the 'Europe/Rome' timezone.
+
+    Args:
+        creation_date (datetime): The creation date.
+
+    Returns:
+        str: The date in 'Day, DD-MMM-YYYY HH:MM:SS TZ' format.
+    """
+    # Convert the creation date to Rome timezone
+    creation_date_rome = creation_date.astimezone(pytz.timezone('Europe/Rome'))
+    return creation_date_rome.strftime('%A, %d-%b-%Y %H:%M:%S %Z')
+
+
+def snapshot_creation_date() -> str:
+    """
+    Format the creation date of the published snapshot.
+
+    Returns:
+        str: The date as answered by /csv_creation_date,
+        or None if no snapshot was published yet.
+    """
+    creation_date = get_csv_creation_date()
+    if creation_date is None:
+        return None
+    return format_creation_date(creation_date)
+
+
+def local_time(value: datetime) -> np.datetime64:
+    """
+    Convert a requested time to the times of the lectures.
+
+    Args:
+        value (datetime): The time, naive times are taken as local.
+
+    Returns:
+        np.datetime64: The naive 'Europe/Rome' time, None for None.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(pytz.timezone('Europe/Rome')).replace(
+            tzinfo=None)
+    return np.datetime64(value, 'ns')
+
+
+def snapshot_version() -> str:
+    """
+    Identify the published snapshot.
+
+    Returns:
+        str: The modification time and the size of the snapshot file,
+        the same for every worker, or None if there is none.
+    """
+    if not os.path.exists(final_path_snapshot):
+        return None
+    stat = os.stat(final_path_snapshot)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def reload_snapshot() -> None:
+    """
+    Replace the snapshot served by this worker with the published one.
+
+    The indexes of the new snapshot are built before it is swapped in,
+    so requests never wait for them. The cached responses of the old
+    snapshot are dropped.
+    """
+    global final_urls_dataframe, serving_snapshot
+    new_snapshot = ServingSnapshot(load_snapshot(),
+                                   snapshot_creation_date(),
+                                   snapshot_version())
+    serving_snapshot = new_snapshot
+    final_urls_dataframe = new_snapshot.dataframe
+    response_cache.clear()
+
+
+def snapshot_age() -> float:
+    """
+    Compute the age of the published snapshot.
+
+    Returns:
+        float: Seconds since the snapshot was published,
+        infinity if there is none.
+    """
+    if not os.path.exists(final_path_snapshot):
+        return float('inf')
+    return datetime.now().timestamp() - os.path.getctime(final_path_snapshot)
+
+
+def build_snapshot() -> str:
+    """
+    Build a new snapshot off the request path and publish it with an
+    atomic file swap.
+
+    Only one worker builds at a time, and a snapshot that another worker
+    has just published is not rebuilt.
+
+    Returns:
+        str: The path of the new snapshot, or None if nothing was built.
+    """
+    with file_lock(final_path_snapshot + '.lock') as acquired:
+        if not acquired or snapshot_age() < REFRESH_INTERVAL - REFRESH_JITTER:
+            return None
+        csv_path = final_path_csv + '.tmp' if EXPORT_CSV else None
+        create_new_dataframe(final_path_snapshot + '.tmp', csv_path=csv_path)
+        if EXPORT_CSV:
+            os.replace(final_path_csv + '.tmp', final_path_csv)
+        os.replace(final_path_snapshot + '.tmp', final_path_snapshot)
+    return final_path_snapshot
+
+
+def publish_snapshot(path: str) -> None:
+    """
+    Serve the snapshot just published by build_snapshot.
+
+    Args:
+        path (str): The path returned by build_snapshot.
+    """
+    # Load it through the memory map instead of keeping the built copy
+    snapshot_watcher.check()
+
+
+serving_snapshot = ServingSnapshot(load_snapshot(),
+                                   snapshot_creation_date(),
+                                   snapshot_version())
+final_urls_dataframe = serving_snapshot.dataframe
+response_cache = ResponseCache()
+
+refresh_scheduler = RefreshScheduler(
+    build_snapshot, publish_snapshot, interval=REFRESH_INTERVAL,
+    jitter=REFRESH_JITTER, retries=REFRESH_RETRIES, backoff=REFRESH_BACKOFF)
+
+snapshot_watcher = SnapshotWatcher(final_path_snapshot, reload_snapshot,
+                                   interval=SNAPSHOT_WATCH_INTERVAL)
+
+
+@app.on_event("startup")
+def start_refresh() -> None:
+    """
+    Start watching the snapshot file and refreshing it in the background.
+
+    The first refresh runs right away if there is no snapshot yet or if
+    it is older than the refresh interval, otherwise when it expires.
+    """
+    snapshot_watcher.start()
+    if not REFRESH_ENABLED:
+        return
+    initial_delay = max(0, REFRESH_INTERVAL - snapshot_age())
+    refresh_scheduler.start(initial_delay)
+
+
+@app.on_event("shutdown")
+def stop_refresh() -> None:
+    """
+    Stop the background refresh and the watch of the snapshot.
+    """
+    refresh_scheduler.stop()
+    snapshot_watcher.stop()
+
+
+def cached_response(variants: dict, request: Request, media_type: str,
+                    headers: dict = None) -> Response:
+    """
+    Answer a cached body in the encoding preferred by the client.
+
+    Args:
+        variants (dict[str, bytes]): The body by encoding.
+        request (Request): The request, for its Accept-Encoding header.
+        media_type (str): The media type of the body.
+        headers (dict, optional): Other headers of the response.
+
+    Returns:
+        Response: The body, compressed if the client accepts it.
+    """
+    encoding = choose_encoding(request.headers.get('accept-encoding'),
+                               variants)
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(content=variants[encoding], media_type=media_type,
+                    headers=headers)
+
+
+@app.get('/df_show')
+def read_and_return_df(request: Request, offset: int = Query(0, ge=0),
+                       limit: int = Query(None, ge=0),
+                       cursor: str = None, fields: str = None,
+                       output: str = Query('json', alias='format',
+                                           pattern='^(json|ndjson)$')
+                       ) -> Response:
+    """
+    Return the current snapshot of the lectures dataframe.
+
+    The snapshot is refreshed in the background, so this endpoint never
+    waits for a rebuild. The lectures are serialized and sent a chunk at
+    a time, so the memory used by a request does not depend on the size
+    of the snapshot.
+
+    Args:
+        request (Request): The request, for its Accept-Encoding header.
+        offset (int): The position of the first lecture returned.
+        limit (int, optional): The maximum number of lectures returned,
+            all of them by default.
+        cursor (str, optional): The X-Next-Cursor header of the previous
+            page, used instead of the offset.
+        fields (str, optional): The comma separated columns returned,
+            all of them by default.
+        output (str): 'json' for a JSON list, 'ndjson' for one JSON
+            object per line.
+
+    Returns:
+        Response: The lectures, with missing values as the
+        string 'null'. The X-Total-Count header holds the number of
+        lectures, and the X-Next-Cursor header the cursor of the next
+        page if some lectures are left. A cached body is sent gzip or
+        brotli compressed if the client accepts it.
+
+    Raises:
+        HTTPException: 400 for an unknown field, an empty list of fields
+        or a malformed cursor, 410 for a cursor of a snapshot no longer
+        served.
+    """
+    # Use the same snapshot for the whole response
+    snapshot = serving_snapshot
+    total = len(snapshot.dataframe)
+
+    if cursor is not None:
+        try:
+            version, offset = decode_cursor(cursor)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+        if version != snapshot.version:
+            raise HTTPException(status_code=410,
+                                detail="The snapshot was refreshed")
+
+    columns = None
+    if fields is not None:
+        columns = [field for field in fields.split(',') if field]
+        if not columns:
+            raise HTTPException(status_code=400, detail="No fields given")
+        unknown = [field for field in columns
+                   if field not in snapshot.columns]
+        if unknown and total:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown fields: {unknown}")
+
+    start = min(offset, total)
+    stop = total if limit is None else min(total, start + limit)
+
+    headers = {"X-Total-Count": str(total)}
+    if stop < total:
+        headers["X-Next-Cursor"] = encode_cursor(snapshot.version, stop)
+
+    if output == 'ndjson':
+        media_type = "application/x-ndjson"
+        chunks = snapshot.ndjson_chunks(start, stop, columns)
+    else:
+        media_type = "application/json"
+        chunks = snapshot.json_chunks(start, stop, columns)
+
+    # Send the cached body, or stream it and cache it if small enough
+    key = (snapshot.version, '/df_show', start, stop,
+           None if columns is None else tuple(columns), output)
+    variants = response_cache.get(key)
+    if variants is not None:
+        return cached_response(variants, request, media_type, headers)
+    headers['Vary'] = 'Accept-Encoding'
+    return StreamingResponse(response_cache.stream(key, chunks),
+                             media_type=media_type, headers=headers)
+
+
+@app.get('/build_stats')
+def build_stats(limit: int = None) -> dict:
+    """
+    Return the reports of the last snapshot builds.
+
+    Every report holds the wall and CPU time, the rows in and out and
+    the peak memory of every stage of a build.
+
+    Args:
+        limit (int, optional): Number of reports to return, all by default.
+
+    Returns:
+        dict: The 'builds' reports, oldest first, and the memory used
+        by the 'snapshot' currently served.
+    """
+    builds = load_reports()
+    if limit is not None:
+        builds = builds[-limit:] if limit > 0 else []
+    return {"builds": builds,
+            "snapshot": memory_report(final_urls_dataframe)}
+
+
 @app.get("/csv_creation_date")
 async def csv_creation_date():
     """
     Retrieve the creation date of the CSV file
     and set a cookie with the date.
 
-    This endpoint retrieves the creation date of the CSV file
-    at the hardcoded path 'app/final.csv'.If the file exists,
+    This endpoint retrieves the creation date of the snapshot file
+    at the path 'app/final.feather'.If the file exists,
     it formats the creation date in 'Day, DD-MMM-YYYY HH:MM:SS TZ' format,
     sets it as a cookie named 'creation_date', and returns the formatted date.
 
@@ -116,28 +438,40 @@ async def csv_creation_date():
         The creation time is converted from a timestamp to a datetime
         object using datetime.fromtimestamp().
         The datetime object is then converted to the
-        'Europe/Rome' timezone using pytz.timezone().
+        'Europe/Rome' timezone by format_creation_date().
         The formatted date is set as a cookie using Response.set_cookie().
     """
     # Get the creation date of the CSV file
     creation_date = get_csv_creation_date()
     if creation_date:
-        # Set the timezone to Rome
-        rome_tz = pytz.timezone('Europe/Rome')
-        # Convert the creation date to Rome timezone
-        creation_date_rome = creation_date.astimezone(rome_tz)
-        # Format the date in the required format
-        cookie_date_format = creation_date_rome.strftime(
-            '%A, %d-%b-%Y %H:%M:%S %Z'
-        )
-        return cookie_date_format
+        # Format the date in the Rome timezone
+        return format_creation_date(creation_date)
     else:
         # Raise a 404 Not Found exception if the CSV file does not exist
         raise HTTPException(status_code=404, detail="File CSV not found")
 
 
+@app.get("/facets")
+def get_facets() -> Response:
+    """
+    Return the values of the filters of the calendar page.
+
+    Returns:
+    Response: A JSON object with the sorted distinct 'CYCLE',
+    'DEGREE_TYPE' and 'SITE' values of the snapshot, and its
+    'creation_date' as answered by /csv_creation_date.
+
+    Note:
+    The facets are computed once per snapshot, so the size of the
+    response does not depend on the number of lectures.
+    """
+    return Response(content=serving_snapshot.facets_body,
+                    media_type="application/json")
+
+
 @app.get("/query/{location}/{degreetype}/{cycle}")
-def get_all_teachings(location: str, degreetype: str, cycle: str) -> str:
+def get_all_teachings(location: str, degreetype: str,
+                      cycle: str) -> Response:
     """
     Retrieve and return a list of unique teachings
     based on location, degree type, and cycle.
@@ -148,75 +482,186 @@ def get_all_teachings(location: str, degreetype: str, cycle: str) -> str:
     cycle (str): The cycle of the teachings.
 
     Returns:
-    str: A JSON string containing a list of unique teachings.
+    Response: A JSON string containing a list of unique teachings.
 
     Note:
-    This function filters the dataframe based on the provided parameters,
-    extracts the unique teachings, and returns them as a sorted JSON string.
+    The unique teachings of every combination of location, degree type
+    and cycle are sorted and serialized once per snapshot, with missing
+    teachings as the string 'null', so the request is a single
+    dictionary lookup.
     """
-    # Filter the dataframe based on the provided parameters
-    filtered_df = final_urls_dataframe[
-        final_urls_dataframe['DEGREE_TYPE'] == degreetype
-    ]
-    filtered_df = filtered_df[filtered_df['SITE'] == location]
-    filtered_df = filtered_df[filtered_df['CYCLE'] == cycle]
-
-    # Fill any missing values in the dataframe with the string 'null'
-    filtered_df.fillna("null", inplace=True)
-
-    # Extract the unique teachings from the filtered dataframe
-    teachings = filtered_df['TEACHING']
-
-    # Create a dictionary with unique teachings
-    final_teachings = dict()
-    for teaching in teachings:
-        final_teachings[teaching] = teaching
-
-    # Sort the dictionary
-    final_teachings = dict(sorted(final_teachings.items()))
-
-    # Convert the dictionary to a JSON string
-    final_teachings = json.dumps(final_teachings)
+    # Look up the serialized teachings of the combination
+    body = serving_snapshot.facet_body(location, degreetype, cycle)
 
     # Return the JSON string
-    return final_teachings
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/query/{final_teaching}")
-def get_teaching(final_teaching: str):
+def get_teaching(final_teaching: str, request: Request,
+                 start: datetime = None, end: datetime = None) -> Response:
     """
     Retrieve and return a specific teaching record from the dataframe.
 
     Parameters:
     final_teaching (str):
     The unique identifier of the teaching record to retrieve.
+    request (Request): The request, for its Accept-Encoding header.
+    start (datetime, optional): Only the lectures starting from then.
+    end (datetime, optional): Only the lectures starting before then.
 
     Returns:
-    JSONResponse:
+    Response:
     A JSON response containing the details of the specified teaching record.
 
     Note:
-    The function filters the dataframe based on the 'TEACHING' column
-    and the provided 'final_teaching' parameter.
-    It then fills any missing values in the dataframe with the string 'null'.
-    The filtered dataframe is converted to a dictionary
-    with 'index' orientation,and a JSON response is created
-    using the dictionary.The JSON response is then returned.
-    """
-    # Filter the dataframe based on the 'TEACHING' column
-    # and on provided 'final_teaching' parameter
-    filtered_df = final_urls_dataframe[
-        final_urls_dataframe['TEACHING'] == final_teaching
-    ]
-
-    # Fill any missing values in the dataframe with the string 'null'
-    filtered_df.fillna("null", inplace=True)
-
-    # Convert the filtered dataframe to a dictionary with 'index' orientation
-    filtered_dict = filtered_df.to_dict(orient='index')
-
-    # Create a JSON response using the dictionary
-    subset_final_json = JSONResponse(content=filtered_dict)
-
-    # Return the JSON response
-    return subset_final_json
+    The lectures of every teaching are indexed once per snapshot and
+    serialized on the first request, with missing values as the string
+    'null' and the rows keyed by their index. The body and its gzip and
+    brotli variants are then served from the response cache until a new
+    snapshot is published.
+    The lectures in a start and end range are found by binary search in
+    the lectures of the teaching sorted by start time, so the cost of a
+    range is proportional to the lectures in it.
+    An unknown teaching returns an empty JSON object.
+    """
+    # Serialize the lectures of the teaching, unless cached
+    snapshot = serving_snapshot
+    start, end = local_time(start), local_time(end)
+    variants = response_cache.get_or_build(
+        (snapshot.version, '/query/{final_teaching}', final_teaching,
+         str(start), str(end)),
+        lambda: snapshot.teaching_body(final_teaching, start, end))
+
+    # Return the JSON response, compressed if the client accepts it
+    return cached_response(variants, request, "application/json")
+
+
+@app.get("/ical")
+def get_ical(request: Request,
+             teaching: List[str] = Query(...)) -> Response:
+    """
+    Export the lectures of one or more teachings as an iCalendar feed.
+
+    Calendar clients can subscribe to the URL: the feed of a snapshot
+    is written once, streamed, then served from the response cache with
+    an ETag until a new snapshot is published.
+
+    Parameters:
+    request (Request): The request, for its If-None-Match and
+    Accept-Encoding headers.
+    teaching (List[str]): The names of the teachings, repeated as
+    ?teaching=...&teaching=...
+
+    Returns:
+    Response: The text/calendar feed of the lectures in time order,
+    or 304 Not Modified if the client already has it.
+
+    Raises:
+    HTTPException: 404 if none of the teachings exists.
+    """
+    # Use the same snapshot for the whole response
+    snapshot = serving_snapshot
+    teachings = list(dict.fromkeys(teaching))
+    if not any(name in snapshot.teaching_index for name in teachings):
+        raise HTTPException(status_code=404, detail="Teaching not found")
+
+    key = (snapshot.version, '/ical', tuple(teachings))
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    headers = {"ETag": f'W/"{digest}"',
+               "Content-Disposition": 'attachment; filename="calendar.ics"'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if headers["ETag"] in [tag.strip() for tag in if_none_match.split(',')] \
+            or if_none_match.strip() == '*':
+        return Response(status_code=304, headers={"ETag": headers["ETag"]})
+
+    media_type = "text/calendar; charset=utf-8"
+    variants = response_cache.get(key)
+    if variants is not None:
+        return cached_response(variants, request, media_type, headers)
+    published = get_csv_creation_date() or datetime.now()
+    headers['Vary'] = 'Accept-Encoding'
+    return StreamingResponse(
+        response_cache.stream(key, snapshot.ical_chunks(teachings,
+                                                        published)),
+        media_type=media_type, headers=headers)
+
+
+@app.get("/timetable")
+def get_timetable(request: Request, teaching: List[str] = Query(None),
+                  af_id: List[int] = Query(None), start: datetime = None,
+                  end: datetime = None,
+                  limit: int = Query(None, ge=0)) -> Response:
+    """
+    Return the lectures of several teachings in a single response.
+
+    Parameters:
+    request (Request): The request, for its Accept-Encoding header.
+    teaching (List[str], optional): The names of the teachings,
+    repeated as ?teaching=...&teaching=...
+    af_id (List[int], optional): The AF_IDs of more teachings,
+    repeated as ?af_id=...&af_id=...
+    start (datetime, optional): Only the lectures starting from then.
+    end (datetime, optional): Only the lectures starting before then.
+    limit (int, optional): The maximum number of lectures, the first
+    ones in time order.
+
+    Returns:
+    Response: A JSON list of the lectures of all the teachings, sorted by
+    start time, with missing values as the string 'null'. Unknown
+    teachings are ignored.
+
+    Raises:
+    HTTPException: 400 if neither teachings nor AF_IDs are given.
+
+    Note:
+    The lectures are resolved through the per snapshot indexes of the
+    teachings and of the AF_IDs, sorted by start time so that a start
+    and end range is found by binary search. The body is cached until
+    a new snapshot is published.
+    """
+    if not teaching and not af_id:
+        raise HTTPException(status_code=400,
+                            detail="No teaching or af_id given")
+    # Use the same snapshot for the whole response
+    snapshot = serving_snapshot
+    teachings = tuple(dict.fromkeys(teaching or []))
+    af_ids = tuple(dict.fromkeys(af_id or []))
+
+    start, end = local_time(start), local_time(end)
+
+    variants = response_cache.get_or_build(
+        (snapshot.version, '/timetable', teachings, af_ids, str(start),
+         str(end), limit),
+        lambda: snapshot.timetable_body(teachings, af_ids, start, end,
+                                        limit))
+    return cached_response(variants, request, "application/json")
+
+
+@app.get("/search")
+def search_teachings(request: Request, q: str,
+                     limit: int = Query(10, ge=1, le=100)) -> Response:
+    """
+    Search the teachings by name or by lecturer, for type-ahead.
+
+    Parameters:
+    request (Request): The request, for its Accept-Encoding header.
+    q (str): The text typed by the user. Accents and case are ignored.
+    limit (int): The maximum number of matches.
+
+    Returns:
+    Response: A JSON list of matches, best first. Every match holds its
+    'field' (TEACHING or LECTURER_NAME), its 'value', the 'teachings' it
+    leads to and its 'score'.
+
+    Note:
+    The prefix and trigram index is built once per snapshot, so a query
+    is a binary search in the words of the names and a count of the
+    shared trigrams, without a scan of the lectures.
+    """
+    # Use the same snapshot for the whole response
+    snapshot = serving_snapshot
+    variants = response_cache.get_or_build(
+        (snapshot.version, '/search', fold(q), limit),
+        lambda: encode_json(snapshot.search_index.search(q, limit)))
+    return cached_response(variants, request, "application/json")
@@ -0,0 +1,223 @@
+"""
+Backend module to instrument the builds of the calendar DataFrame.
+
+Every stage of a build is timed (wall and CPU time) and measured (rows
+in and out, resident set size, and peak traced memory when tracemalloc
+is enabled). The report of the build is appended to a JSON file keeping
+the last builds, so that slow or memory hungry refreshes can be looked
+at after the fact.
+"""
+
+import contextlib
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+from . import source_cache
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# File where the reports of the last builds are saved
+STATS_PATH = os.environ.get(
+    "BUILD_STATS_PATH", os.path.join(source_cache.CACHE_DIR,
+                                     "build_stats.json"))
+
+# Number of build reports kept in the file
+STATS_KEEP = int(os.environ.get("BUILD_STATS_KEEP", 20))
+
+# Set to 1 to add the tracemalloc measures, which slow the build down,
+# the benchmarks enable them on their own
+TRACE_MEMORY = os.environ.get("BUILD_STATS_TRACEMALLOC", "0") == "1"
+
+
+def max_rss_bytes() -> int:
+    """
+    Measure the peak resident set size of the process.
+
+    Returns:
+        int: The peak RSS in bytes, or None if it is not available.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def count_rows(value) -> int:
+    """
+    Count the rows of a stage input or output.
+
+    Args:
+        value: A DataFrame, or a dictionary of DataFrames.
+
+    Returns:
+        int: The number of rows, or None for other values.
+    """
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        frames = [frame for frame in value.values()
+                  if isinstance(frame, pd.DataFrame)]
+        if frames:
+            return sum(len(frame) for frame in frames)
+    return None
+
+
+class BuildReport:
+    """
+    Measures of a build, stage by stage.
+
+    Used as a context manager around a build: the report is completed
+    and saved when the build ends, whether it succeeded or failed.
+
+    Attributes:
+    path (str): File where the report is saved, None to not save it.
+    keep (int): Number of reports kept in the file.
+    trace_memory (bool): Whether to measure memory with tracemalloc.
+    data (dict): The report, with the measures of every stage.
+    """
+
+    def __init__(self, path: str = STATS_PATH, keep: int = STATS_KEEP,
+                 trace_memory: bool = TRACE_MEMORY):
+        self.path = path
+        self.keep = keep
+        self.trace_memory = trace_memory
+        self.data = {"started": None, "status": None, "stages": []}
+        self._started_tracing = False
+        self._start = None
+
+    def __enter__(self) -> "BuildReport":
+        self.data["started"] = datetime.datetime.now().isoformat(
+            timespec="seconds")
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._start = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        wall_start, cpu_start = self._start
+        self.data["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+        self.data["cpu_seconds"] = round(time.process_time() - cpu_start, 4)
+        self.data["max_rss_bytes"] = max_rss_bytes()
+        if tracemalloc.is_tracing():
+            peaks = [stage["peak_traced_bytes"]
+                     for stage in self.data["stages"]]
+            self.data["peak_traced_bytes"] = max(peaks, default=0)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.data["status"] = "failed" if exc_type else "ok"
+        if exc is not None:
+            self.data["error"] = repr(exc)
+        if self.path is not None:
+            try:
+                save_report(self.data, self.path, self.keep)
+            except OSError:
+                logger.exception("Could not save the build report")
+        # Never swallow the error of the build
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows_in: int = None):
+        """
+        Measure a stage of the build.
+
+        Args:
+            name (str): The name of the stage.
+            rows_in (int, optional): The rows processed by the stage.
+
+        Yields:
+            dict: The measures of the stage, the caller may set
+            its 'rows_out'.
+        """
+        record = {"name": name, "rows_in": rows_in, "rows_out": None}
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(
+                time.perf_counter() - wall_start, 4)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 4)
+            if tracemalloc.is_tracing():
+                record["peak_traced_bytes"] = (
+                    tracemalloc.get_traced_memory()[1])
+            record["max_rss_bytes"] = max_rss_bytes()
+            self.data["stages"].append(record)
+            logger.info("Build stage %s: %.3f s wall, %.3f s CPU",
+                        name, record["wall_seconds"], record["cpu_seconds"])
+
+    def run(self, name: str, function, *args, **kwargs):
+        """
+        Run a stage function and measure it.
+
+        The rows in and out are counted from the first argument and
+        from the result of the function.
+
+        Args:
+            name (str): The name of the stage.
+            function (Callable): The stage function.
+            *args, **kwargs: The arguments of the function.
+
+        Returns:
+            The result of the function.
+        """
+        rows_in = count_rows(args[0]) if args else None
+        with self.stage(name, rows_in) as record:
+            result = function(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+        return result
+
+
+def load_reports(path: str = STATS_PATH) -> list:
+    """
+    Load the reports of the last builds.
+
+    Args:
+        path (str): The file where the reports are saved.
+
+    Returns:
+        list[dict]: The reports, oldest first.
+    """
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as stats_file:
+            return json.load(stats_file)
+    except ValueError:
+        logger.warning("Ignoring unreadable build reports %s", path)
+        return []
+
+
+def save_report(report: dict, path: str = STATS_PATH,
+                keep: int = STATS_KEEP) -> None:
+    """
+    Append a report to the file, keeping only the last ones.
+
+    Args:
+        report (dict): The report of a build.
+        path (str): The file where the reports are saved.
+        keep (int): Number of reports kept.
+    """
+    reports = (load_reports(path) + [report])[-keep:]
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file, readers never see a partial file
+    with open(path + ".tmp", "w", encoding="utf-8") as stats_file:
+        json.dump(reports, stats_file, indent=1)
+    os.replace(path + ".tmp", path)
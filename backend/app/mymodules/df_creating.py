@@ -3,15 +3,107 @@ Backend module to create calendar DataFrame
 """
 
 import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
 import os
 import datetime
+from . import source_cache
+from .json_stream import CHUNK_SIZE, read_json_columns
+from . import incremental
+from . import build_stats
+from . import snapshot
+from .snapshot import memory_report, read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of sitows endpoints downloaded at the same time
+MAX_WORKERS = int(os.environ.get("SITOWS_MAX_WORKERS", 8))
+
+# Seconds to wait for a sitows endpoint before giving up
+REQUEST_TIMEOUT = 120
+
+# Base URL of the didactic web services of the university, it can point
+# to a local stand-in service (see benchmarks/fake_sitows.py)
+SITOWS_BASE_URL = os.environ.get(
+    "SITOWS_BASE_URL", "http://apps.unive.it/sitows/didattica")
+
+# sitows endpoint of every source used to build the calendar
+SITOWS_SOURCES = {
+    "degrees": "corsi",
+    "teachings": "insegnamenti",
+    "degrees_teachings": "corsiinsegnamenti",
+    "lecturers": "docenti",
+    "teachings_lecturers": "insegnamentidocenti",
+    "lectures": "lezioni",
+    "classrooms": "aule",
+    "locations": "sedi",
+}
+
+# Source columns that are not part of the final calendar
+DROPPED_FIELDS = [
+    'CODICE', 'SETTORE', 'CREDITI', 'PESO_TOTALE',
+    'TIPO_CORSO_DES', 'TIPO_ATTIVITA', 'POSTI',
+    'NOTE', 'ANNO_CORSO', 'CDS_DES', 'COORDINATE']
+
+# Rebuild only the lectures changed since the last build when possible
+INCREMENTAL_REBUILD = os.environ.get("INCREMENTAL_REBUILD", "1") == "1"
+
+# Large sources parsed incrementally, with the fields skipped while parsing
+STREAMED_SOURCES = {
+    "lectures": DROPPED_FIELDS,
+}
+
+# Joins of merge_data: every step joins a source on the given key
+# columns, then drops the duplicate rows of the 'dedupe' columns
+JOIN_PLAN = [
+    {"source": "teachings"},
+    {"source": "degrees_teachings", "on": ["AF_ID"],
+     "dedupe": ["AR_ID", "AF_ID"]},
+    {"source": "degrees", "on": ["CDS_COD", "PDS_COD"]},
+    {"source": "lectures", "on": ["AR_ID"], "dedupe": ["IMPEGNO_ID"]},
+    {"source": "classrooms", "on": ["AULA_ID"]},
+    {"source": "locations", "on": ["SEDE_ID"]},
+]
+
+# Values kept by merge_data, only Bachelor and Master degrees
+JOIN_FILTERS = {"TIPO_CORSO_COD": ["L", "LM"]}
+
+# Join keys and columns that are not part of the merged DataFrame
+JOIN_DROPPED = ['CDS_COD', 'PDS_COD', 'PDS_DES', 'AR_ID',
+                'AULA_ID', 'SEDE_ID']
+
+# Translations applied by modify_values to the values of every column
+VALUE_MAPPINGS = {
+    # Degree types to their full names
+    'DEGREE_TYPE': {'values': {'L': 'Bachelor', 'LM': 'Master'}},
+    # Lectures held in 'PADOVA' are listed under 'VENEZIA'
+    'SITE': {'values': {'PADOVA': 'VENEZIA'}, 'missing': 'Not defined yet'},
+    'PARTITION': {'missing': ''},
+    # Semester names to their English equivalents, every cycle that is
+    # not a Spring or Annual one is a Fall semester
+    'CYCLE': {
+        'values': {
+            'II Semestre': 'Spring Semester (Feb-June)',
+            '3° Periodo': 'Spring Semester (Feb-June)',
+            '4° Periodo': 'Spring Semester (Feb-June)',
+            'Annuale': 'Annual',
+        },
+        'default': 'Fall Semester (Sep-Jan)',
+    },
+}
+
+# Cycles whose lectures are removed by modify_values
+EXCLUDED_CYCLES = ['Precorsi']
 
 
 def df_creating(file_path_final: str) -> pd.DataFrame:
     """
-    Create or load a DataFrame from a CSV file.
+    Create or load a DataFrame from a snapshot file.
 
     This is the main function which orchestrates the entire process of creating
     the final dataframe. It checks if a file exists and is less than a day old.
@@ -19,7 +111,7 @@ def df_creating(file_path_final: str) -> pd.DataFrame:
     create_new_dataframe to generate a new dataframe.
 
     Parameters:
-    file_path_final (str): The path to the CSV file.
+    file_path_final (str): The path to the snapshot file.
 
     Returns:
     pd.DataFrame: The final dataframe containing all the required data.
@@ -33,7 +125,7 @@ def df_creating(file_path_final: str) -> pd.DataFrame:
 
         # If the file was created within the last 24 hours, load it
         if current_date - file_creation_date < datetime.timedelta(days=1):
-            final_urls_dataframe = pd.read_csv(file_path_final)
+            final_urls_dataframe = read_snapshot(file_path_final)
             return final_urls_dataframe
         # If not, create a new dataframe
         else:
@@ -43,99 +135,338 @@ def df_creating(file_path_final: str) -> pd.DataFrame:
         return create_new_dataframe(file_path_final)
 
 
-def create_new_dataframe(file_path_final: str) -> pd.DataFrame:
+def create_new_dataframe(file_path_final: str,
+                         incremental_rebuild: bool = INCREMENTAL_REBUILD,
+                         csv_path: str = None,
+                         stats_path: str = build_stats.STATS_PATH,
+                         base_url: str = SITOWS_BASE_URL,
+                         cache_dir: str = source_cache.CACHE_DIR
+                         ) -> pd.DataFrame:
     """
     This function creates a new DataFrame by calling the necessary functions to
     preprocess,  merges and handles data.
-    It then saves the DataFrame to a CSV file and returns it.
+    It then saves the DataFrame to a typed snapshot file and returns it.
+
+    In incremental mode, if every source but the lectures feed is
+    unchanged since the last build, only the inserted, updated and deleted
+    lectures are processed and the previous final table is patched.
+
+    Every stage is timed and measured, and the report of the build is
+    saved with the reports of the last builds.
 
     Args:
-    file_path_final (str): The path to the final CSV file.
+    file_path_final (str): The path to the final snapshot file.
+    incremental_rebuild (bool): Whether to try an incremental rebuild.
+    csv_path (str, optional): If given, the DataFrame is also exported
+    as CSV to this path.
+    stats_path (str, optional): The file where the build report is
+    saved, None to not save it.
+    base_url (str, optional): Base URL of the sitows services.
+    cache_dir (str, optional): Directory of the response cache,
+    None disables the cache and the incremental rebuild. The incremental
+    state is saved in its 'incremental' subdirectory.
 
     Returns:
     pd.DataFrame: The new DataFrame.
     """
-    # Define the URLs from which to retrieve data
-    urls = {
-        "degrees":
-            "http://apps.unive.it/sitows/didattica/corsi",
-        "teachings":
-            "http://apps.unive.it/sitows/didattica/insegnamenti",
-        "degrees_teachings":
-            "http://apps.unive.it/sitows/didattica/corsiinsegnamenti",
-        "degrees_teachings":
-            "http://apps.unive.it/sitows/didattica/corsiinsegnamenti",
-        "lecturers":
-            "http://apps.unive.it/sitows/didattica/docenti",
-        "teachings_lecturers":
-            "http://apps.unive.it/sitows/didattica/insegnamentidocenti",
-        "teachings_lecturers":
-            "http://apps.unive.it/sitows/didattica/insegnamentidocenti",
-        "lectures":
-            "http://apps.unive.it/sitows/didattica/lezioni",
-        "classrooms":
-            "http://apps.unive.it/sitows/didattica/aule",
-        "locations":
-            "http://apps.unive.it/sitows/didattica/sedi",
-    }
+    with build_stats.BuildReport(stats_path) as build_report:
+        # Fetch every source once and share it with all the stages
+        sources = SourceRegistry(sitows_urls(base_url), cache_dir=cache_dir)
+        urls_dataframes = build_report.run("fetch", sources.get_all)
+        lectures = urls_dataframes["lectures"]
+        fingerprints = build_report.run(
+            "fingerprints", incremental.source_fingerprints, urls_dataframes,
+            pipeline_config())
+
+        # Diff the lectures against the last build if nothing else changed
+        lectures_diff = None
+        state_dir = incremental.cache_state_dir(cache_dir)
+        incremental_rebuild = incremental_rebuild and state_dir is not None
+        state = (incremental.load_state(state_dir) if incremental_rebuild
+                 else None)
+        if state is not None and state["fingerprints"] == fingerprints:
+            lectures_diff = build_report.run(
+                "diff_lectures", incremental.diff_lectures,
+                state["lectures"], lectures)
+
+        if lectures_diff is None:
+            # Full rebuild
+            build_report.data["mode"] = "full"
+            keyed_dataframe = incremental.sort_final(
+                build_final_rows(urls_dataframes, sources, build_report))
+        else:
+            # Process only the changed lectures and patch the last build
+            build_report.data["mode"] = "incremental"
+            changed_lectures, removed_keys = lectures_diff
+            keyed_dataframe = state["final"]
+            new_rows = keyed_dataframe.iloc[:0]
+            if not changed_lectures.empty:
+                urls_dataframes["lectures"] = changed_lectures
+                new_rows = build_final_rows(urls_dataframes, sources,
+                                            build_report)
+            keyed_dataframe = build_report.run(
+                "patch_final", incremental.patch_final,
+                keyed_dataframe, removed_keys, new_rows)
+
+        if incremental_rebuild:
+            with build_report.stage("save_state", len(keyed_dataframe)):
+                incremental.save_state(fingerprints, lectures,
+                                       keyed_dataframe, state_dir)
+
+        # Report download timings and any redundant download
+        sources.log_report()
+
+        # Export the DataFrame to CSV as a side output, without the
+        # lecture key that only identifies the lectures of the snapshot
+        if csv_path is not None:
+            with build_report.stage("export_csv", len(keyed_dataframe)):
+                keyed_dataframe.drop(columns=[incremental.LECTURE_KEY]).to_csv(
+                    csv_path, index=False)
+
+        # Save the DataFrame to the typed snapshot
+        final_urls_dataframe = build_report.run(
+            "write_snapshot", write_snapshot, keyed_dataframe,
+            file_path_final)
+        report = memory_report(final_urls_dataframe)
+        logger.info("Snapshot: %d lectures, %d bytes "
+                    "(%.1f bytes per lecture)", report["rows"],
+                    report["total_bytes"], report["bytes_per_lecture"])
+        build_report.data["snapshot"] = {
+            key: report[key]
+            for key in ("rows", "total_bytes", "bytes_per_lecture")}
 
-    # Use defined function to get urls_dataframe
-    urls_dataframes = get_data(urls)
+    return final_urls_dataframe
+
+
+def build_final_rows(urls_dataframes: dict, sources: "SourceRegistry",
+                     build_report: build_stats.BuildReport = None
+                     ) -> pd.DataFrame:
+    """
+    Run the lectures through the preprocess, join and enrichment stages.
+
+    Args:
+    urls_dataframes (dict[str, pd.DataFrame]): The sources to process,
+    the 'lectures' one may hold only a subset of the lectures.
+    sources (SourceRegistry): The registry the sources were read from.
+    build_report (BuildReport, optional): The report measuring the stages.
+
+    Returns:
+    pd.DataFrame: The final rows, keyed by the IMPEGNO_ID column.
+    """
+    if build_report is None:
+        build_report = build_stats.BuildReport(path=None, trace_memory=False)
+    run = build_report.run
 
     # Use the function to preprocess the data
-    preprocessed_urls_dataframes = preprocess_data(urls_dataframes)
+    preprocessed_urls_dataframes = run("preprocess_data", preprocess_data,
+                                       urls_dataframes)
 
     # Use the function to merge the data
-    merged_urls_dataframe = merge_data(preprocessed_urls_dataframes)
+    merged_urls_dataframe = run("merge_data", merge_data,
+                                preprocessed_urls_dataframes)
 
     # Use the function to order
-    ordered_dataframe = rename_and_convert(merged_urls_dataframe)
+    ordered_dataframe = run("rename_and_convert", rename_and_convert,
+                            merged_urls_dataframe)
 
     # Add prof URL
-    final_urls_dataframe = unive_lecturer_urls(ordered_dataframe)
+    final_urls_dataframe = run("unive_lecturer_urls", unive_lecturer_urls,
+                               ordered_dataframe, sources.get("lecturers"))
 
     # Add course URL
-    final_urls_dataframe = unive_teaching_urls(final_urls_dataframe)
+    final_urls_dataframe = run("unive_teaching_urls", unive_teaching_urls,
+                               final_urls_dataframe)
 
     # Format data in ISO8601
-    final_urls_dataframe = format_iso8601(final_urls_dataframe)
+    final_urls_dataframe = run("format_iso8601", format_iso8601,
+                               final_urls_dataframe)
 
     # Modifiy values to make them more understandable
-    final_urls_dataframe = modify_values(final_urls_dataframe)
+    final_urls_dataframe = run("modify_values", modify_values,
+                               final_urls_dataframe)
 
-    # Save the DataFrame to CSV
-    final_urls_dataframe.to_csv(file_path_final, index=False)
+    return final_urls_dataframe
 
-    # Read the DataFrame from CSV
-    final_urls_dataframe = pd.read_csv(file_path_final)
 
-    return final_urls_dataframe
+def pipeline_config() -> dict:
+    """
+    Collect the configuration of the stages building the final rows.
+
+    A change of any of it makes the next build a full one.
+
+    Returns:
+        dict: The value mappings, the join plan and the snapshot schema.
+    """
+    return {
+        "DROPPED_FIELDS": DROPPED_FIELDS,
+        "JOIN_PLAN": JOIN_PLAN,
+        "JOIN_FILTERS": JOIN_FILTERS,
+        "JOIN_DROPPED": JOIN_DROPPED,
+        "VALUE_MAPPINGS": VALUE_MAPPINGS,
+        "EXCLUDED_CYCLES": EXCLUDED_CYCLES,
+        "SCHEMA": [snapshot.CATEGORY_COLUMNS, snapshot.INTEGER_COLUMNS,
+                   snapshot.SMALL_INTEGER_COLUMNS,
+                   snapshot.EPOCH_DAY_COLUMNS, snapshot.MINUTE_COLUMNS,
+                   snapshot.DATETIME_COLUMNS],
+    }
+
+
+def create_session(max_workers: int = MAX_WORKERS) -> requests.Session:
+    """
+    Create an HTTP session whose keep-alive connection pool is large
+    enough to serve max_workers concurrent downloads.
+
+    Args:
+        max_workers (int): Number of downloads running at the same time.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers,
+                          pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_source(session: requests.Session, url: str,
+                 cache_dir: str = None, skip_fields: list = None) -> tuple:
+    """
+    Download a single sitows endpoint and convert it to a DataFrame.
+
+    When skip_fields is given the response is streamed and parsed
+    incrementally into columns, without ever holding the whole payload
+    or a list of row dictionaries in memory.
+
+    When a cache directory is given the request is conditional: if the
+    server answers 304 Not Modified the DataFrame parsed on a previous
+    refresh is reused, otherwise the new response is parsed and cached.
+
+    Args:
+        session (requests.Session): Session used to perform the request.
+        url (str): The URL to retrieve.
+        cache_dir (str, optional): Directory of the response cache,
+        None disables the cache.
+        skip_fields (list[str], optional): Fields dropped while streaming,
+        None parses the whole response at once.
+
+    Returns:
+        tuple[pd.DataFrame, bool]: The endpoint data and whether it was
+        reused from the cache.
+
+    Raises:
+        requests.HTTPError: If the endpoint answers with an error status.
+    """
+    entry = None
+    if cache_dir is not None:
+        entry = source_cache.load_entry(cache_dir, url)
+
+    # Retrieve data from the URL reusing a pooled connection
+    url_response = session.get(
+        url, headers=source_cache.conditional_headers(entry),
+        timeout=REQUEST_TIMEOUT, stream=skip_fields is not None)
+
+    # The source did not change since the last refresh
+    if entry is not None and url_response.status_code == 304:
+        url_response.close()
+        return source_cache.load_frame(cache_dir, url), True
+
+    url_response.raise_for_status()
+    if skip_fields is not None:
+        # Parse the array while it is downloaded
+        url_df = read_json_columns(
+            url_response.iter_content(CHUNK_SIZE), skip_fields)
+    else:
+        # Convert the response into a JSON object and store it in a list
+        url_data = url_response.json()
+        # Convert the JSON object into a Pandas DataFrame
+        url_df = pd.DataFrame(url_data)
+
+    if cache_dir is not None:
+        source_cache.store(cache_dir, url, url_response.headers, url_df)
+
+    return url_df, False
+
+
+def sitows_urls(base_url: str = SITOWS_BASE_URL) -> dict:
+    """
+    Build the URL of every sitows source.
+
+    Args:
+        base_url (str): Base URL of the sitows didactic services.
+
+    Returns:
+        dict[str: str]: Dictionary mapping source names to their URLs.
+    """
+    return {name: f"{base_url}/{endpoint}"
+            for name, endpoint in SITOWS_SOURCES.items()}
 
 
 # Retrieve JSON data from a URL and convert it to a Pandas DataFrame
-def get_data(urls: dict) -> dict:
+def get_data(urls: dict, max_workers: int = MAX_WORKERS,
+             timings: dict = None,
+             cache_dir: str = source_cache.CACHE_DIR,
+             unchanged: set = None,
+             streamed: dict = STREAMED_SOURCES) -> dict:
     """
     Retrieve data from the URL, convert it to a Pandas DataFrame,
     modify the URLs dictionary in place, and assign it to a new variable.
 
+    Up to max_workers endpoints are downloaded concurrently through one
+    shared keep-alive session, so a refresh takes roughly as long as the
+    slowest endpoint instead of the sum of all of them.
+    Endpoints that did not change since the last refresh are revalidated
+    with a conditional GET and reused from the on-disk cache.
+
     Args:
         urls (dict[str: str]): Dictionary containing
         URLs to retrieve data from.
+        max_workers (int): Maximum number of parallel downloads,
+        1 downloads the endpoints one after another.
+        timings (dict[str: float], optional): If given, it is filled with
+        the seconds spent downloading and parsing each endpoint.
+        cache_dir (str, optional): Directory of the response cache,
+        None disables the cache.
+        unchanged (set[str], optional): If given, it is filled with the
+        names of the endpoints reused from the cache.
+        streamed (dict[str: list[str]]): Endpoints parsed incrementally,
+        mapped to the fields skipped while parsing them.
 
     Returns:
         dict[str: pd.DataFrame]: Dictionary with retrieved
         data as Pandas DataFrames.
     """
-    # Loop through each URL in the URLs dictionary
-    for url in urls.keys():
-        # Retrieve data from the URL
-        url_response = requests.get(urls[url])
-        # Convert the response into a JSON object and store it in a list
-        url_data = url_response.json()
-        # Convert the JSON object into a Pandas DataFrame
-        url_df = pd.DataFrame(url_data)
-        # Replace in place URLs within dictionary
-        urls[url] = url_df
+    if timings is None:
+        timings = {}
+    if unchanged is None:
+        unchanged = set()
+    names = list(urls.keys())
+    max_workers = max(1, min(max_workers, len(names)))
+
+    def timed_fetch(session: requests.Session, name: str) -> pd.DataFrame:
+        start = time.perf_counter()
+        url_df, from_cache = fetch_source(session, urls[name], cache_dir,
+                                          streamed.get(name))
+        timings[name] = time.perf_counter() - start
+        if from_cache:
+            unchanged.add(name)
+        logger.info("Fetched %s in %.3fs (%d rows%s)",
+                    name, timings[name], len(url_df),
+                    ", not modified" if from_cache else "")
+        return url_df
+
+    with create_session(max_workers) as session:
+        if max_workers == 1:
+            url_dfs = [timed_fetch(session, name) for name in names]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                url_dfs = list(executor.map(
+                    lambda name: timed_fetch(session, name), names))
+
+    # Replace in place URLs within dictionary
+    for name, url_df in zip(names, url_dfs):
+        urls[name] = url_df
 
     # Assign the modified URLs dictionary to a new variable
     urls_dfs = urls
@@ -143,6 +474,147 @@ def get_data(urls: dict) -> dict:
     return urls_dfs
 
 
+class SourceRegistry:
+    """
+    Registry of the sitows sources used during a single build.
+
+    Every stage of create_new_dataframe reads its sources from the
+    registry, which downloads and decodes each distinct URL exactly once
+    and hands out shallow copies, so that in place changes made by one
+    stage are never seen by another one. Sources sharing the same URL
+    are downloaded once, and any URL downloaded more than once is
+    reported as redundant.
+
+    Attributes:
+    urls (dict[str, str]): The URL of every source.
+    timings (dict[str, float]): Seconds spent fetching every URL.
+    unchanged (set[str]): URLs reused from the response cache.
+    downloads (dict[str, int]): Number of downloads of every URL.
+    """
+
+    def __init__(self, urls: dict, max_workers: int = MAX_WORKERS,
+                 cache_dir: str = source_cache.CACHE_DIR):
+        self.urls = dict(urls)
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.timings = {}
+        self.unchanged = set()
+        self.downloads = {}
+        self._frames = {}
+
+        # Sources declared more than once under different names
+        for url, names in self.aliases().items():
+            logger.warning("Sources %s share %s, downloading it once",
+                           ", ".join(names), url)
+
+    @classmethod
+    def from_frames(cls, frames: dict) -> "SourceRegistry":
+        """
+        Create a registry holding sources that are already loaded,
+        e.g. recorded or synthetic data, without any download.
+
+        Args:
+            frames (dict[str, pd.DataFrame]): The sources by name.
+
+        Returns:
+            SourceRegistry: The registry of the given sources.
+        """
+        registry = cls({name: f"memory:{name}" for name in frames},
+                       cache_dir=None)
+        for name, frame in frames.items():
+            registry._frames[registry.urls[name]] = frame
+        return registry
+
+    def aliases(self) -> dict:
+        """
+        Find the sources that point to the same URL.
+
+        Returns:
+            dict[str, list[str]]: The names sharing each duplicated URL.
+        """
+        names_by_url = {}
+        for name, url in self.urls.items():
+            names_by_url.setdefault(url, []).append(name)
+        return {url: names for url, names in names_by_url.items()
+                if len(names) > 1}
+
+    def fetch(self, names: list = None) -> None:
+        """
+        Download concurrently the given sources that are not loaded yet.
+
+        Args:
+            names (list[str], optional): The sources to download,
+            all of them by default.
+        """
+        if names is None:
+            names = list(self.urls)
+        # Download each missing URL under the first name that uses it
+        missing = {}
+        for name in names:
+            url = self.urls[name]
+            if url not in self._frames:
+                missing.setdefault(url, name)
+        if not missing:
+            return
+
+        timings = {}
+        unchanged = set()
+        frames = get_data({name: url for url, name in missing.items()},
+                          max_workers=self.max_workers, timings=timings,
+                          cache_dir=self.cache_dir, unchanged=unchanged)
+        for url, name in missing.items():
+            self._frames[url] = frames[name]
+            self.timings[url] = timings[name]
+            self.downloads[url] = self.downloads.get(url, 0) + 1
+            if name in unchanged:
+                self.unchanged.add(url)
+
+    def get(self, name: str) -> pd.DataFrame:
+        """
+        Return a source, downloading it if it is not loaded yet.
+
+        Args:
+            name (str): The name of the source.
+
+        Returns:
+            pd.DataFrame: A shallow copy of the source DataFrame.
+        """
+        self.fetch([name])
+        return self._frames[self.urls[name]].copy(deep=False)
+
+    def get_all(self) -> dict:
+        """
+        Return every source, downloading the missing ones concurrently.
+
+        Returns:
+            dict[str, pd.DataFrame]: Shallow copies of all the sources.
+        """
+        self.fetch()
+        return {name: self.get(name) for name in self.urls}
+
+    def redundant_downloads(self) -> dict:
+        """
+        Find the URLs that were downloaded more than once.
+
+        Returns:
+            dict[str, int]: The number of downloads of each redundant URL.
+        """
+        return {url: count for url, count in self.downloads.items()
+                if count > 1}
+
+    def log_report(self) -> None:
+        """
+        Log how long each source took and any redundant download.
+        """
+        for name, url in self.urls.items():
+            if url in self.timings:
+                logger.info("Source %s: %.3fs%s", name, self.timings[url],
+                            " (not modified)" if url in self.unchanged
+                            else "")
+        for url, count in self.redundant_downloads().items():
+            logger.warning("%s was downloaded %d times", url, count)
+
+
 # Process data changing columns names and converting to uppercase
 def preprocess_data(urls_dataframes: pd.DataFrame) -> pd.DataFrame:
     """
@@ -178,59 +650,125 @@ def preprocess_data(urls_dataframes: pd.DataFrame) -> pd.DataFrame:
 
 
 # Merge all dataframes in one using dictionary with dataframes
-def merge_data(urls_dataframes: pd.DataFrame) -> pd.DataFrame:
+def merge_data(urls_dataframes: pd.DataFrame, plan: list = None,
+               filters: dict = None) -> pd.DataFrame:
     """
     Merges multiple DataFrames from the provided dictionary
-    using various columns and methods.
+    following a declarative join plan.
+
+    The joins run on the key columns of the sources only, every joined
+    row carrying the row position of each source. The joined keys are
+    filtered, and the other columns of the sources are taken only for
+    the rows left at the end. The result is the same, rows and order,
+    as merging the whole sources and filtering afterwards.
 
     Args:
     urls_dataframes (dict[str, pd.DataFrame]):
     A dictionary containing DataFrames to merge.
+    plan (list[dict], optional): The join steps, JOIN_PLAN by default.
+    filters (dict[str, list], optional): The allowed values of the
+    filtered columns, JOIN_FILTERS by default.
 
     Returns:
     pd.DataFrame: The merged DataFrame.
     """
-    # Merge insegnamenti_df and corsi_insegnamenti_df
-    # on the common column 'AF_ID' and
-    # use intersection of keys from both frames
-    merged_df = pd.merge(urls_dataframes["teachings"],
-                         urls_dataframes["degrees_teachings"],
-                         on='AF_ID', how='inner')
-
-    # Drop duplicate rows based on
-    # the combination of columns 'AR_ID' and 'AF_ID'
-    merged_df = merged_df.drop_duplicates(
-        subset=['AR_ID', "AF_ID"])
-
-    # Merge merged_df and corsi_df on the columns [CDS_COD,"PDS_COD]
-    # and use intersection of keys from both frames
-    merged_df = pd.merge(merged_df, urls_dataframes["degrees"], on=[
-        "CDS_COD", "PDS_COD"], how='inner')
-
-    # Merge merged_df and lezioni_df on the columns 'AR_ID' and
-    # use intersection of keys from both frames
-    merged_df = pd.merge(merged_df, urls_dataframes["lectures"],
-                         on="AR_ID", how='inner')
+    if plan is None:
+        plan = JOIN_PLAN
+    if filters is None:
+        filters = JOIN_FILTERS
+
+    # Columns needed to join, deduplicate or filter the rows
+    key_columns = set(filters)
+    for step in plan:
+        key_columns.update(step.get("on", []))
+        key_columns.update(step.get("dedupe", []))
+
+    joined = None
+    for step in plan:
+        source = urls_dataframes[step["source"]]
+        on = step.get("on", [])
+
+        # Project the source to its keys and to its row positions
+        taken = set() if joined is None else set(joined.columns)
+        keys = [column for column in source.columns if column in on
+                or (column in key_columns and column not in taken)]
+        projected = source[keys].reset_index(drop=True)
+        projected[_position_column(step)] = np.arange(len(source))
+
+        if joined is None:
+            joined = projected
+        else:
+            joined = _join_keys(joined, projected, on)
+
+        # Drop duplicate rows based on the combination of the given columns
+        if "dedupe" in step:
+            joined = joined.drop_duplicates(subset=step["dedupe"])
+
+    # Filter the joined keys before taking any other column
+    for column, allowed in filters.items():
+        joined = joined[joined[column].isin(allowed)]
+
+    # Take the needed columns of every source for the joined rows only
+    columns = {}
+    for step in plan:
+        source = urls_dataframes[step["source"]]
+        positions = joined[_position_column(step)].to_numpy()
+        for column in source.columns:
+            if column in JOIN_DROPPED or column in DROPPED_FIELDS:
+                continue
+            if column in columns:
+                if column not in key_columns:
+                    logger.warning("Column %s of %s is already provided "
+                                   "by another source", column,
+                                   step["source"])
+                continue
+            columns[column] = source[column].take(positions).to_numpy()
+
+    # 'IMPEGNO_ID' is kept to identify the lectures of the final table
+    return pd.DataFrame(columns)
+
+
+def _position_column(step: dict) -> str:
+    # Name of the column holding the row positions of a source
+    return "__row_" + step["source"]
+
+
+def _join_keys(left: pd.DataFrame, right: pd.DataFrame,
+               on: list) -> pd.DataFrame:
+    """
+    Inner join two key frames, in the row order of pd.merge.
 
-    # Drops duplicate rows based on the 'IMPEGNO_ID' column
-    merged_df = merged_df.drop_duplicates(subset=['IMPEGNO_ID'])
+    When the keys of the right frame are unique the join is a lookup in
+    its hashed key index, otherwise it falls back to pd.merge.
 
-    # Merge the DataFrame with aule_df DataFrame on the column 'AULA_ID'
-    # and use intersection of keys from both frames
-    merged_df = pd.merge(merged_df, urls_dataframes["classrooms"],
-                         on="AULA_ID", how='inner')
+    Args:
+    left (pd.DataFrame): The rows joined so far.
+    right (pd.DataFrame): The projected source to join.
+    on (list[str]): The key columns.
 
-    # Merge the DataFrame with aule_df DataFrame on the column 'SEDE_ID'
-    # and use intersection of keys from both frames
-    final_urls_df = pd.merge(merged_df, urls_dataframes["locations"],
-                             on="SEDE_ID", how='inner')
+    Returns:
+    pd.DataFrame: The joined rows.
+    """
+    if len(on) == 1:
+        right_index = pd.Index(right[on[0]])
+        left_keys = pd.Index(left[on[0]])
+    else:
+        right_index = pd.MultiIndex.from_frame(right[on])
+        left_keys = pd.MultiIndex.from_frame(left[on])
 
-    # Dropping unnecessary columns such as 'CDS_COD' and 'PDS_COD'
-    final_urls_df = final_urls_df.drop([
-        'CDS_COD', 'PDS_COD', "PDS_DES", "AR_ID",
-        "IMPEGNO_ID", "AULA_ID", "SEDE_ID"], axis=1)
+    if not right_index.is_unique:
+        return pd.merge(left, right, on=on, how='inner')
 
-    return final_urls_df
+    positions = right_index.get_indexer(left_keys)
+    matched = np.flatnonzero(positions >= 0)
+    # Like pd.merge, group the left rows by key in order of appearance
+    codes, _ = pd.factorize(left_keys[matched])
+    matched = matched[np.argsort(codes, kind="stable")]
+    joined = left.iloc[matched].reset_index(drop=True)
+    others = right.drop(columns=on).iloc[positions[matched]]
+    for column in others.columns:
+        joined[column] = others[column].to_numpy()
+    return joined
 
 
 def rename_and_convert(merged_dataframe: pd.DataFrame) -> pd.DataFrame:
@@ -245,12 +783,9 @@ def rename_and_convert(merged_dataframe: pd.DataFrame) -> pd.DataFrame:
     Returns:
     pd.DataFrame: The processed DataFrame.
     """
-    drop_columns = [
-        'CODICE', 'SETTORE', 'CREDITI', 'PESO_TOTALE',
-        'TIPO_CORSO_DES', 'TIPO_ATTIVITA', 'POSTI',
-        'NOTE', 'ANNO_CORSO', 'CDS_DES', 'COORDINATE']
-
-    merged_dataframe.drop(columns=drop_columns, inplace=True)
+    # Fields skipped while streaming or merging are already missing
+    merged_dataframe.drop(columns=DROPPED_FIELDS, inplace=True,
+                          errors='ignore')
 
     new_column_names = {'CICLO': "CYCLE", 'CODICE': 'CODE',
                         'PARTIZIONE': 'PARTITION',
@@ -266,28 +801,26 @@ def rename_and_convert(merged_dataframe: pd.DataFrame) -> pd.DataFrame:
     merged_dataframe['LECTURER_NAME'] = merged_dataframe[
         'LECTURER_NAME'].str.upper()
 
-    # Drop rows where DEGREE_TYPE is different from 'L' or 'LM'
-    merged_dataframe = merged_dataframe[(
-        merged_dataframe['DEGREE_TYPE'] == 'L'
-        ) | (
-        merged_dataframe['DEGREE_TYPE'] == 'LM'
-    )]
+    # Rows where DEGREE_TYPE is different from 'L' or 'LM' are already
+    # filtered out by merge_data, see JOIN_FILTERS
 
     return merged_dataframe
 
 
-def unive_lecturer_urls(ordered_dataframe: pd.DataFrame) -> pd.DataFrame:
+def unive_lecturer_urls(ordered_dataframe: pd.DataFrame,
+                        lecturers: pd.DataFrame) -> pd.DataFrame:
     """
     Enriches the main DataFrame with URLs of lecturers.
 
     Parameters:
     ordered_dataframe (pd.DataFrame): The DataFrame containing lecturer names.
+    lecturers (pd.DataFrame): The lecturers source as returned by sitows.
 
     Returns:
     pd.DataFrame: The updated DataFrame with added URLs of lecturers.
 
     The function performs the following steps:
-    1. Retrieves data about lecturers from a JSON URL.
+    1. Takes the lecturers data already downloaded for the build.
     2. Creates a new column 'LECTURER_NAME' using 'COGNOME' and 'NOME' columns.
     3. Selects only 'LECTURER_NAME' and 'DOCENTE_ID' columns
         from new DataFrame.
@@ -296,7 +829,6 @@ def unive_lecturer_urls(ordered_dataframe: pd.DataFrame) -> pd.DataFrame:
     6. Creates a new column 'URL_DOCENTE' using a URL and 'DOCENTE_ID' column.
     7. Returns the updated DataFrame.
     """
-    lecturers = pd.read_json("http://apps.unive.it/sitows/didattica/docenti")
     lecturers['LECTURER_NAME'] = (
         lecturers['COGNOME'] + ' ' + lecturers['NOME']
     ).str.upper()
@@ -351,120 +883,154 @@ def unive_teaching_urls(final_urls_dataframe: pd.DataFrame) -> pd.DataFrame:
     return final_urls_dataframe
 
 
-def format_iso8601(final_urls_dataframe: pd.DataFrame) -> pd.DataFrame:
+def format_iso8601(final_urls_dataframe: pd.DataFrame,
+                   timezone: str = None) -> pd.DataFrame:
     """
     This function formats the 'LECTURE_DAY' and
     'LECTURE_START'/'LECTURE_END' columns into ISO 8601 format and
     adds new columns 'START_ISO8601' and 'END_ISO8601' to the DataFrame.
 
+    The columns are built in bulk: every distinct day and time pair is
+    parsed once into a datetime64 value and formatted by numpy.
+
     Parameters:
     final_urls_dataframe (pd.DataFrame): The DataFrame to be processed.
         The DataFrame should contain 'LECTURE_DAY',
         'LECTURE_START', and 'LECTURE_END' columns.
+    timezone (str, optional): If given, e.g. 'Europe/Rome', the local
+        times are made timezone aware and the UTC offset is appended.
 
     Returns:
     pd.DataFrame: The DataFrame with the new 'START_ISO8601'
                   and 'END_ISO8601' columns.
     """
+    final_urls_dataframe['START_ISO8601'] = iso8601_strings(
+        final_urls_dataframe['LECTURE_DAY'],
+        final_urls_dataframe['LECTURE_START'], timezone)
+    final_urls_dataframe['END_ISO8601'] = iso8601_strings(
+        final_urls_dataframe['LECTURE_DAY'],
+        final_urls_dataframe['LECTURE_END'], timezone)
 
-    def format_to_iso8601(date_str, time_str):
-        """
-        This helper function formats a date and
-        time string into ISO 8601 format.
+    return final_urls_dataframe
 
-        Parameters:
-        date_str (str): The date string in 'YYYY-MM-DD' format.
-        time_str (str): The time string in 'HH:MM' format.
 
-        Returns:
-        str: The date and time string in ISO 8601 format.
-        """
-        # Create a datetime object from date and time strings
-        full_datetime = datetime.datetime.strptime(
-            f"{date_str} {time_str}", "%Y-%m-%d %H:%M"
-        )
-        return full_datetime.isoformat()
-
-    # Apply the formatting function to create new columns in ISO 8601 format
-    final_urls_dataframe['START_ISO8601'] = final_urls_dataframe.apply(
-        lambda row: format_to_iso8601(
-            row['LECTURE_DAY'], row['LECTURE_START']
-        ), axis=1)
-    final_urls_dataframe['END_ISO8601'] = final_urls_dataframe.apply(
-        lambda row: format_to_iso8601(
-            row['LECTURE_DAY'], row['LECTURE_END']
-        ), axis=1)
+def iso8601_strings(date_str: pd.Series, time_str: pd.Series,
+                    timezone: str = None) -> pd.Series:
+    """
+    This helper function formats date and time columns into ISO 8601.
 
-    return final_urls_dataframe
+    Parameters:
+    date_str (pd.Series): The date strings in 'YYYY-MM-DD' format.
+    time_str (pd.Series): The time strings in 'HH:MM' format.
+    timezone (str, optional): Time zone of the local times, if given
+        the UTC offset is appended, e.g. '2024-10-24T09:45:00+02:00'.
 
+    Returns:
+    pd.Series: The date and time strings in ISO 8601 format.
 
-def modify_values(final_urls_dataframe: pd.DataFrame) -> pd.DataFrame:
+    Raises:
+    ValueError: If a date or a time is missing or does not match
+    its format.
+    """
+    # Parse each distinct date and time only once
+    codes, pairs = pd.factorize(date_str + ' ' + time_str)
+    # A missing date or time gets the code -1, which would silently pick
+    # the last timestamp: fail like the row by row parsing did
+    if (codes == -1).any():
+        rows = date_str.index[codes == -1].tolist()
+        raise ValueError(f"Missing lecture day or time in rows {rows}")
+    datetimes = pd.to_datetime(pairs, format="%Y-%m-%d %H:%M")
+    formatted = np.datetime_as_string(
+        datetimes.to_numpy(dtype="datetime64[s]"), unit="s").astype(object)
+
+    if timezone is not None:
+        # Offset from UTC of every local time, e.g. '+01:00' in winter
+        local = datetimes.tz_localize(timezone, ambiguous=False,
+                                      nonexistent="shift_forward")
+        offsets = (local.tz_localize(None)
+                   - local.tz_convert("UTC").tz_localize(None))
+        minutes = (offsets.total_seconds() // 60).astype(int)
+        labels = [f"{'-' if m < 0 else '+'}{abs(m) // 60:02d}:"
+                  f"{abs(m) % 60:02d}" for m in minutes]
+        formatted = formatted + np.array(labels, dtype=object)
+
+    return pd.Series(formatted[codes], index=date_str.index)
+
+
+def modify_values(final_urls_dataframe: pd.DataFrame,
+                  mappings: dict = None,
+                  excluded_cycles: list = None) -> pd.DataFrame:
     """
     Modify values in the DataFrame according to specified rules.
 
     This function performs several modifications on the input DataFrame:
-    - Replaces 'L' with 'Bachelor' and 'LM' with 'Master'
-        in the 'DEGREE_TYPE' column.
-    - Replaces 'PADOVA' with 'VENEZIA' in the 'SITE' column.
-    - Fills missing values in the 'SITE' column with 'Not defined yet'.
-    - Fills missing values in the 'PARTITION' column with an empty string.
     - Removes rows where 'CYCLE' is 'Precorsi'.
-    - Translates semester names in the 'CYCLE' column to English equivalents.
+    - Translates the values of every column in VALUE_MAPPINGS:
+      degree types and semester names to their English equivalents,
+      'PADOVA' to 'VENEZIA' and missing sites and partitions.
+
+    Every mapping is applied once per distinct value of the column,
+    not once per row.
 
     Parameters:
     final_urls_dataframe (pd.DataFrame): The input DataFrame to be modified.
+    mappings (dict, optional): The value mappings by column,
+        VALUE_MAPPINGS by default.
+    excluded_cycles (list, optional): The cycles whose rows are removed,
+        EXCLUDED_CYCLES by default.
 
     Returns:
     pd.DataFrame: The modified DataFrame.
     """
-    # Replace degree types with their full names
-    final_urls_dataframe['DEGREE_TYPE'] = final_urls_dataframe[
-        'DEGREE_TYPE'].replace({'L': 'Bachelor', 'LM': 'Master'})
+    if mappings is None:
+        mappings = VALUE_MAPPINGS
+    if excluded_cycles is None:
+        excluded_cycles = EXCLUDED_CYCLES
 
-    # Replace 'PADOVA' with 'VENEZIA' in the 'SITE' column
-    final_urls_dataframe['SITE'] = final_urls_dataframe[
-        'SITE'].replace({'PADOVA': 'VENEZIA'})
+    # Remove rows of the excluded cycles, e.g. 'Precorsi', and take a
+    # copy so that the mapped columns are not written to a slice
+    final_urls_dataframe = final_urls_dataframe[
+        ~final_urls_dataframe['CYCLE'].isin(excluded_cycles)
+    ].copy()
 
-    # Fill missing values in the 'SITE' column
-    final_urls_dataframe['SITE'] = final_urls_dataframe[
-        'SITE'].fillna("Not defined yet")
+    for column, mapping in mappings.items():
+        if column in final_urls_dataframe.columns:
+            final_urls_dataframe[column] = map_values(
+                final_urls_dataframe[column], mapping)
 
-    # Fill missing values in the 'PARTITION' column with an empty string
-    final_urls_dataframe['PARTITION'] = final_urls_dataframe[
-        'PARTITION'].fillna("")
+    return final_urls_dataframe
 
-    # Remove rows where 'CYCLE' is 'Precorsi'
-    final_urls_dataframe = final_urls_dataframe[
-        final_urls_dataframe['CYCLE'] != 'Precorsi'
-    ]
-
-    # Iterate over the DataFrame using the index and semester value
-    for index, semester in final_urls_dataframe['CYCLE'].items():
-
-        # Check if the semester is in the list of Spring semesters
-        if semester in ['II Semestre', "3° Periodo", "4° Periodo"]:
-            # Replace the semester name with the English equivalent
-            new_semester = 'Spring Semester (Feb-June)'
-            # Update the DataFrame at the current index
-            final_urls_dataframe.at[index, 'CYCLE'] = new_semester
-
-        # Check if the semester is 'Annuale'
-        elif semester == 'Annuale':
-            # Replace the semester name with the English equivalent
-            new_semester = 'Annual'
-            # Update the DataFrame at the current index
-            final_urls_dataframe.at[index, 'CYCLE'] = new_semester
-
-        # If the semester is not in the list of Spring or Annual semesters,
-        # it must be a Fall semester
-        else:
-            # Replace the semester name with the English equivalent
-            new_semester = 'Fall Semester (Sep-Jan)'
-            # Update the DataFrame at the current index
-            final_urls_dataframe.at[index, 'CYCLE'] = new_semester
 
-    return final_urls_dataframe
+def map_values(column: pd.Series, mapping: dict) -> pd.Series:
+    """
+    This helper function translates the values of a column with a mapping.
+
+    Parameters:
+    column (pd.Series): The column to translate.
+    mapping (dict): The mapping, with the keys
+        - 'values' (dict): The translation of single values.
+        - 'default' (optional): The translation of every other value,
+          other values are kept if it is not given.
+        - 'missing' (optional): The translation of missing values,
+          the 'default' if it is not given, NaN otherwise.
+
+    Returns:
+    pd.Series: The translated column.
+    """
+    values = mapping.get('values', {})
+    keep = object()
+    default = mapping.get('default', keep)
+    missing = mapping.get('missing',
+                          np.nan if default is keep else default)
+
+    # Translate the distinct values, missing values get the code -1
+    codes, uniques = pd.factorize(column)
+    translated = [values.get(value, value if default is keep else default)
+                  for value in uniques]
+    # The last entry is picked by the code -1 of the missing values
+    lookup = np.array(translated + [missing], dtype=object)
+    return pd.Series(lookup[codes], index=column.index, name=column.name)
 
 
 if __name__ == "__main__":
-    final_urls_dataframe = df_creating('app/final.csv')
+    final_urls_dataframe = df_creating('app/final.feather')
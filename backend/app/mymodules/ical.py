@@ -0,0 +1,194 @@
+"""
+Backend module to export lectures as an iCalendar (RFC 5545) feed.
+
+The lectures are written as VEVENTs in the Europe/Rome timezone, with
+the VTIMEZONE of its current daylight saving rules, CRLF line endings,
+escaped text values and content lines folded at 75 octets. Every event
+has a UID derived from the IMPEGNO_ID of its lecture, which does not
+change when the lecture is rescheduled or moved to another room, so
+that calendar clients subscribed to a feed update the lectures in place.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+import pandas as pd
+
+from .snapshot import display_frame
+
+# Timezone of the lecture times
+CALENDAR_TIMEZONE = "Europe/Rome"
+
+# Identifier of the product writing the feed
+PRODUCT_ID = "-//forerunners-lspd-project//Unive calendar//EN"
+
+# Domain of the event UIDs
+UID_DOMAIN = "calendar.unive.it"
+
+# Lectures written at a time
+CHUNK_ROWS = 5000
+
+# Maximum octets of a content line, without the CRLF
+LINE_OCTETS = 75
+
+# Europe/Rome daylight saving rules, in force since 1996
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{CALENDAR_TIMEZONE}",
+    "BEGIN:DAYLIGHT",
+    "TZNAME:CEST",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "DTSTART:19960331T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZNAME:CET",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "DTSTART:19961027T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+
+def escape_text(value: str) -> str:
+    """
+    Escape a TEXT property value.
+
+    Args:
+        value (str): The value.
+
+    Returns:
+        str: The value with backslashes, semicolons, commas and newlines
+        escaped.
+    """
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n")
+            .replace("\n", "\\n"))
+
+
+def content_line(line: str) -> bytes:
+    """
+    Encode a content line, folded at LINE_OCTETS octets.
+
+    The line is never split inside a multi-byte UTF-8 character.
+
+    Args:
+        line (str): The unfolded content line.
+
+    Returns:
+        bytes: The UTF-8 encoded line, with its CRLF.
+    """
+    encoded = line.encode("utf-8")
+    pieces = []
+    limit = LINE_OCTETS
+    while len(encoded) > limit:
+        cut = limit
+        # Step back to the first byte of a character
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut])
+        encoded = encoded[cut:]
+        # Continuation lines start with a space
+        limit = LINE_OCTETS - 1
+    pieces.append(encoded)
+    return b"\r\n ".join(pieces) + b"\r\n"
+
+
+def event_uid(lecture: dict) -> str:
+    """
+    Derive a stable UID from a lecture.
+
+    Args:
+        lecture (dict): The lecture, as plain values.
+
+    Returns:
+        str: The UID, the same in every snapshot holding the lecture.
+    """
+    if lecture.get("IMPEGNO_ID") is not None:
+        return f"lecture-{lecture['IMPEGNO_ID']}@{UID_DOMAIN}"
+    # Snapshots published without IMPEGNO_ID, until the next build
+    identity = "|".join(str(lecture.get(column)) for column in [
+        "AF_ID", "PARTITION", "START_ISO8601", "END_ISO8601",
+        "CLASSROOM_NAME"])
+    digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+    return f"{digest}@{UID_DOMAIN}"
+
+
+def event_lines(lecture: dict, dtstamp: str) -> list:
+    """
+    Write the content lines of the VEVENT of a lecture.
+
+    Args:
+        lecture (dict): The lecture, as plain values, missing ones as None.
+        dtstamp (str): The DTSTAMP of the event, in UTC.
+
+    Returns:
+        list[str]: The unfolded content lines.
+    """
+    lines = ["BEGIN:VEVENT",
+             f"UID:{event_uid(lecture)}",
+             f"DTSTAMP:{dtstamp}",
+             f"DTSTART;TZID={CALENDAR_TIMEZONE}:{lecture['DTSTART']}",
+             f"DTEND;TZID={CALENDAR_TIMEZONE}:{lecture['DTEND']}"]
+    if lecture.get("TEACHING") is not None:
+        lines.append(f"SUMMARY:{escape_text(lecture['TEACHING'])}")
+
+    description = [f"{label}: {lecture[column]}" for label, column in [
+        ("Professor", "LECTURER_NAME"), ("Classroom", "CLASSROOM_NAME"),
+        ("Location", "LOCATION_NAME"), ("Details", "URL_DOCENTE")]
+        if lecture.get(column) is not None]
+    if description:
+        description = escape_text("\n".join(description))
+        lines.append(f"DESCRIPTION:{description}")
+    if lecture.get("ADDRESS") is not None:
+        lines.append(f"LOCATION:{escape_text(lecture['ADDRESS'])}")
+    if lecture.get("URLS_INSEGNAMENTO") is not None:
+        lines.append(f"URL:{lecture['URLS_INSEGNAMENTO']}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def calendar_chunks(lectures: pd.DataFrame, published: datetime,
+                    name: str = None):
+    """
+    Write lectures as an iCalendar feed, CHUNK_ROWS lectures at a time.
+
+    Args:
+        lectures (pd.DataFrame): The typed lectures, in the event order.
+            A lecture repeated on several rows is written once.
+        published (datetime): The publication date of the snapshot, used
+            as the DTSTAMP of every event so that the feed of a snapshot
+            never changes.
+        name (str, optional): The name of the calendar.
+
+    Yields:
+        bytes: The pieces of the feed.
+    """
+    if published.tzinfo is None:
+        published = published.astimezone()
+    dtstamp = published.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODUCT_ID}",
+              "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    if name is not None:
+        header.append(f"X-WR-CALNAME:{escape_text(name)}")
+    header.append(f"X-WR-TIMEZONE:{CALENDAR_TIMEZONE}")
+    yield b"".join(content_line(line) for line in header + VTIMEZONE)
+
+    # Every UID is unique in a feed
+    if "IMPEGNO_ID" in lectures.columns:
+        lectures = lectures[~lectures["IMPEGNO_ID"].duplicated()]
+    for start in range(0, len(lectures), CHUNK_ROWS):
+        chunk = lectures.iloc[start:start + CHUNK_ROWS]
+        records = display_frame(chunk).astype(object).where(
+            chunk.notna(), None)
+        records = records.assign(
+            DTSTART=chunk["START_ISO8601"].dt.strftime("%Y%m%dT%H%M%S"),
+            DTEND=chunk["END_ISO8601"].dt.strftime("%Y%m%dT%H%M%S"))
+        yield b"".join(content_line(line)
+                       for lecture in records.to_dict(orient="records")
+                       for line in event_lines(lecture, dtstamp))
+
+    yield content_line("END:VCALENDAR")
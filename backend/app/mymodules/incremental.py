@@ -0,0 +1,204 @@
+"""
+Backend module to rebuild the calendar DataFrame incrementally.
+
+After every build the raw lectures feed and the final table, keyed by
+IMPEGNO_ID, are saved as Feather files together with a JSON fingerprint
+of every other source and of the pipeline itself. When the next build finds the other sources
+and the pipeline unchanged, only the lectures that were inserted, updated
+or deleted since then go through the joins and the enrichment stages,
+and the saved final table is patched.
+
+The final table is kept sorted by IMPEGNO_ID, so a patched table has the
+same rows in the same order as a full rebuild.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+
+from . import source_cache
+
+logger = logging.getLogger(__name__)
+
+# Column identifying a lecture in the sitows lectures feed
+LECTURE_KEY = "IMPEGNO_ID"
+
+# Version of the stages building the final rows, to be increased with
+# every change of their code so that the next build is a full one
+PIPELINE_VERSION = 1
+
+# Name of the state directory inside the source cache directory
+STATE_DIRNAME = "incremental"
+
+# Files of the state: the fingerprints, the raw lectures feed and the
+# keyed final table, in plain JSON and Feather
+STATE_FILES = ("state.json", "lectures.feather", "final.feather")
+
+# Directory where the state of the last build is saved
+STATE_DIR = os.path.join(source_cache.CACHE_DIR, STATE_DIRNAME)
+
+
+def cache_state_dir(cache_dir: str) -> str:
+    """
+    Locate the state directory of a source cache directory.
+
+    Args:
+        cache_dir (str): The source cache directory, may be None.
+
+    Returns:
+        str: The state directory, None without a cache directory: the
+        state is then neither loaded nor saved.
+    """
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, STATE_DIRNAME)
+
+
+def source_fingerprints(frames: dict, config: dict = None,
+                        exclude: tuple = ("lectures",)) -> dict:
+    """
+    Compute a content fingerprint for every source and for the pipeline.
+
+    Args:
+        frames (dict[str, pd.DataFrame]): The raw sources.
+        config (dict, optional): The configuration of the stages (value
+            mappings, join plan, schema...), fingerprinted with
+            PIPELINE_VERSION under the 'pipeline' key.
+        exclude (tuple[str]): Sources that are diffed row by row instead.
+
+    Returns:
+        dict[str, str]: The SHA-1 fingerprint of every source.
+    """
+    pipeline = repr((PIPELINE_VERSION, config)).encode("utf-8")
+    fingerprints = {"pipeline": hashlib.sha1(pipeline).hexdigest()}
+    for name, frame in frames.items():
+        if name in exclude:
+            continue
+        digest = hashlib.sha1(repr(list(frame.columns)).encode("utf-8"))
+        digest.update(
+            pd.util.hash_pandas_object(frame, index=False).to_numpy())
+        fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+
+def load_state(state_dir: str = STATE_DIR) -> dict:
+    """
+    Load the state saved by the last build.
+
+    Args:
+        state_dir (str): The state directory.
+
+    Returns:
+        dict: The 'fingerprints' of the sources, the raw 'lectures' feed
+        and the keyed 'final' table, or None if there is no usable state.
+    """
+    paths = [os.path.join(state_dir, name) for name in STATE_FILES]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    with open(paths[0], encoding="utf-8") as state_file:
+        fingerprints = json.load(state_file)
+    return {
+        "fingerprints": fingerprints,
+        "lectures": pd.read_feather(paths[1]),
+        "final": pd.read_feather(paths[2]),
+    }
+
+
+def save_state(fingerprints: dict, lectures: pd.DataFrame,
+               final: pd.DataFrame, state_dir: str = STATE_DIR) -> None:
+    """
+    Save the state of a build for the next incremental refresh.
+
+    Args:
+        fingerprints (dict[str, str]): The fingerprints of the sources.
+        lectures (pd.DataFrame): The raw lectures feed.
+        final (pd.DataFrame): The final table keyed by LECTURE_KEY.
+        state_dir (str): The state directory.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, "state.json")
+
+    # Invalidate the old state before touching the frames
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    for frame, name in [(lectures, STATE_FILES[1]), (final, STATE_FILES[2])]:
+        frame.reset_index(drop=True).to_feather(
+            os.path.join(state_dir, name))
+    with open(state_path, "w", encoding="utf-8") as state_file:
+        json.dump(fingerprints, state_file)
+
+
+def diff_lectures(old: pd.DataFrame, new: pd.DataFrame) -> tuple:
+    """
+    Compare two versions of the lectures feed by LECTURE_KEY.
+
+    Args:
+        old (pd.DataFrame): The lectures feed of the last build.
+        new (pd.DataFrame): The current lectures feed.
+
+    Returns:
+        tuple[pd.DataFrame, pd.Index]: The inserted or updated lectures
+        of the new feed, and the keys of the lectures to remove from the
+        final table (deleted or updated ones). None if the two feeds
+        cannot be compared key by key.
+    """
+    old_keyed = old.set_index(LECTURE_KEY)
+    new_keyed = new.set_index(LECTURE_KEY)
+
+    # A changed schema or a non unique key needs a full rebuild
+    if list(old_keyed.columns) != list(new_keyed.columns):
+        return None
+    if not (old_keyed.index.is_unique and new_keyed.index.is_unique):
+        return None
+
+    deleted = old_keyed.index.difference(new_keyed.index)
+    inserted = new_keyed.index.difference(old_keyed.index)
+    common = new_keyed.index.intersection(old_keyed.index)
+
+    # A lecture is updated if any of its fields differs (NaN == NaN)
+    old_common = old_keyed.loc[common]
+    new_common = new_keyed.loc[common]
+    differs = ((old_common != new_common)
+               & ~(old_common.isna() & new_common.isna())).any(axis=1)
+    updated = common[differs.to_numpy()]
+
+    logger.info("Lectures diff: %d inserted, %d updated, %d deleted",
+                len(inserted), len(updated), len(deleted))
+
+    changed = new[new[LECTURE_KEY].isin(inserted.union(updated))]
+    return changed, deleted.union(updated)
+
+
+def patch_final(final: pd.DataFrame, removed: pd.Index,
+                new_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply a lectures diff to the final table of the last build.
+
+    Args:
+        final (pd.DataFrame): The final table keyed by LECTURE_KEY.
+        removed (pd.Index): The keys of the lectures to remove.
+        new_rows (pd.DataFrame): The final rows of the changed lectures.
+
+    Returns:
+        pd.DataFrame: The patched final table, sorted by LECTURE_KEY.
+    """
+    kept = final[~final[LECTURE_KEY].isin(removed)]
+    if new_rows.empty:
+        return sort_final(kept)
+    return sort_final(pd.concat([kept, new_rows], ignore_index=True))
+
+
+def sort_final(final: pd.DataFrame) -> pd.DataFrame:
+    """
+    Put a final table in its canonical order.
+
+    Args:
+        final (pd.DataFrame): The final table keyed by LECTURE_KEY.
+
+    Returns:
+        pd.DataFrame: The table sorted by LECTURE_KEY, with a new index.
+    """
+    return final.sort_values(LECTURE_KEY, kind="stable",
+                             ignore_index=True)
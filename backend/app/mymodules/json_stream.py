@@ -0,0 +1,165 @@
+"""
+Backend module to parse large sitows JSON arrays incrementally.
+
+The whole response is never held in memory: the array is decoded one
+object at a time from the downloaded chunks and every field is appended
+to a column buffer, so that only the final columns survive the parsing.
+Integer and float fields are kept in typed arrays until a value of a
+different type shows up.
+"""
+
+import codecs
+import json
+from array import array
+import numpy as np
+import pandas as pd
+
+# Size of the chunks read from the HTTP response
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+
+
+class _ColumnBuffer:
+    """
+    Buffer holding the values of a single column.
+
+    Values are stored in an array('q') or array('d') while they are all
+    integers or all floats, and in a plain list otherwise.
+    """
+
+    def __init__(self, missing: int = 0):
+        # Rows parsed before the column first appeared are missing
+        self.values = [None] * missing
+
+    def append(self, value) -> None:
+        values = self.values
+        if isinstance(values, array):
+            if type(value) is int and values.typecode == "q":
+                try:
+                    values.append(value)
+                    return
+                except OverflowError:
+                    pass
+            elif type(value) is float and values.typecode == "d":
+                values.append(value)
+                return
+            # A value of another type, fall back to a list
+            self.values = values = values.tolist()
+        elif not values:
+            if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+                self.values = array("q", [value])
+                return
+            if type(value) is float:
+                self.values = array("d", [value])
+                return
+        values.append(value)
+
+    def to_series(self) -> pd.Series:
+        if isinstance(self.values, array):
+            dtype = np.int64 if self.values.typecode == "q" else np.float64
+            return pd.Series(np.frombuffer(self.values, dtype=dtype))
+        return pd.Series(self.values)
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a JSON array read from a sequence of chunks.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded JSON document.
+
+    Yields:
+        The decoded elements of the top level array, one at a time.
+
+    Raises:
+        ValueError: If the document is not a JSON array of objects.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    exhausted = False
+    started = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    while True:
+        # Skip whitespace, reading more data if the buffer runs out
+        while pos < len(buffer) and buffer[pos] in _whitespace:
+            pos += 1
+        if pos == len(buffer):
+            if read_more():
+                continue
+            raise ValueError("Unexpected end of JSON array")
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+        elif char == "]":
+            return
+        elif char == ",":
+            pos += 1
+        else:
+            try:
+                element, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element is split across chunks
+                if read_more():
+                    continue
+                raise
+            if not isinstance(element, dict):
+                raise ValueError("Expected a JSON array of objects")
+            pos = end
+            yield element
+
+
+def read_json_columns(chunks, skip_fields=()) -> pd.DataFrame:
+    """
+    Parse a JSON array of objects straight into a DataFrame.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded JSON array.
+        skip_fields (Iterable[str]): Fields that are not needed and are
+        dropped while parsing.
+
+    Returns:
+        pd.DataFrame: A DataFrame with a column for every kept field.
+    """
+    skip_fields = frozenset(skip_fields)
+    columns = {}
+    rows = 0
+    for element in iter_json_array(chunks):
+        appended = 0
+        for field, value in element.items():
+            if field in skip_fields:
+                continue
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = _ColumnBuffer(rows)
+            column.append(value)
+            appended += 1
+        rows += 1
+        # Pad the columns missing from this object
+        if appended < len(columns):
+            for column in columns.values():
+                if len(column.values) < rows:
+                    column.append(None)
+
+    return pd.DataFrame({field: column.to_series()
+                         for field, column in columns.items()})
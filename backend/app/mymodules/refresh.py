@@ -0,0 +1,223 @@
+"""
+Backend module to refresh the calendar DataFrame in the background.
+
+The scheduler rebuilds the snapshot on a background thread, so that the
+requests are always served from the current snapshot and never wait for
+the sitows downloads or the pandas pipeline. A new snapshot is published
+only when a build completes successfully; failed builds are retried with
+exponential backoff while the old snapshot keeps being served.
+"""
+
+import contextlib
+import fcntl
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Periodically build a new snapshot and publish it.
+
+    Attributes:
+    build (Callable[[], object]): Function building a new snapshot,
+        it may return None when there is nothing to publish.
+    publish (Callable[[object], None]): Function publishing a snapshot.
+    interval (float): Seconds between two refreshes.
+    jitter (float): Maximum random seconds added to or removed from
+        the interval, so that several instances do not refresh together.
+    retries (int): Number of retries after a failed build.
+    backoff (float): Seconds before the first retry, doubled every retry.
+    last_success (float): Epoch time of the last successful refresh.
+    last_error (Exception): Error of the last failed build, if any.
+    """
+
+    def __init__(self, build, publish, interval: float,
+                 jitter: float = 0, retries: int = 3,
+                 backoff: float = 60):
+        self.build = build
+        self.publish = publish
+        self.interval = interval
+        self.jitter = jitter
+        self.retries = retries
+        self.backoff = backoff
+        self.last_success = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self) -> float:
+        """
+        Compute the seconds to wait before the next refresh.
+
+        Returns:
+            float: The interval with a random jitter applied.
+        """
+        return max(0, self.interval + random.uniform(-self.jitter,
+                                                     self.jitter))
+
+    def refresh(self) -> bool:
+        """
+        Build and publish a snapshot, retrying failed builds.
+
+        Returns:
+            bool: True if a new snapshot was published.
+        """
+        snapshot = None
+        for attempt in range(self.retries + 1):
+            try:
+                snapshot = self.build()
+            except Exception as error:
+                self.last_error = error
+                logger.exception("Snapshot build failed (attempt %d/%d)",
+                                 attempt + 1, self.retries + 1)
+                # Wait before retrying, unless the scheduler is stopped
+                if attempt < self.retries and self._stop.wait(
+                        self.backoff * 2 ** attempt):
+                    return False
+                continue
+            self.last_error = None
+            break
+        if snapshot is None:
+            return False
+        self.publish(snapshot)
+        self.last_success = time.time()
+        return True
+
+    def start(self, initial_delay: float = None) -> None:
+        """
+        Start refreshing on a daemon thread.
+
+        Args:
+            initial_delay (float, optional): Seconds before the first
+            refresh, a full interval by default.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if initial_delay is None:
+            initial_delay = self.next_delay()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(initial_delay,),
+            name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stop the refresh thread.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, delay: float) -> None:
+        while not self._stop.wait(delay):
+            self.refresh()
+            delay = self.next_delay()
+
+
+class SnapshotWatcher:
+    """
+    Reload a snapshot file whenever it is replaced.
+
+    Every worker process runs a watcher, so that a snapshot published by
+    any of them with an atomic file swap is picked up by all the others
+    without a restart.
+
+    Attributes:
+    path (str): The path of the snapshot file.
+    load (Callable[[], None]): Function loading the snapshot file.
+    interval (float): Seconds between two checks of the file.
+    """
+
+    def __init__(self, path: str, load, interval: float = 5):
+        self.path = path
+        self.load = load
+        self.interval = interval
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self) -> tuple:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """
+        Load the snapshot file if it changed since the last check.
+
+        Returns:
+            bool: True if the snapshot was reloaded.
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Could not load snapshot %s", self.path)
+            return False
+        self._signature = signature
+        return True
+
+    def start(self) -> None:
+        """
+        Start checking the snapshot file on a daemon thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="snapshot-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stop the watcher thread.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """
+    Try to take an exclusive lock on a file without waiting.
+
+    Used so that only one of the worker processes sharing a snapshot
+    rebuilds it.
+
+    Args:
+        path (str): The path of the lock file.
+
+    Yields:
+        bool: True if the lock was taken.
+    """
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,273 @@
+"""
+Backend module to cache the encoded responses of the API.
+
+The query endpoints answer the same few requests over and over until a
+new snapshot is published. The cache keeps the encoded body of the
+recently used responses, keyed by (snapshot version, route, parameters),
+so that a repeated request sends bytes that are already there instead
+of converting and serializing the lectures again. The cache is bounded
+in bytes and evicts the least recently used bodies first; it is cleared
+when a new snapshot is served, and the version in the keys keeps a body
+of an old snapshot from ever being sent for a new one.
+
+Every body is compressed with gzip and brotli once, on a background
+thread after it is cached, and the variants are kept next to the
+identity encoding: a request gets the smallest encoding it accepts
+without any compression work, and the request that built the body does
+not wait for its compression.
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    # Without brotli, in requirements.txt, bodies are only gzip compressed
+    brotli = None
+
+# Maximum bytes of the cached bodies
+CACHE_BYTES = int(os.environ.get("RESPONSE_CACHE_BYTES", 128 * 1024 * 1024))
+# Smaller bodies are only kept uncompressed
+MIN_COMPRESS_BYTES = int(os.environ.get("MIN_COMPRESS_BYTES", 1024))
+# Compression levels of the cached variants, paid once per body
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 9))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 9))
+
+# Encodings sent by preference when the client accepts several
+PREFERRED_ENCODINGS = ["br", "gzip", "identity"]
+
+
+def compress(body: bytes) -> dict:
+    """
+    Compress a body in every supported encoding.
+
+    Args:
+        body (bytes): The identity encoded body.
+
+    Returns:
+        dict[str, bytes]: The body by encoding, with only the compressed
+        variants smaller than the identity one.
+    """
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return variants
+    # A fixed mtime keeps the gzip variant the same on every worker
+    compressed = {"gzip": gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    for encoding, variant in compressed.items():
+        if len(variant) < len(body):
+            variants[encoding] = variant
+    return variants
+
+
+def choose_encoding(accept_encoding: str, encodings) -> str:
+    """
+    Choose the encoding of a response from the Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header, may be None.
+        encodings (Iterable[str]): The available encodings.
+
+    Returns:
+        str: The preferred encoding accepted by the client, 'identity'
+        if it accepts none of the compressed ones.
+    """
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, parameters = item.strip().partition(";")
+        weight = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    best = "identity"
+    best_weight = 0.0
+    for encoding in PREFERRED_ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in encodings and encoding != "identity" \
+                and weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class ResponseCache:
+    """
+    A least recently used cache of encoded response bodies.
+
+    Attributes:
+    max_bytes (int): Maximum bytes of the cached bodies, counting
+        every encoding.
+    max_entry_bytes (int): Larger bodies are never cached.
+    size (int): Bytes of the cached bodies.
+    hits (int): Number of requests answered from the cache.
+    misses (int): Number of requests whose body was built.
+    evictions (int): Number of bodies evicted to make room.
+    background (bool): Whether the variants are compressed on a
+        background thread, or before put returns.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES,
+                 max_entry_bytes: int = None, background: bool = True):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = (max_bytes // 4 if max_entry_bytes is None
+                                else max_entry_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.background = background
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._compressor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="response-compression")
+
+    def get(self, key: tuple) -> dict:
+        """
+        Look up a body and mark it as recently used.
+
+        Args:
+            key (tuple): The snapshot version, the route and the parameters.
+
+        Returns:
+            dict[str, bytes]: The cached body by encoding, or None.
+        """
+        with self._lock:
+            variants = self._entries.get(key)
+            if variants is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return variants
+
+    def put(self, key: tuple, body: bytes) -> dict:
+        """
+        Cache a body, evicting the least recently used ones if needed,
+        and compress it.
+
+        Args:
+            key (tuple): The snapshot version, the route and the parameters.
+            body (bytes): The encoded body.
+
+        Returns:
+            dict[str, bytes]: The body by encoding. With background
+            compression only the identity one, the compressed variants
+            are added to the cache when they are ready.
+        """
+        if len(body) > self.max_entry_bytes:
+            return {"identity": body}
+        if not self.background:
+            variants = compress(body)
+            with self._lock:
+                self._store(key, variants)
+            return variants
+
+        variants = {"identity": body}
+        with self._lock:
+            self._store(key, variants)
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self._compressor.submit(self._add_variants, key, variants)
+        return variants
+
+    def _add_variants(self, key: tuple, variants: dict) -> None:
+        compressed = compress(variants["identity"])
+        with self._lock:
+            # Skip a body evicted, cleared or replaced in the meantime
+            if self._entries.get(key) is variants:
+                self._store(key, compressed)
+
+    def _store(self, key: tuple, variants: dict) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= _variants_size(previous)
+        self._entries[key] = variants
+        self.size += _variants_size(variants)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= _variants_size(evicted)
+            self.evictions += 1
+
+    def join(self) -> None:
+        """
+        Wait for the compression of the bodies cached so far.
+        """
+        self._compressor.submit(lambda: None).result()
+
+    def get_or_build(self, key: tuple, build) -> dict:
+        """
+        Return a cached body, building and caching it on a miss.
+
+        Args:
+            key (tuple): The snapshot version, the route and the parameters.
+            build (Callable[[], bytes]): Function encoding the body.
+
+        Returns:
+            dict[str, bytes]: The body by encoding.
+        """
+        variants = self.get(key)
+        if variants is None:
+            variants = self.put(key, build())
+        return variants
+
+    def stream(self, key: tuple, chunks):
+        """
+        Send the chunks of a streamed body, caching the whole body once
+        it is complete.
+
+        The chunks are kept only up to max_entry_bytes, so a body too
+        large for the cache is streamed without being held in memory.
+
+        Args:
+            key (tuple): The snapshot version, the route and the parameters.
+            chunks (Iterable[bytes]): The chunks of the body.
+
+        Yields:
+            bytes: The chunks of the body.
+        """
+        kept = []
+        size = 0
+        for chunk in chunks:
+            if kept is not None:
+                size += len(chunk)
+                if size <= self.max_entry_bytes:
+                    kept.append(chunk)
+                else:
+                    kept = None
+            yield chunk
+        if kept is not None:
+            self.put(key, b"".join(kept))
+
+    def clear(self) -> None:
+        """
+        Drop every cached body, when a new snapshot is served.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Describe the use of the cache.
+
+        Returns:
+            dict: The number of 'entries', their 'bytes', the 'max_bytes'
+            and the 'hits', 'misses' and 'evictions' so far.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size,
+                    "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+def _variants_size(variants: dict) -> int:
+    return sum(len(variant) for variant in variants.values())
@@ -0,0 +1,185 @@
+"""
+Backend module to search teachings by name or by lecturer.
+
+The index is built once per snapshot from the distinct TEACHING and
+LECTURER_NAME values. Names are folded (accents removed, case folded,
+punctuation turned into spaces) so that 'economia' finds 'ECONOMÌA'.
+Every word of a name is kept in a sorted list searched by binary search
+for the type-ahead prefix matches, and the trigrams of every name are
+kept in an inverted index for the fuzzy matches of misspelled queries.
+"""
+
+import bisect
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Columns searched, and the field reported for their matches
+SEARCH_COLUMNS = ["TEACHING", "LECTURER_NAME"]
+
+# Shorter queries match too many names to be worth searching
+MIN_QUERY_CHARS = 2
+
+# Minimum trigram similarity of a fuzzy match
+MIN_SIMILARITY = 0.3
+
+# Scores of the matches, fuzzy matches score their similarity below 1
+EXACT_SCORE = 3.0
+NAME_PREFIX_SCORE = 2.0
+WORD_PREFIX_SCORE = 1.0
+
+
+def fold(text: str) -> str:
+    """
+    Fold a name for the comparisons of the search.
+
+    Args:
+        text (str): The name.
+
+    Returns:
+        str: The name without accents, case folded, with single spaces
+        between its words.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(character for character in decomposed
+                       if not unicodedata.combining(character))
+    return " ".join(re.split(r"\W+", stripped.casefold())).strip()
+
+
+def trigrams(folded: str) -> set:
+    """
+    Split a folded name into trigrams.
+
+    Args:
+        folded (str): The folded name.
+
+    Returns:
+        set[str]: The trigrams of the name padded with spaces.
+    """
+    padded = f"  {folded} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    A prefix and trigram index of the teachings and of the lecturers.
+
+    Attributes:
+    entries (list[dict]): The searchable names, each one with its
+        'field', its 'value' and the sorted 'teachings' it leads to.
+    names (list[str]): The folded name of every entry.
+    words (list[tuple]): The sorted (word, entry) pairs of every word
+        of every folded name.
+    postings (dict[str, np.ndarray]): The entries holding every trigram.
+    sizes (np.ndarray): The number of trigrams of every entry.
+    """
+
+    def __init__(self, entries: list):
+        self.entries = entries
+        self.names = [fold(entry["value"]) for entry in entries]
+        self.words = sorted({(word, number)
+                             for number, name in enumerate(self.names)
+                             for word in name.split()})
+
+        postings = {}
+        sizes = []
+        for number, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(number)
+        self.postings = {gram: np.array(numbers, dtype=np.int32)
+                         for gram, numbers in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.int32)
+
+    @classmethod
+    def from_frame(cls, dataframe: pd.DataFrame) -> "SearchIndex":
+        """
+        Index the teachings and the lecturers of a snapshot.
+
+        Args:
+            dataframe (pd.DataFrame): The snapshot.
+
+        Returns:
+            SearchIndex: The index, empty without the searched columns.
+        """
+        if not set(SEARCH_COLUMNS) <= set(dataframe.columns):
+            return cls([])
+        pairs = dataframe[SEARCH_COLUMNS].astype(object).dropna(
+            subset=["TEACHING"]).drop_duplicates()
+        entries = [{"field": "TEACHING", "value": teaching,
+                    "teachings": [teaching]}
+                   for teaching in sorted(pairs["TEACHING"].unique())]
+        for lecturer, teachings in pairs.dropna().groupby(
+                "LECTURER_NAME")["TEACHING"]:
+            entries.append({"field": "LECTURER_NAME", "value": lecturer,
+                            "teachings": sorted(teachings.unique())})
+        return cls(entries)
+
+    def _prefix_matches(self, words: list) -> set:
+        # Scan the words of the longest, most selective, query word only,
+        # the other query words are checked on the names it matched
+        words = sorted(set(words), key=len, reverse=True)
+        matches = set()
+        if len(words[0]) < MIN_QUERY_CHARS:
+            return matches
+        start = bisect.bisect_left(self.words, (words[0], -1))
+        for word, number in self.words[start:]:
+            if not word.startswith(words[0]):
+                break
+            matches.add(number)
+        for query_word in words[1:]:
+            matches = {number for number in matches
+                       if any(word.startswith(query_word)
+                              for word in self.names[number].split())}
+        return matches
+
+    def _similarities(self, folded: str) -> np.ndarray:
+        grams = trigrams(folded)
+        lists = [self.postings[gram] for gram in grams
+                 if gram in self.postings]
+        if not lists:
+            return np.zeros(len(self.entries))
+        shared = np.bincount(np.concatenate(lists),
+                             minlength=len(self.entries))
+        # Jaccard similarity of the trigram sets
+        return shared / (len(grams) + self.sizes - shared)
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Find the names matching a query, best first.
+
+        Exact names come first, then names starting with the query, then
+        names with a word starting with every word of the query, then
+        names with enough trigrams in common with the query.
+
+        Args:
+            query (str): The text typed by the user.
+            limit (int): The maximum number of matches.
+
+        Returns:
+            list[dict]: The matching entries, each one with its 'score',
+            none for a query shorter than MIN_QUERY_CHARS.
+        """
+        folded = fold(query)
+        if len(folded) < MIN_QUERY_CHARS or not self.entries:
+            return []
+
+        scores = {}
+        for number in self._prefix_matches(folded.split()):
+            name = self.names[number]
+            scores[number] = (EXACT_SCORE if name == folded
+                              else NAME_PREFIX_SCORE
+                              if name.startswith(folded)
+                              else WORD_PREFIX_SCORE)
+        if len(scores) < limit:
+            similarities = self._similarities(folded)
+            for number in np.flatnonzero(similarities >= MIN_SIMILARITY):
+                scores.setdefault(int(number), float(similarities[number]))
+
+        ranked = sorted(scores, key=lambda number: (
+            -scores[number], len(self.names[number]), self.names[number]))
+        return [dict(self.entries[number],
+                     score=round(scores[number], 3))
+                for number in ranked[:limit]]
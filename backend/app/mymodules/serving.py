@@ -0,0 +1,395 @@
+"""
+Backend module to serve the calendar snapshot through precomputed indexes.
+
+A ServingSnapshot is built once every time a snapshot is loaded, off the
+request path. It keeps the typed DataFrame together with the indexes
+answering the query endpoints, so that a request reads only the lectures
+it returns instead of scanning every lecture. Reloading a snapshot builds a new
+ServingSnapshot and swaps it in with a single assignment: a request
+always sees one consistent snapshot.
+
+The bodies are serialized with orjson, which writes the same compact
+UTF-8 JSON as fastapi.responses.JSONResponse several times faster.
+"""
+
+import base64
+import json
+import numpy as np
+import orjson
+import pandas as pd
+
+from .ical import calendar_chunks
+from .search import SearchIndex
+from .snapshot import HIDDEN_COLUMNS, display_frame
+
+# Columns filtered by /query/{location}/{degreetype}/{cycle}, in order
+FACET_COLUMNS = ["SITE", "DEGREE_TYPE", "CYCLE"]
+
+# Lectures converted and serialized at a time by /df_show
+CHUNK_ROWS = 5000
+
+
+def encode_json(content) -> bytes:
+    """
+    Serialize content exactly like fastapi.responses.JSONResponse.
+
+    Args:
+        content: The content to serialize.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON body.
+    """
+    return orjson.dumps(content)
+
+
+def encode_cursor(version: str, offset: int) -> str:
+    """
+    Encode the position of the next page of /df_show.
+
+    Args:
+        version (str): The version of the paginated snapshot.
+        offset (int): The position of the first lecture of the page.
+
+    Returns:
+        str: An opaque URL safe cursor.
+    """
+    position = json.dumps([version, offset]).encode("utf-8")
+    return base64.urlsafe_b64encode(position).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor returned by encode_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple[str, int]: The snapshot version and the offset.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        version, offset = json.loads(base64.urlsafe_b64decode(
+            cursor.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return version, offset
+
+
+# Body of a combination without teachings, an empty object in a string
+EMPTY_FACET_BODY = encode_json(json.dumps({}))
+
+
+class TimeIndex:
+    """
+    The lectures of every value of a column, sorted by start time.
+
+    The positions of all the lectures are sorted once by value and then
+    by START_ISO8601, so the lectures of a value are a slice of them and
+    the ones starting in a time range are found by binary search.
+
+    Attributes:
+    order (np.ndarray): The positions of the lectures, sorted by value,
+        start time and position.
+    starts (np.ndarray): The datetime64 start times, in the same order.
+    offsets (dict[object, tuple]): The (begin, end) slice of order
+        holding the lectures of every value.
+    """
+
+    def __init__(self, dataframe: pd.DataFrame, column: str):
+        self.order = np.array([], dtype=np.intp)
+        self.starts = np.array([], dtype="datetime64[ns]")
+        self.offsets = {}
+        if dataframe.empty or column not in dataframe.columns:
+            return
+
+        if isinstance(dataframe[column].dtype, pd.CategoricalDtype):
+            codes = dataframe[column].cat.codes.to_numpy()
+            values = dataframe[column].cat.categories
+        else:
+            codes, values = pd.factorize(dataframe[column])
+        if "START_ISO8601" in dataframe.columns:
+            starts = dataframe["START_ISO8601"].to_numpy()
+        else:
+            starts = np.zeros(len(dataframe), dtype="datetime64[ns]")
+
+        # Sort by value, then by start time, then by position
+        self.order = np.lexsort((starts, codes))
+        self.starts = starts[self.order]
+        # Missing values have code -1 and sort first, out of every slice
+        bounds = np.searchsorted(codes[self.order],
+                                 np.arange(len(values) + 1))
+        self.offsets = {value: (begin, end) for value, begin, end
+                        in zip(values, bounds[:-1].tolist(),
+                               bounds[1:].tolist())
+                        if end > begin}
+
+    def __contains__(self, value) -> bool:
+        return value in self.offsets
+
+    def positions(self, value, start=None, end=None) -> np.ndarray:
+        """
+        Find the lectures of a value starting in a time range.
+
+        Args:
+            value: The value of the column.
+            start (np.datetime64, optional): The first start time included.
+            end (np.datetime64, optional): The first start time excluded.
+
+        Returns:
+            np.ndarray: The positions of the lectures in time order, or
+            None for an unknown value.
+        """
+        bounds = self.offsets.get(value)
+        if bounds is None:
+            return None
+        begin, stop = bounds
+        starts = self.starts[begin:stop]
+        first = 0 if start is None else np.searchsorted(starts, start)
+        last = len(starts) if end is None else np.searchsorted(starts, end)
+        return self.order[begin + first:begin + max(first, last)]
+
+
+class ServingSnapshot:
+    """
+    A snapshot of the lectures with the indexes of the query endpoints.
+
+    Attributes:
+    dataframe (pd.DataFrame): The typed snapshot.
+    columns (list[str]): The columns served by the API, all of them but
+        the HIDDEN_COLUMNS.
+    teaching_index (TimeIndex): The lectures of every teaching.
+    af_id_index (TimeIndex): The lectures of every AF_ID.
+    search_index (SearchIndex): The teachings and the lecturers searched
+        by /search.
+    facet_bodies (dict[tuple, bytes]): The JSON body answered by
+        /query/{location}/{degreetype}/{cycle} for every combination
+        of SITE, DEGREE_TYPE and CYCLE.
+    creation_date (str): The publication date of the snapshot.
+    version (str): An identifier of the snapshot, changing whenever a
+        new one is published.
+    facets (dict): The sorted distinct values of every facet column and
+        the creation date, answered by /facets.
+    facets_body (bytes): The facets as a ready to send JSON body.
+    """
+
+    def __init__(self, dataframe: pd.DataFrame, creation_date: str = None,
+                 version: str = None):
+        self.dataframe = dataframe
+        self.columns = [column for column in dataframe.columns
+                        if column not in HIDDEN_COLUMNS]
+        self.creation_date = creation_date
+        self.version = version
+        self.teaching_index = TimeIndex(dataframe, "TEACHING")
+        self.af_id_index = TimeIndex(dataframe, "AF_ID")
+        self.search_index = SearchIndex.from_frame(dataframe)
+        self.facet_bodies = self._facet_bodies()
+        self.facets = self._facets()
+        self.facets_body = encode_json(self.facets)
+
+    def _facet_bodies(self) -> dict:
+        if not set(FACET_COLUMNS + ["TEACHING"]) <= set(self.dataframe):
+            return {}
+        # One row for every teaching of every combination
+        teachings = self.dataframe[FACET_COLUMNS].astype(object).assign(
+            TEACHING=self.dataframe["TEACHING"].astype(object).fillna("null"))
+        teachings = teachings.dropna().drop_duplicates()
+
+        facet_bodies = {}
+        for facet, names in teachings.groupby(FACET_COLUMNS,
+                                              sort=False)["TEACHING"]:
+            # The teachings are sent as a JSON string holding an object
+            # sorted by name, as the endpoint always did
+            names = sorted(names)
+            facet_bodies[facet] = encode_json(
+                json.dumps({name: name for name in names}))
+        return facet_bodies
+
+    def _facets(self) -> dict:
+        facets = {}
+        for column in FACET_COLUMNS:
+            if column in self.dataframe:
+                values = self.dataframe[column].dropna().unique()
+                facets[column] = sorted(str(value) for value in values)
+            else:
+                facets[column] = []
+        facets["creation_date"] = self.creation_date
+        return facets
+
+    def teaching_body(self, teaching: str, start=None, end=None) -> bytes:
+        """
+        Serialize the lectures of a teaching as a JSON body.
+
+        Only the lectures of the teaching are converted, so the body is
+        cheap to build on a cache miss.
+
+        Args:
+            teaching (str): The name of the teaching.
+            start (np.datetime64, optional): The first start time included.
+            end (np.datetime64, optional): The first start time excluded.
+
+        Returns:
+            bytes: The lectures by row label, with missing values as the
+            string 'null', '{}' for an unknown teaching.
+        """
+        positions = self.teaching_index.positions(teaching, start, end)
+        if positions is None or len(positions) == 0:
+            return b"{}"
+        # Keep the lectures in the order of the snapshot
+        lectures = display_frame(self.dataframe.iloc[np.sort(
+            positions)][self.columns]).fillna("null")
+        labels = [str(label) for label in lectures.index]
+        return encode_json(dict(zip(labels, lectures.to_dict(
+            orient="records"))))
+
+    def facet_body(self, location: str, degree_type: str,
+                   cycle: str) -> bytes:
+        """
+        Return the teachings of a combination as a ready to send JSON body.
+
+        Args:
+            location (str): The SITE of the teachings.
+            degree_type (str): The DEGREE_TYPE of the teachings.
+            cycle (str): The CYCLE of the teachings.
+
+        Returns:
+            bytes: A JSON string holding the sorted teachings as an object,
+            '"{}"' for a combination without teachings.
+        """
+        return self.facet_bodies.get((location, degree_type, cycle),
+                                     EMPTY_FACET_BODY)
+
+    def encoded_records(self, start: int, stop: int,
+                        fields: list = None):
+        """
+        Serialize lectures as JSON objects, CHUNK_ROWS lectures at a time.
+
+        Only one chunk of lectures is converted to plain values at a
+        time, so the memory used does not depend on the number of
+        lectures serialized.
+
+        Args:
+            start (int): The position of the first lecture.
+            stop (int): The position after the last lecture.
+            fields (list[str], optional): The columns to serialize, in
+                order, all the served columns by default.
+
+        Yields:
+            list[bytes]: The JSON objects of the lectures of a chunk, with
+            missing values as the string 'null'.
+        """
+        for chunk_start in range(start, stop, CHUNK_ROWS):
+            chunk = self.dataframe.iloc[
+                chunk_start:min(chunk_start + CHUNK_ROWS, stop)]
+            chunk = chunk[self.columns if fields is None else fields]
+            records = display_frame(chunk).fillna("null").to_dict(
+                orient="records")
+            yield [encode_json(record) for record in records]
+
+    def json_chunks(self, start: int, stop: int, fields: list = None):
+        """
+        Serialize lectures as a JSON array, one chunk at a time.
+
+        Args:
+            start (int): The position of the first lecture.
+            stop (int): The position after the last lecture.
+            fields (list[str], optional): The columns to serialize.
+
+        Yields:
+            bytes: The pieces of the array, together byte for byte the
+            JSONResponse body of the list of lectures.
+        """
+        separator = b"["
+        for records in self.encoded_records(start, stop, fields):
+            if records:
+                yield separator + b",".join(records)
+                separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+
+    def ndjson_chunks(self, start: int, stop: int, fields: list = None):
+        """
+        Serialize lectures as newline delimited JSON, one chunk at a time.
+
+        Args:
+            start (int): The position of the first lecture.
+            stop (int): The position after the last lecture.
+            fields (list[str], optional): The columns to serialize.
+
+        Yields:
+            bytes: The lines of the lectures of a chunk.
+        """
+        for records in self.encoded_records(start, stop, fields):
+            if records:
+                yield b"\n".join(records) + b"\n"
+
+    def lecture_positions(self, teachings: list, af_ids: list = (),
+                          start=None, end=None) -> np.ndarray:
+        """
+        Find the lectures of some teachings, in time order.
+
+        Args:
+            teachings (list[str]): The names of the teachings, unknown
+                ones are ignored.
+            af_ids (list[int], optional): The AF_IDs of more teachings.
+            start (np.datetime64, optional): The first start time included.
+            end (np.datetime64, optional): The first start time excluded.
+
+        Returns:
+            np.ndarray: The positions of the lectures, each one once,
+            sorted by start time and then by position.
+        """
+        positions = [self.teaching_index.positions(teaching, start, end)
+                     for teaching in dict.fromkeys(teachings)]
+        positions += [self.af_id_index.positions(af_id, start, end)
+                      for af_id in dict.fromkeys(af_ids)]
+        positions = [found for found in positions if found is not None]
+        if not positions:
+            return np.array([], dtype=np.intp)
+        # A teaching may be asked both by name and by AF_ID
+        positions = np.unique(np.concatenate(positions))
+        if "START_ISO8601" not in self.dataframe.columns:
+            return positions
+        starts = self.dataframe["START_ISO8601"].to_numpy()[positions]
+        return positions[np.argsort(starts, kind="stable")]
+
+    def timetable_body(self, teachings: list, af_ids: list = (),
+                       start=None, end=None, limit: int = None) -> bytes:
+        """
+        Serialize the lectures of some teachings as a JSON list.
+
+        Args:
+            teachings (list[str]): The names of the teachings.
+            af_ids (list[int], optional): The AF_IDs of more teachings.
+            start (np.datetime64, optional): The first start time included.
+            end (np.datetime64, optional): The first start time excluded.
+            limit (int, optional): The maximum number of lectures.
+
+        Returns:
+            bytes: The lectures in time order, with missing values as the
+            string 'null', like the records of /df_show.
+        """
+        positions = self.lecture_positions(teachings, af_ids, start, end)
+        lectures = self.dataframe.iloc[positions[:limit]][self.columns]
+        if lectures.empty:
+            return b"[]"
+        return encode_json(display_frame(lectures).fillna("null").to_dict(
+            orient="records"))
+
+    def ical_chunks(self, teachings: list, published):
+        """
+        Write the lectures of some teachings as an iCalendar feed.
+
+        Args:
+            teachings (list[str]): The names of the teachings.
+            published (datetime): The publication date of the snapshot.
+
+        Yields:
+            bytes: The pieces of the feed, see ical.calendar_chunks.
+        """
+        lectures = self.dataframe.iloc[self.lecture_positions(teachings)]
+        yield from calendar_chunks(lectures, published,
+                                   ", ".join(dict.fromkeys(teachings)))
@@ -0,0 +1,225 @@
+"""
+Backend module to store the calendar DataFrame as a typed snapshot.
+
+The snapshot is a Feather (Arrow IPC) file written with an explicit
+compact schema: repeated strings are dictionary encoded categoricals,
+IDs are int32 and credits int16 (nullable integers if some are missing),
+lecture days are int32 days since the epoch, lecture start and end times
+are int16 minutes of the day and lecture timestamps are datetimes.
+Loading it is a typed columnar read, with no dtype inference and no
+string parsing; display_frame turns the compact values back into the
+strings served by the API.
+
+The file is written uncompressed and read through a read-only memory
+map, so the numeric columns and the categorical codes of a snapshot
+stay in the page cache and are shared by every process reading it.
+"""
+
+import json
+import logging
+import sys
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+
+logger = logging.getLogger(__name__)
+
+# Low cardinality string columns, stored as categoricals
+CATEGORY_COLUMNS = [
+    "TEACHING", "CYCLE", "PARTITION", "SITE", "DEGREE_TYPE",
+    "LECTURER_NAME", "CLASSROOM_NAME", "LOCATION_NAME", "ADDRESS",
+    "URL_DOCENTE", "URLS_INSEGNAMENTO"]
+
+# Identifier columns, stored as int32
+INTEGER_COLUMNS = ["AF_ID", "DOCENTE_ID", "IMPEGNO_ID"]
+
+# Columns kept in the snapshot but not served by the API: the IMPEGNO_ID
+# of every lecture only identifies its iCalendar event
+HIDDEN_COLUMNS = ["IMPEGNO_ID"]
+
+# Small whole number columns, stored as int16
+SMALL_INTEGER_COLUMNS = ["CREDITS"]
+
+# 'YYYY-MM-DD' columns, stored as int32 days since 1970-01-01
+EPOCH_DAY_COLUMNS = ["LECTURE_DAY"]
+
+# 'HH:MM' columns, stored as int16 minutes since midnight
+MINUTE_COLUMNS = ["LECTURE_START", "LECTURE_END"]
+
+# 'HH:MM' label of every minute of the day
+_MINUTE_LABELS = np.array([f"{minute // 60:02d}:{minute % 60:02d}"
+                           for minute in range(24 * 60)], dtype=object)
+
+# ISO 8601 timestamp columns, stored as datetimes
+DATETIME_COLUMNS = ["START_ISO8601", "END_ISO8601"]
+
+
+def apply_schema(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the final DataFrame to the snapshot schema.
+
+    Args:
+        dataframe (pd.DataFrame): The final DataFrame of the pipeline.
+
+    Returns:
+        pd.DataFrame: A typed copy of the DataFrame.
+    """
+    typed = dataframe.reset_index(drop=True)
+    for column in CATEGORY_COLUMNS:
+        if column in typed.columns:
+            # Empty strings are missing values, as they were in the CSV
+            typed[column] = typed[column].replace("", np.nan).astype(
+                "category")
+    for column in INTEGER_COLUMNS:
+        if column in typed.columns:
+            typed[column] = integer_column(typed[column], "int32")
+    for column in SMALL_INTEGER_COLUMNS:
+        if column in typed.columns:
+            typed[column] = integer_column(typed[column], "int16")
+    for column in EPOCH_DAY_COLUMNS:
+        if column in typed.columns:
+            days = pd.to_datetime(typed[column], format="%Y-%m-%d")
+            typed[column] = days.to_numpy(
+                dtype="datetime64[D]").astype("int32")
+    for column in MINUTE_COLUMNS:
+        if column in typed.columns:
+            times = pd.to_datetime(typed[column], format="%H:%M")
+            typed[column] = (times.dt.hour * 60
+                             + times.dt.minute).astype("int16")
+    for column in DATETIME_COLUMNS:
+        if column in typed.columns:
+            typed[column] = pd.to_datetime(
+                typed[column], format="%Y-%m-%dT%H:%M:%S")
+    return typed
+
+
+def integer_column(values: pd.Series, dtype: str) -> pd.Series:
+    """
+    Convert a column of whole numbers to an integer dtype.
+
+    Args:
+        values (pd.Series): The column.
+        dtype (str): The numpy integer dtype, 'int32' or 'int16'.
+
+    Returns:
+        pd.Series: The column as dtype, or as the nullable pandas dtype
+        ('Int32', 'Int16') if some values are missing.
+    """
+    missing = int(values.isna().sum())
+    if not missing:
+        return values.astype(dtype)
+    logger.warning("Column %s has %d missing values", values.name, missing)
+    return values.astype(dtype.capitalize())
+
+
+def write_snapshot(dataframe: pd.DataFrame, path: str) -> pd.DataFrame:
+    """
+    Write the final DataFrame to a snapshot file.
+
+    Args:
+        dataframe (pd.DataFrame): The final DataFrame of the pipeline.
+        path (str): The path of the snapshot file.
+
+    Returns:
+        pd.DataFrame: The typed DataFrame that was written.
+    """
+    typed = apply_schema(dataframe)
+    # Uncompressed buffers can be memory mapped without decoding
+    typed.to_feather(path, compression="uncompressed")
+    return typed
+
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    """
+    Read a snapshot file through a read-only memory map.
+
+    The columns without missing values point straight into the mapped
+    file instead of being copied. Replacing the file with os.replace is
+    safe: the mapped file stays alive until the DataFrame is released.
+
+    Args:
+        path (str): The path of the snapshot file.
+
+    Returns:
+        pd.DataFrame: The typed DataFrame.
+    """
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def format_iso(timestamps: pd.Series) -> pd.Series:
+    """
+    Format a datetime column as ISO 8601 strings without time zone.
+
+    Args:
+        timestamps (pd.Series): The datetime column.
+
+    Returns:
+        pd.Series: The 'YYYY-MM-DDTHH:MM:SS' strings, NaN for missing values.
+    """
+    values = timestamps.to_numpy(dtype="datetime64[s]")
+    formatted = np.datetime_as_string(values, unit="s").astype(object)
+    formatted[np.isnat(values)] = np.nan
+    return pd.Series(formatted, index=timestamps.index,
+                     name=timestamps.name)
+
+
+def display_frame(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a typed snapshot, or a slice of it, back to plain values
+    ready to be serialized as JSON.
+
+    Args:
+        dataframe (pd.DataFrame): The typed DataFrame.
+
+    Returns:
+        pd.DataFrame: A DataFrame with strings instead of categoricals,
+        'YYYY-MM-DD' days, 'HH:MM' times and ISO 8601 strings instead
+        of datetimes.
+    """
+    display = dataframe.copy(deep=False)
+    for column in display.columns:
+        if isinstance(display[column].dtype, pd.CategoricalDtype):
+            display[column] = display[column].astype(object)
+        elif (pd.api.types.is_extension_array_dtype(display[column])
+              and pd.api.types.is_integer_dtype(display[column])):
+            # Missing values of the nullable integers as NaN
+            display[column] = display[column].astype(object).where(
+                display[column].notna(), np.nan)
+        elif column in DATETIME_COLUMNS:
+            display[column] = format_iso(display[column])
+        elif column in EPOCH_DAY_COLUMNS:
+            days = display[column].to_numpy().astype("datetime64[D]")
+            display[column] = np.datetime_as_string(days).astype(object)
+        elif column in MINUTE_COLUMNS:
+            display[column] = _MINUTE_LABELS[display[column].to_numpy()]
+    return display
+
+
+def memory_report(dataframe: pd.DataFrame) -> dict:
+    """
+    Measure the memory used by a snapshot.
+
+    Args:
+        dataframe (pd.DataFrame): The typed DataFrame.
+
+    Returns:
+        dict: The number of 'rows', the 'total_bytes', the
+        'bytes_per_lecture' and the bytes used by every column.
+    """
+    columns = dataframe.memory_usage(index=False, deep=True)
+    total_bytes = int(columns.sum())
+    rows = len(dataframe)
+    return {
+        "rows": rows,
+        "total_bytes": total_bytes,
+        "bytes_per_lecture": round(total_bytes / rows, 2) if rows else 0,
+        "columns": {column: int(size) for column, size in columns.items()},
+    }
+
+
+if __name__ == "__main__":
+    # Print the memory report of a snapshot file, app/final.feather
+    # by default: python -m app.mymodules.snapshot [path]
+    snapshot_path = sys.argv[1] if len(sys.argv) > 1 else "app/final.feather"
+    print(json.dumps(memory_report(read_snapshot(snapshot_path)), indent=2))
@@ -0,0 +1,124 @@
+"""
+Backend module to cache the sitows responses on disk.
+
+Every cached URL is stored as two files named after the hash of the URL:
+a JSON file with the ETag and Last-Modified validators sent by the server
+and a pickle of the DataFrame already parsed from the response.
+On the next refresh the validators are sent back as a conditional GET,
+so that unchanged sources are answered with 304 Not Modified and reused
+without being downloaded or parsed again.
+"""
+
+import hashlib
+import json
+import os
+import pandas as pd
+
+# Directory where the cached sitows responses are stored
+CACHE_DIR = os.environ.get("SITOWS_CACHE_DIR", "app/cache")
+
+
+def cache_key(url: str) -> str:
+    """
+    Build the file name used to cache a URL.
+
+    Args:
+        url (str): The cached URL.
+
+    Returns:
+        str: The SHA-1 hex digest of the URL.
+    """
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def load_entry(cache_dir: str, url: str) -> dict:
+    """
+    Load the validators stored for a URL.
+
+    Args:
+        cache_dir (str): The cache directory.
+        url (str): The cached URL.
+
+    Returns:
+        dict: The cache entry with 'etag' and 'last_modified' keys,
+        or None if the URL is not cached.
+    """
+    meta_path = os.path.join(cache_dir, cache_key(url) + ".json")
+    frame_path = os.path.join(cache_dir, cache_key(url) + ".pkl")
+    # An entry is usable only if the parsed frame is there as well
+    if not (os.path.exists(meta_path) and os.path.exists(frame_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as meta_file:
+        return json.load(meta_file)
+
+
+def conditional_headers(entry: dict) -> dict:
+    """
+    Build the conditional request headers for a cache entry.
+
+    Args:
+        entry (dict): The cache entry returned by load_entry, or None.
+
+    Returns:
+        dict: The If-None-Match/If-Modified-Since headers to send.
+    """
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def load_frame(cache_dir: str, url: str) -> pd.DataFrame:
+    """
+    Load the parsed DataFrame cached for a URL.
+
+    Args:
+        cache_dir (str): The cache directory.
+        url (str): The cached URL.
+
+    Returns:
+        pd.DataFrame: The DataFrame parsed from the last full response.
+    """
+    return pd.read_pickle(os.path.join(cache_dir, cache_key(url) + ".pkl"))
+
+
+def store(cache_dir: str, url: str, headers: dict,
+          url_df: pd.DataFrame) -> bool:
+    """
+    Cache the parsed DataFrame of a response together with its validators.
+
+    Responses without an ETag or a Last-Modified header are not cached,
+    since they could never be revalidated.
+
+    Args:
+        cache_dir (str): The cache directory.
+        url (str): The requested URL.
+        headers (dict): The response headers.
+        url_df (pd.DataFrame): The DataFrame parsed from the response.
+
+    Returns:
+        bool: True if the response was cached.
+    """
+    entry = {
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+    if not (entry["etag"] or entry["last_modified"]):
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    base_path = os.path.join(cache_dir, cache_key(url))
+
+    # Write to temporary files first so that a crash never leaves
+    # validators pointing to a truncated frame
+    url_df.to_pickle(base_path + ".pkl.tmp")
+    with open(base_path + ".json.tmp", "w", encoding="utf-8") as meta_file:
+        json.dump(entry, meta_file)
+    os.replace(base_path + ".pkl.tmp", base_path + ".pkl")
+    os.replace(base_path + ".json.tmp", base_path + ".json")
+    return True
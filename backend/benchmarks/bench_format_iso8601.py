@@ -0,0 +1,104 @@
+"""
+Benchmark of the format_iso8601 stage of the df_creating.py module.
+
+The vectorized format_iso8601 is compared with the former row by row
+implementation on a full academic year of lectures, and the two outputs
+are checked to be identical.
+
+Execute this benchmark by running on the terminal (from the backend/)
+the command:
+python -m benchmarks.bench_format_iso8601 [lectures]
+"""
+
+import datetime
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from app.mymodules.df_creating import format_iso8601
+
+# Lectures of a full academic year, roughly the size of the sitows feed
+DEFAULT_LECTURES = 120_000
+
+
+def format_iso8601_rowwise(final_urls_dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    The former implementation of format_iso8601, applied row by row.
+
+    Parameters:
+    final_urls_dataframe (pd.DataFrame): The lectures to format.
+
+    Returns:
+    pd.DataFrame: The DataFrame with the 'START_ISO8601'
+                  and 'END_ISO8601' columns.
+    """
+    def format_to_iso8601(date_str, time_str):
+        full_datetime = datetime.datetime.strptime(
+            f"{date_str} {time_str}", "%Y-%m-%d %H:%M"
+        )
+        return full_datetime.isoformat()
+
+    final_urls_dataframe['START_ISO8601'] = final_urls_dataframe.apply(
+        lambda row: format_to_iso8601(
+            row['LECTURE_DAY'], row['LECTURE_START']
+        ), axis=1)
+    final_urls_dataframe['END_ISO8601'] = final_urls_dataframe.apply(
+        lambda row: format_to_iso8601(
+            row['LECTURE_DAY'], row['LECTURE_END']
+        ), axis=1)
+    return final_urls_dataframe
+
+
+def year_of_lectures(lectures: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate the lecture days and times of a full academic year.
+
+    Parameters:
+    lectures (int): The number of lectures.
+    seed (int): The seed of the random generator.
+
+    Returns:
+    pd.DataFrame: The 'LECTURE_DAY', 'LECTURE_START' and 'LECTURE_END'
+                  columns as strings, like the sitows feed.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2024-09-01", "2025-08-31", freq="D")
+    day = days[rng.integers(0, len(days), lectures)].strftime("%Y-%m-%d")
+    # Lectures start on the quarter hour between 08:00 and 19:45
+    start = rng.integers(32, 80, lectures) * 15
+    end = start + rng.choice([90, 120, 180], lectures)
+    return pd.DataFrame({
+        "LECTURE_DAY": day,
+        "LECTURE_START": [f"{m // 60:02d}:{m % 60:02d}" for m in start],
+        "LECTURE_END": [f"{m // 60:02d}:{m % 60:02d}" for m in end],
+    })
+
+
+def timed(function, dataframe: pd.DataFrame) -> tuple:
+    """
+    Run a formatting function on a copy of the lectures.
+
+    Returns:
+    tuple[pd.DataFrame, float]: The result and the elapsed seconds.
+    """
+    dataframe = dataframe.copy()
+    start = time.perf_counter()
+    result = function(dataframe)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    lectures = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LECTURES
+    dataframe = year_of_lectures(lectures)
+
+    expected, rowwise_seconds = timed(format_iso8601_rowwise, dataframe)
+    result, vectorized_seconds = timed(format_iso8601, dataframe)
+
+    # The vectorized output must be identical to the row by row one
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"lectures:   {lectures}")
+    print(f"row-wise:   {rowwise_seconds:.3f} s")
+    print(f"vectorized: {vectorized_seconds:.3f} s")
+    print(f"speedup:    {rowwise_seconds / vectorized_seconds:.1f}x")
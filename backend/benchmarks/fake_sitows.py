@@ -0,0 +1,228 @@
+"""
+Local stand-in for the sitows didactic services.
+
+The server answers the eight /sitows/didattica/* endpoints used by
+df_creating.py with recorded or synthetic JSON, after a configurable
+latency. Responses carry an ETag and a Last-Modified date and answer
+conditional requests with 304 Not Modified, like the real service, so
+that the whole refresh path can be load tested without calling
+apps.unive.it. Point the backend to it with the SITOWS_BASE_URL
+environment variable.
+
+Execute the server by running on the terminal (from the backend/)
+the command:
+python -m benchmarks.fake_sitows [--scale 10 | --data DIR] [--latency 0.5]
+"""
+
+import argparse
+import email.utils
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+from app.mymodules.df_creating import SITOWS_SOURCES
+from . import synthetic
+
+# Path of the endpoints on the real service
+ENDPOINT_PATH = "/sitows/didattica/"
+
+
+def record(directory: str,
+           base_url: str = "http://apps.unive.it/sitows/didattica") -> None:
+    """
+    Record the responses of the real sitows endpoints to files.
+
+    Args:
+        directory (str): The root directory of the recorded dataset.
+        base_url (str): Base URL of the real service.
+    """
+    endpoint_dir = os.path.join(directory, "sitows", "didattica")
+    os.makedirs(endpoint_dir, exist_ok=True)
+    for endpoint in SITOWS_SOURCES.values():
+        with requests.get(f"{base_url}/{endpoint}", stream=True,
+                          timeout=300) as response:
+            response.raise_for_status()
+            with open(os.path.join(endpoint_dir, endpoint), "wb") as file:
+                shutil.copyfileobj(response.raw, file)
+
+
+class FakeSitows:
+    """
+    HTTP server answering the sitows endpoints from a dataset directory.
+
+    Attributes:
+    directory (str): The root directory of the dataset, laid out like
+        the service: <directory>/sitows/didattica/<endpoint>.
+    latency (float): Seconds waited before every response.
+    jitter (float): Maximum random seconds added to the latency.
+    host (str): The address the server listens on.
+    port (int): The port, 0 picks a free one.
+    requests (dict[str, int]): Number of requests of every endpoint.
+    """
+
+    def __init__(self, directory: str, latency: float = 0,
+                 jitter: float = 0, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._validators = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        The base URL to use instead of the real sitows one.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{ENDPOINT_PATH.rstrip('/')}"
+
+    def validators(self, path: str) -> tuple:
+        """
+        Compute the ETag and the Last-Modified date of an endpoint file.
+
+        Args:
+            path (str): The endpoint file.
+
+        Returns:
+            tuple[str, str]: The ETag and the Last-Modified header values.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._validators.get(path)
+        if cached is None or cached[0] != signature:
+            digest = hashlib.sha1(repr((path,) + signature).encode("utf-8"))
+            cached = (signature, (f'"{digest.hexdigest()}"',
+                                  email.utils.formatdate(stat.st_mtime,
+                                                         usegmt=True)))
+            with self._lock:
+                self._validators[path] = cached
+        return cached[1]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                endpoint = self.path.split("?")[0]
+                name = endpoint[len(ENDPOINT_PATH):]
+                path = os.path.join(fake.directory, "sitows", "didattica",
+                                    name)
+                if (not endpoint.startswith(ENDPOINT_PATH)
+                        or name not in SITOWS_SOURCES.values()
+                        or not os.path.exists(path)):
+                    self.send_error(404)
+                    return
+                with fake._lock:
+                    fake.requests[name] = fake.requests.get(name, 0) + 1
+
+                # Simulate the latency of the real service
+                delay = fake.latency + random.uniform(0, fake.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                etag, last_modified = fake.validators(path)
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length",
+                                 str(os.path.getsize(path)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                with open(path, "rb") as endpoint_file:
+                    shutil.copyfileobj(endpoint_file, self.wfile)
+
+            def log_message(self, format, *args):
+                # Keep the load tests quiet
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeSitows":
+        """
+        Serve the endpoints on a daemon thread.
+
+        Returns:
+            FakeSitows: The started server.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-sitows", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """
+        Serve the endpoints on the current thread until interrupted.
+        """
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """
+        Stop the server started by start().
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSitows":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=None,
+                        help="dataset directory, a synthetic dataset is "
+                        "generated if not given")
+    parser.add_argument("--record", action="store_true",
+                        help="record the real endpoints to --data first")
+    parser.add_argument("--scale", type=float, default=1,
+                        help="size of the synthetic dataset, as a multiple "
+                        "of the real catalogue")
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = arguments.data or temporary_dir
+        if arguments.record:
+            record(data_dir)
+        elif arguments.data is None:
+            synthetic.write_dataset(data_dir, arguments.scale)
+
+        server = FakeSitows(data_dir, arguments.latency, arguments.jitter,
+                            arguments.host, arguments.port)
+        print(f"Serving {data_dir} on {server.base_url}", flush=True)
+        print(f"Run the backend with SITOWS_BASE_URL={server.base_url}",
+              flush=True)
+        server.serve_forever()
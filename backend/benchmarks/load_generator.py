@@ -0,0 +1,165 @@
+"""
+Load generator for the query endpoints of the backend.
+
+Requests to /query/{final_teaching} and to
+/query/{location}/{degreetype}/{cycle} are sent at a fixed target rate
+(an open loop: a slow response does not delay the next requests), with
+teachings and filters picked at random from the served calendar. The
+latency of every request is measured from the time it was due to be
+sent, so that a saturated backend shows up in the percentiles instead of
+silently lowering the rate.
+
+Execute the load generator by running on the terminal (from the
+backend/) the command:
+python -m benchmarks.load_generator [--url URL] [--rate 50] [--duration 30]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.mymodules.snapshot import display_frame, read_snapshot
+
+
+def query_values(url: str = None, snapshot_path: str = None) -> tuple:
+    """
+    Collect the teachings and the filters to query.
+
+    Args:
+        url (str, optional): The backend, whose /df_show is read once.
+        snapshot_path (str, optional): A snapshot file read instead.
+
+    Returns:
+        tuple[list[str], list[tuple]]: The teachings, and the
+        (location, degree type, cycle) combinations.
+    """
+    if snapshot_path is not None:
+        lectures = display_frame(read_snapshot(snapshot_path))
+        rows = lectures[["TEACHING", "SITE", "DEGREE_TYPE", "CYCLE"]]
+        rows = rows.dropna().astype(str).to_dict(orient="records")
+    else:
+        rows = requests.get(f"{url}/df_show", timeout=300).json()
+    teachings = sorted({row["TEACHING"] for row in rows})
+    facets = sorted({(row["SITE"], row["DEGREE_TYPE"], row["CYCLE"])
+                     for row in rows})
+    return teachings, facets
+
+
+def latency_summary(latencies: list, errors: int, elapsed: float) -> dict:
+    """
+    Summarize the latencies of the requests of an endpoint.
+
+    Args:
+        latencies (list[float]): The seconds taken by every request.
+        errors (int): The number of failed requests.
+        elapsed (float): The seconds the load lasted.
+
+    Returns:
+        dict: The number of requests and errors, the achieved rate and
+        the latency percentiles in milliseconds.
+    """
+    summary = {"requests": len(latencies), "errors": errors,
+               "rate": round(len(latencies) / elapsed, 2)}
+    if latencies:
+        milliseconds = np.array(latencies) * 1000
+        p50, p99 = np.percentile(milliseconds, [50, 99])
+        summary.update({"p50_ms": round(float(p50), 3),
+                        "p99_ms": round(float(p99), 3),
+                        "mean_ms": round(float(milliseconds.mean()), 3),
+                        "max_ms": round(float(milliseconds.max()), 3)})
+    return summary
+
+
+def run_load(url: str, teachings: list, facets: list, rate: float,
+             duration: float, workers: int = 64, seed: int = 0) -> dict:
+    """
+    Send requests to the query endpoints at a target rate.
+
+    Requests alternate between the two endpoints.
+
+    Args:
+        url (str): The base URL of the backend.
+        teachings (list[str]): The teachings to query.
+        facets (list[tuple]): The (location, degree type, cycle) filters.
+        rate (float): Target requests per second.
+        duration (float): Seconds the load lasts.
+        workers (int): Maximum number of requests in flight.
+        seed (int): The seed used to pick the queries.
+
+    Returns:
+        dict: The latency summary of every endpoint.
+    """
+    rng = random.Random(seed)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    endpoints = ["/query/{final_teaching}",
+                 "/query/{location}/{degreetype}/{cycle}"]
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    lock = threading.Lock()
+
+    def send(endpoint: str, path: str, due: float) -> None:
+        try:
+            response = session.get(url + path, timeout=60)
+            failed = response.status_code != 200
+        except requests.RequestException:
+            failed = True
+        # Latency from the time the request was due, see the module doc
+        latency = time.perf_counter() - due
+        with lock:
+            if failed:
+                errors[endpoint] += 1
+            else:
+                latencies[endpoint].append(latency)
+
+    total = int(rate * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for number in range(total):
+            due = started + number / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if number % 2 == 0:
+                endpoint = endpoints[0]
+                path = "/query/" + quote(rng.choice(teachings), safe="")
+            else:
+                endpoint = endpoints[1]
+                path = "/query/" + "/".join(
+                    quote(value, safe="") for value in rng.choice(facets))
+            executor.submit(send, endpoint, path, due)
+    elapsed = time.perf_counter() - started
+
+    return {endpoint: latency_summary(latencies[endpoint], errors[endpoint],
+                                      elapsed)
+            for endpoint in endpoints}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("--rate", type=float, default=50,
+                        help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds the load lasts")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--snapshot", default=None,
+                        help="read the queried values from this snapshot "
+                        "instead of the backend /df_show")
+    arguments = parser.parse_args()
+
+    load_teachings, load_facets = query_values(arguments.url,
+                                               arguments.snapshot)
+    results = run_load(arguments.url, load_teachings, load_facets,
+                       arguments.rate, arguments.duration, arguments.workers)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,263 @@
+"""
+Benchmark suite of the calendar pipeline and of the backend API.
+
+For every scale a synthetic sitows dataset is generated (see
+synthetic.py), parsed, and run through every stage of df_creating.py.
+The snapshot it produces is then served by the backend, and the
+/query/{final_teaching}, /query/{location}/{degreetype}/{cycle} and
+/df_show endpoints are called in process. Stage throughput and peak
+memory, endpoint latency percentiles and the peak RSS are written to a
+JSON results file, to be compared between versions and hosts.
+
+Execute the suite by running on the terminal (from the backend/)
+the command:
+python -m benchmarks.run_suite [--scales 1 10 100] [--output FILE]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app import main
+from app.mymodules import build_stats
+from app.mymodules.df_creating import (
+    SITOWS_SOURCES, STREAMED_SOURCES, SourceRegistry, build_final_rows
+)
+from app.mymodules.json_stream import CHUNK_SIZE, read_json_columns
+from app.mymodules.snapshot import read_snapshot, write_snapshot
+from . import synthetic
+
+# Default results file
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.json")
+
+
+def read_chunks(path: str):
+    """
+    Read a file in chunks, like a streamed HTTP response.
+
+    Args:
+        path (str): The file to read.
+
+    Yields:
+        bytes: The chunks of the file.
+    """
+    with open(path, "rb") as endpoint_file:
+        while True:
+            chunk = endpoint_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def parse_dataset(directory: str) -> dict:
+    """
+    Parse every endpoint file of a dataset the way get_data does.
+
+    Args:
+        directory (str): The root directory of the dataset.
+
+    Returns:
+        dict[str, pd.DataFrame]: The sources by name.
+    """
+    frames = {}
+    for name, endpoint in SITOWS_SOURCES.items():
+        path = os.path.join(directory, "sitows", "didattica", endpoint)
+        if name in STREAMED_SOURCES:
+            frames[name] = read_json_columns(read_chunks(path),
+                                             STREAMED_SOURCES[name])
+        else:
+            with open(path, encoding="utf-8") as endpoint_file:
+                frames[name] = pd.DataFrame(json.load(endpoint_file))
+    return frames
+
+
+def latency_summary(latencies: list, elapsed: float) -> dict:
+    """
+    Summarize the latencies of a series of requests.
+
+    Args:
+        latencies (list[float]): The seconds taken by every request.
+        elapsed (float): The seconds taken by the whole series.
+
+    Returns:
+        dict: The number of requests, the throughput and the latency
+        percentiles in milliseconds.
+    """
+    milliseconds = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(milliseconds, [50, 90, 99])
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(milliseconds.max()), 3),
+    }
+
+
+def time_requests(client: TestClient, paths: list) -> dict:
+    """
+    Call the backend once for every path and time the responses.
+
+    Args:
+        client (TestClient): The client of the backend.
+        paths (list[str]): The paths to request.
+
+    Returns:
+        dict: The latency summary of the requests.
+
+    Raises:
+        RuntimeError: If a request does not succeed.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for path in paths:
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def benchmark_build(directory: str) -> tuple:
+    """
+    Run a dataset through every stage of the pipeline.
+
+    Args:
+        directory (str): The root directory of the dataset.
+
+    Returns:
+        tuple[dict, pd.DataFrame]: The build report and the snapshot.
+    """
+    snapshot_path = os.path.join(directory, "final.feather")
+    # Peak memory of every stage is part of the results
+    with build_stats.BuildReport(path=None, trace_memory=True) as report:
+        frames = report.run("parse", parse_dataset, directory)
+        sources = SourceRegistry.from_frames(frames)
+        keyed = build_final_rows(sources.get_all(), sources, report)
+        report.run("write_snapshot", write_snapshot, keyed, snapshot_path)
+        snapshot = report.run("read_snapshot", read_snapshot, snapshot_path)
+
+    # Rows processed per second by every stage
+    for stage in report.data["stages"]:
+        rows = stage["rows_in"] or stage["rows_out"]
+        stage["rows_per_second"] = (round(rows / stage["wall_seconds"])
+                                    if rows and stage["wall_seconds"]
+                                    else None)
+    return report.data, snapshot
+
+
+def benchmark_api(snapshot_path: str, requests: int,
+                  df_show_requests: int, seed: int = 0) -> dict:
+    """
+    Serve a snapshot with the backend and time its endpoints.
+
+    Args:
+        snapshot_path (str): The snapshot file to serve.
+        requests (int): Number of requests of every query endpoint.
+        df_show_requests (int): Number of requests of /df_show.
+        seed (int): The seed used to pick the queried values.
+
+    Returns:
+        dict: The latency summary of every endpoint.
+    """
+    main.final_path_snapshot = snapshot_path
+    main.reload_snapshot()
+    served = read_snapshot(snapshot_path)
+    rng = random.Random(seed)
+
+    teachings = served["TEACHING"].dropna().unique().tolist()
+    facets = served[["SITE", "DEGREE_TYPE", "CYCLE"]].drop_duplicates()
+    facets = facets.dropna().astype(str).values.tolist()
+
+    # Starting the client would start the background refresh
+    client = TestClient(main.app)
+    results = {
+        "/query/{final_teaching}": time_requests(
+            client, [f"/query/{rng.choice(teachings)}"
+                     for _ in range(requests)]),
+        "/query/{location}/{degreetype}/{cycle}": time_requests(
+            client, ["/query/{}/{}/{}".format(*rng.choice(facets))
+                     for _ in range(requests)]),
+    }
+    if df_show_requests:
+        results["/df_show"] = time_requests(
+            client, ["/df_show"] * df_show_requests)
+    return results
+
+
+def run_suite(scales: list, data_dir: str, requests: int = 200,
+              df_show_requests: int = 3, seed: int = 0) -> dict:
+    """
+    Run the benchmarks at every scale.
+
+    Args:
+        scales (list[float]): The multiples of the real catalogue.
+        data_dir (str): Directory where the datasets are generated.
+        requests (int): Number of requests of every query endpoint.
+        df_show_requests (int): Number of requests of /df_show.
+        seed (int): The seed of the datasets and of the queries.
+
+    Returns:
+        dict: The results of every scale, with the environment.
+    """
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "runs": [],
+    }
+    for scale in scales:
+        directory = os.path.join(data_dir, f"{scale:g}x")
+        print(f"Scale {scale:g}x: generating {directory}", flush=True)
+        sizes = synthetic.write_dataset(directory, scale, seed)
+
+        print(f"Scale {scale:g}x: building", flush=True)
+        build, snapshot = benchmark_build(directory)
+
+        print(f"Scale {scale:g}x: serving {len(snapshot)} lectures",
+              flush=True)
+        endpoints = benchmark_api(os.path.join(directory, "final.feather"),
+                                  requests, df_show_requests, seed)
+        results["runs"].append({
+            "scale": scale,
+            "sizes": sizes,
+            "lectures": len(snapshot),
+            "build": build,
+            "endpoints": endpoints,
+            "max_rss_bytes": build_stats.max_rss_bytes(),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", type=float, nargs="+",
+                        default=synthetic.SCALES)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--df-show-requests", type=int, default=3)
+    parser.add_argument("--data-dir", default=None,
+                        help="keep the datasets here, a temporary "
+                        "directory by default")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        suite_results = run_suite(
+            arguments.scales, arguments.data_dir or temporary_dir,
+            arguments.requests, arguments.df_show_requests)
+
+    with open(arguments.output, "w", encoding="utf-8") as results_file:
+        json.dump(suite_results, results_file, indent=2)
+    print(f"Results written to {arguments.output}")
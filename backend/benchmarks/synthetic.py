@@ -0,0 +1,216 @@
+"""
+Generator of synthetic sitows datasets for the benchmarks.
+
+The datasets have the shape of the eight /sitows/didattica endpoints
+used by df_creating.py: the same fields, consistent keys between the
+sources, duplicated links, degree types and cycles that are filtered out
+and missing values. Their size is a multiple of the real catalogue.
+
+Execute the generator by running on the terminal (from the backend/)
+the command:
+python -m benchmarks.synthetic <directory> [scale]
+"""
+
+import datetime
+import json
+import os
+import random
+import sys
+
+# Size of the real catalogue of a year, scaled by the benchmarks
+CATALOGUE = {
+    "degrees": 250,
+    "teachings": 3500,
+    "lecturers": 2000,
+    "classrooms": 300,
+    "locations": 30,
+    "lectures_per_teaching": 20,
+}
+
+# Scales run by the benchmark suite
+SCALES = [1, 10, 100]
+
+DEGREE_TYPES = ["L", "LM", "LM5", "D1", "M1"]
+CYCLES = ["I Semestre", "II Semestre", "1° Periodo", "2° Periodo",
+          "3° Periodo", "4° Periodo", "Annuale", "Precorsi"]
+SITES = ["VENEZIA", "TREVISO", "RONCADE", "MESTRE", "PADOVA", None]
+WORDS = ["MATHEMATICS", "ECONOMICS", "HISTORY", "LAW", "CHEMISTRY",
+         "LINGUISTICS", "FINANCE", "STATISTICS", "PHILOSOPHY", "ART",
+         "COMPUTER", "SCIENCE", "MANAGEMENT", "LITERATURE", "PHYSICS",
+         "ÉTUDES", "MARKETING", "DATA", "ANALYSIS", "ADVANCED"]
+NAMES = ["MARCO", "GIULIA", "LUCA", "CHIARA", "ANDREA", "SARA", "NICOLÒ",
+         "ELENA", "FRANCESCO", "MARTA"]
+SURNAMES = ["ROSSI", "BIANCHI", "ZANON", "DE ROSSI", "FABBRI", "SCARPA",
+            "BORTOLUZZI", "COSTA", "D'ANDREA", "VIANELLO"]
+
+# First day of the lectures of the academic year
+YEAR_START = datetime.date(2024, 9, 16)
+
+
+def catalogue_size(scale: float) -> dict:
+    """
+    Compute the number of records of every source at a given scale.
+
+    Args:
+        scale (float): Multiple of the real catalogue.
+
+    Returns:
+        dict: The number of degrees, teachings, lecturers, classrooms,
+        locations and lectures per teaching.
+    """
+    sizes = {name: max(1, int(count * scale))
+             for name, count in CATALOGUE.items()}
+    # Every teaching keeps the lectures of a real year
+    sizes["lectures_per_teaching"] = CATALOGUE["lectures_per_teaching"]
+    return sizes
+
+
+def generate(scale: float = 1, seed: int = 0) -> dict:
+    """
+    Generate the records of every sitows endpoint.
+
+    The records are yielded lazily, so that even the largest scales are
+    written without holding a whole endpoint in memory.
+
+    Args:
+        scale (float): Multiple of the real catalogue.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        dict[str, Iterator[dict]]: The records of every endpoint,
+        by endpoint name.
+    """
+    sizes = catalogue_size(scale)
+    rng = random.Random(seed)
+    lecturer_names = [(rng.choice(NAMES), rng.choice(SURNAMES) + f" {i}")
+                      for i in range(sizes["lecturers"])]
+    # Degree, lecturer and classroom of every teaching
+    teaching_degrees = [rng.randrange(sizes["degrees"])
+                        for _ in range(sizes["teachings"])]
+    teaching_lecturers = [rng.randrange(sizes["lecturers"])
+                          for _ in range(sizes["teachings"])]
+
+    def degrees():
+        for i in range(sizes["degrees"]):
+            yield {"CDS_COD": f"C{i:05d}", "PDS_COD": "PDS0",
+                   "CDS_DES": f"Degree {i}", "PDS_DES": "comune",
+                   "TIPO_CORSO_COD": DEGREE_TYPES[i % len(DEGREE_TYPES)],
+                   "TIPO_CORSO_DES": "Corso"}
+
+    def teachings():
+        teaching_rng = random.Random(seed + 1)
+        for i in range(sizes["teachings"]):
+            name = " ".join(teaching_rng.sample(WORDS, 3))
+            yield {"AF_ID": 100000 + i, "CODICE": f"CT{i:06d}",
+                   "NOME": f"{name} {i}",
+                   "CICLO": teaching_rng.choice(CYCLES),
+                   "PARTIZIONE": teaching_rng.choice([None, "A-L", "M-Z"]),
+                   "SEDE": teaching_rng.choice(SITES),
+                   "SETTORE": "SECS-P/01", "CREDITI": 6,
+                   "PESO": teaching_rng.choice([6, 12]),
+                   "PESO_TOTALE": 6, "TIPO_ATTIVITA": "B"}
+
+    def degrees_teachings():
+        link_rng = random.Random(seed + 2)
+        for i, degree in enumerate(teaching_degrees):
+            yield {"AF_ID": 100000 + i, "AR_ID": 500000 + i,
+                   "CDS_COD": f"C{degree:05d}", "PDS_COD": "PDS0",
+                   "ANNO_CORSO": 1}
+            # Some teachings are shared by a second degree
+            if i % 7 == 0:
+                other = link_rng.randrange(sizes["degrees"])
+                yield {"AF_ID": 100000 + i, "AR_ID": 500000 + i,
+                       "CDS_COD": f"C{other:05d}", "PDS_COD": "PDS0",
+                       "ANNO_CORSO": 2}
+
+    def lecturers():
+        for i, (name, surname) in enumerate(lecturer_names):
+            yield {"DOCENTE_ID": 900000 + i, "NOME": name.title(),
+                   "COGNOME": surname.title()}
+
+    def teachings_lecturers():
+        for i, lecturer in enumerate(teaching_lecturers):
+            yield {"AF_ID": 100000 + i, "DOCENTE_ID": 900000 + lecturer}
+
+    def lectures():
+        lecture_rng = random.Random(seed + 3)
+        lecture_id = 7000000
+        for i, lecturer in enumerate(teaching_lecturers):
+            name, surname = lecturer_names[lecturer]
+            for week in range(sizes["lectures_per_teaching"]):
+                day = YEAR_START + datetime.timedelta(
+                    days=week * 7 + lecture_rng.randrange(5))
+                hour = lecture_rng.randrange(8, 18)
+                minute = lecture_rng.choice([0, 15, 30, 45])
+                yield {"IMPEGNO_ID": lecture_id, "AR_ID": 500000 + i,
+                       "AULA_ID": 2000 + lecture_rng.randrange(
+                           sizes["classrooms"]),
+                       "GIORNO": day.isoformat(),
+                       "INIZIO": f"{hour:02d}:{minute:02d}",
+                       "FINE": f"{hour + 2:02d}:{minute:02d}",
+                       "DOCENTI": f"{surname} {name}", "NOTE": None}
+                lecture_id += 1
+
+    def classrooms():
+        room_rng = random.Random(seed + 4)
+        for i in range(sizes["classrooms"]):
+            yield {"AULA_ID": 2000 + i, "NOME": f"Aula {i}",
+                   "SEDE_ID": 3000 + room_rng.randrange(sizes["locations"]),
+                   "POSTI": room_rng.randrange(20, 300)}
+
+    def locations():
+        for i in range(sizes["locations"]):
+            yield {"SEDE_ID": 3000 + i, "NOME": f"Sede {i}",
+                   "INDIRIZZO": f"Dorsoduro {3000 + i}, Venezia",
+                   "COORDINATE": "45.43,12.32"}
+
+    return {
+        "corsi": degrees(),
+        "insegnamenti": teachings(),
+        "corsiinsegnamenti": degrees_teachings(),
+        "docenti": lecturers(),
+        "insegnamentidocenti": teachings_lecturers(),
+        "lezioni": lectures(),
+        "aule": classrooms(),
+        "sedi": locations(),
+    }
+
+
+def write_dataset(directory: str, scale: float = 1, seed: int = 0) -> dict:
+    """
+    Write a synthetic dataset as one JSON array file per endpoint.
+
+    The files are written under <directory>/sitows/didattica, the same
+    paths as the real service, so that they can be served as they are.
+
+    Args:
+        directory (str): The root directory of the dataset.
+        scale (float): Multiple of the real catalogue.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        dict[str, int]: The number of records of every endpoint.
+    """
+    endpoint_dir = os.path.join(directory, "sitows", "didattica")
+    os.makedirs(endpoint_dir, exist_ok=True)
+    counts = {}
+    for endpoint, records in generate(scale, seed).items():
+        count = 0
+        path = os.path.join(endpoint_dir, endpoint)
+        with open(path + ".tmp", "w", encoding="utf-8") as endpoint_file:
+            endpoint_file.write("[")
+            for record in records:
+                if count:
+                    endpoint_file.write(",")
+                endpoint_file.write(json.dumps(record, ensure_ascii=False))
+                count += 1
+            endpoint_file.write("]")
+        os.replace(path + ".tmp", path)
+        counts[endpoint] = count
+    return counts
+
+
+if __name__ == "__main__":
+    dataset_dir = sys.argv[1]
+    dataset_scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    print(json.dumps(write_dataset(dataset_dir, dataset_scale), indent=2))
@@ -0,0 +1,105 @@
+"""
+Test module of the build_stats.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import importlib
+import tracemalloc
+import pandas as pd
+import pytest
+from app.mymodules.build_stats import BuildReport, load_reports
+
+
+def test_build_report_measures_stages(tmp_path):
+    """
+    Test that every stage of a build is measured and that the report
+    is saved when the build ends.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The stages are recorded in order with their rows in and out.
+    Wall time, CPU time and peak memory are measured.
+    The saved report is marked as successful.
+    """
+    stats_path = str(tmp_path / "build_stats.json")
+    lectures = pd.DataFrame({"IMPEGNO_ID": range(10)})
+
+    with BuildReport(stats_path, trace_memory=True) as report:
+        kept = report.run("filter", lambda df: df[df["IMPEGNO_ID"] < 4],
+                          lectures)
+        with report.stage("export", len(kept)) as stage:
+            stage["rows_out"] = len(kept)
+
+    reports = load_reports(stats_path)
+    assert len(reports) == 1
+    saved = reports[0]
+    assert saved["status"] == "ok"
+    assert [stage["name"] for stage in saved["stages"]] == [
+        "filter", "export"]
+    assert saved["stages"][0]["rows_in"] == 10
+    assert saved["stages"][0]["rows_out"] == 4
+    for stage in saved["stages"]:
+        assert stage["wall_seconds"] >= 0
+        assert stage["cpu_seconds"] >= 0
+        assert stage["peak_traced_bytes"] >= 0
+    assert saved["wall_seconds"] >= saved["stages"][0]["wall_seconds"]
+
+
+def test_build_report_keeps_last_failed(tmp_path):
+    """
+    Test that failed builds are reported too and that only the last
+    reports are kept.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The error of the build is not swallowed.
+    The failed build is saved with its error and failing stage.
+    Only the configured number of reports is kept.
+    """
+    stats_path = str(tmp_path / "build_stats.json")
+    for _ in range(3):
+        with BuildReport(stats_path, keep=2, trace_memory=False):
+            pass
+
+    with pytest.raises(ConnectionError):
+        with BuildReport(stats_path, keep=2, trace_memory=False) as report:
+            with report.stage("fetch"):
+                raise ConnectionError("sitows unavailable")
+
+    reports = load_reports(stats_path)
+    assert len(reports) == 2
+    assert reports[0]["status"] == "ok"
+    assert reports[1]["status"] == "failed"
+    assert "sitows unavailable" in reports[1]["error"]
+    assert reports[1]["stages"][0]["name"] == "fetch"
+
+
+def test_build_report_without_tracing(monkeypatch):
+    """
+    Test that tracemalloc is off unless it is asked for.
+
+    Parameters:
+    monkeypatch: The pytest fixture used to unset the environment.
+
+    Asserts:
+    The default report does not trace memory allocations.
+    Its stages are measured without peak traced memory.
+    """
+    monkeypatch.delenv("BUILD_STATS_TRACEMALLOC", raising=False)
+    build_stats = importlib.reload(
+        importlib.import_module("app.mymodules.build_stats"))
+    assert build_stats.TRACE_MEMORY is False
+
+    with build_stats.BuildReport(path=None) as report:
+        assert not tracemalloc.is_tracing()
+        with report.stage("export", 1):
+            pass
+
+    assert "peak_traced_bytes" not in report.data["stages"][0]
+    assert "peak_traced_bytes" not in report.data
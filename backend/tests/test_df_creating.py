@@ -6,8 +6,16 @@ pytest --cov=app --cov-report=html tests/
 """
 
 import os
+import json
 import datetime
-from app.mymodules.df_creating import df_creating, create_new_dataframe
+from app.mymodules.df_creating import (
+    df_creating, create_new_dataframe, get_data, SourceRegistry,
+    format_iso8601, modify_values, merge_data, SITOWS_SOURCES
+)
+from app.mymodules import incremental
+from benchmarks import synthetic
+from benchmarks.fake_sitows import FakeSitows
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -35,12 +43,13 @@ def test_existing_file_recent(mocker):
     delta = datetime.timedelta(hours=1)
     mocker.patch('os.path.getctime', return_value=(now - delta).timestamp())
 
-    # Mock pandas.read_csv to return a predefined DataFrame
+    # Mock the snapshot reader to return a predefined DataFrame
     mock_df = pd.DataFrame({'A': [1, 2, 3]})
-    mocker.patch('pandas.read_csv', return_value=mock_df)
+    mocker.patch('app.mymodules.df_creating.read_snapshot',
+                 return_value=mock_df)
 
     # Call the function with a dummy file path
-    result_df = df_creating('app/dummy.csv')
+    result_df = df_creating('app/dummy.feather')
 
     # Assert that the result DataFrame matches the mock DataFrame
     assert (result_df == mock_df).all().all()
@@ -113,13 +122,252 @@ def test_non_existing_file(mocker):
     assert (result_df == mock_df).all().all()
 
 
-def test_create_new_dataframe():
+def test_get_data_concurrent(mocker):
+    """
+    Test that get_data downloads every endpoint through the shared
+    session and reports the time spent on each of them.
+
+    This test mocks requests.Session.get so that no network is used.
+
+    Parameters:
+    mocker: The pytest-mock mocker object.
+
+    Asserts:
+    Every URL is replaced by the DataFrame of its endpoint.
+    A timing is recorded for each endpoint.
+    """
+    # Mock the session so that each URL returns a one-row payload
+    def fake_get(url, **kwargs):
+        response = mocker.Mock(status_code=200, headers={})
+        response.json.return_value = [{'URL': url}]
+        return response
+    mocker.patch('requests.Session.get', side_effect=fake_get)
+
+    urls = {'first': 'http://sitows/a', 'second': 'http://sitows/b'}
+    timings = {}
+    result = get_data(urls, max_workers=2, timings=timings, cache_dir=None)
+
+    # Assert that every endpoint was converted to its DataFrame
+    assert result['first']['URL'][0] == 'http://sitows/a'
+    assert result['second']['URL'][0] == 'http://sitows/b'
+
+    # Assert that a timing was recorded for each endpoint
+    assert set(timings) == {'first', 'second'}
+
+
+def test_get_data_not_modified(mocker, tmp_path):
+    """
+    Test that get_data revalidates cached endpoints with a conditional GET
+    and reuses the cached DataFrame when the server answers 304.
+
+    Parameters:
+    mocker: The pytest-mock mocker object.
+    tmp_path: The pytest temporary directory used as cache.
+
+    Asserts:
+    The second request carries the ETag of the first response.
+    The cached DataFrame is returned and reported as unchanged.
+    """
+    # First answer with a full payload, then with 304 Not Modified
+    full = mocker.Mock(status_code=200, headers={'ETag': '"v1"'})
+    full.json.return_value = [{'SEDE_ID': 1}]
+    not_modified = mocker.Mock(status_code=304, headers={})
+    mock_get = mocker.patch('requests.Session.get',
+                            side_effect=[full, not_modified])
+
+    get_data({'locations': 'http://sitows/sedi'}, cache_dir=str(tmp_path))
+    unchanged = set()
+    result = get_data({'locations': 'http://sitows/sedi'},
+                      cache_dir=str(tmp_path), unchanged=unchanged)
+
+    # Assert that the cached validator was sent back
+    headers = mock_get.call_args_list[1].kwargs['headers']
+    assert headers == {'If-None-Match': '"v1"'}
+
+    # Assert that the parsed DataFrame was reused from the cache
+    assert result['locations']['SEDE_ID'][0] == 1
+    assert unchanged == {'locations'}
+
+
+def test_source_registry_downloads_once(mocker):
+    """
+    Test that the SourceRegistry downloads every distinct URL only once,
+    even when it is requested under several names or by several stages.
+
+    Parameters:
+    mocker: The pytest-mock mocker object.
+
+    Asserts:
+    The shared URL is requested once.
+    Changes made to a returned source do not leak into the registry.
+    No redundant download is reported.
+    """
+    response = mocker.Mock(status_code=200, headers={})
+    response.json.return_value = [{'NOME': 'Mario'}]
+    mock_get = mocker.patch('requests.Session.get', return_value=response)
+
+    sources = SourceRegistry({'lecturers': 'http://sitows/docenti',
+                              'lecturers_copy': 'http://sitows/docenti'},
+                             cache_dir=None)
+    frames = sources.get_all()
+    frames['lecturers'].rename(columns={'NOME': 'NAME'}, inplace=True)
+
+    # Assert that the shared URL was downloaded a single time
+    assert mock_get.call_count == 1
+    assert sources.aliases() == {
+        'http://sitows/docenti': ['lecturers', 'lecturers_copy']}
+
+    # Assert that later stages still see the untouched source
+    assert list(sources.get('lecturers').columns) == ['NOME']
+    assert mock_get.call_count == 1
+    assert sources.redundant_downloads() == {}
+
+
+def test_format_iso8601():
+    """
+    Test the format_iso8601 function.
+
+    This test checks that the lecture days and times are combined
+    into ISO 8601 timestamps, without and with a time zone.
+
+    Asserts:
+    The timestamps match the format of datetime.isoformat().
+    The Europe/Rome offsets follow daylight saving time.
+    """
+    lectures = pd.DataFrame({
+        'LECTURE_DAY': ['2024-03-29', '2024-03-29', '2024-04-02'],
+        'LECTURE_START': ['08:45', '08:45', '14:00'],
+        'LECTURE_END': ['10:15', '10:15', '15:30'],
+    }, index=[4, 7, 9])
+
+    result = format_iso8601(lectures.copy())
+
+    # Assert that the output matches the row by row formatting
+    expected = [datetime.datetime.strptime(f"{day} {start}",
+                                           "%Y-%m-%d %H:%M").isoformat()
+                for day, start in zip(lectures['LECTURE_DAY'],
+                                      lectures['LECTURE_START'])]
+    assert result['START_ISO8601'].tolist() == expected
+    assert result['END_ISO8601'].tolist() == [
+        '2024-03-29T10:15:00', '2024-03-29T10:15:00', '2024-04-02T15:30:00']
+    assert list(result.index) == [4, 7, 9]
+
+    # Assert that the offsets are appended for a time zone
+    rome = format_iso8601(lectures.copy(), timezone='Europe/Rome')
+    assert rome['START_ISO8601'].tolist() == [
+        '2024-03-29T08:45:00+01:00', '2024-03-29T08:45:00+01:00',
+        '2024-04-02T14:00:00+02:00']
+
+
+def test_format_iso8601_missing_values():
+    """
+    Test the format_iso8601 function with a missing day or time.
+
+    Asserts:
+    A lecture without a day or a start time raises a ValueError
+    instead of getting the timestamp of another lecture.
+    """
+    for day, start in [(None, '08:45'), ('2024-03-29', np.nan)]:
+        lectures = pd.DataFrame({
+            'LECTURE_DAY': ['2024-04-02', day],
+            'LECTURE_START': ['14:00', start],
+            'LECTURE_END': ['15:30', '10:15'],
+        })
+        with pytest.raises(ValueError):
+            format_iso8601(lectures)
+
+
+def test_modify_values():
+    """
+    Test the modify_values function.
+
+    This test checks that the rows of the excluded cycles are removed
+    and that the values of every mapped column are translated.
+
+    Asserts:
+    'Precorsi' lectures are removed and the index is kept.
+    Degree types, sites, partitions and cycles are translated,
+    including their missing values.
+    The input DataFrame is left untouched.
+    """
+    lectures = pd.DataFrame({
+        'CYCLE': ['I Semestre', 'Precorsi', 'II Semestre',
+                  'Annuale', None, '4° Periodo'],
+        'DEGREE_TYPE': ['L', 'LM', 'LM', 'L', 'LM5', 'L'],
+        'SITE': ['PADOVA', 'VENEZIA', None, 'TREVISO', 'PADOVA', None],
+        'PARTITION': [None, 'A', 'B', None, 'A', None],
+    })
+    original = lectures.copy()
+
+    result = modify_values(lectures)
+
+    assert list(result.index) == [0, 2, 3, 4, 5]
+    assert result['CYCLE'].tolist() == [
+        'Fall Semester (Sep-Jan)', 'Spring Semester (Feb-June)', 'Annual',
+        'Fall Semester (Sep-Jan)', 'Spring Semester (Feb-June)']
+    assert result['DEGREE_TYPE'].tolist() == [
+        'Bachelor', 'Master', 'Bachelor', 'LM5', 'Bachelor']
+    assert result['SITE'].tolist() == [
+        'VENEZIA', 'Not defined yet', 'TREVISO', 'VENEZIA', 'Not defined yet']
+    assert result['PARTITION'].tolist() == ['', 'B', '', 'A', '']
+    pd.testing.assert_frame_equal(lectures, original)
+
+
+def test_merge_data():
+    """
+    Test the merge_data function.
+
+    This test checks that the join plan gives the same rows, in the
+    same order, as merging the whole sources and filtering afterwards.
+
+    Asserts:
+    Only lectures of Bachelor and Master degrees are kept.
+    A lecture whose first degree is of another type is dropped.
+    Join keys and dropped fields are not part of the result.
+    """
+    sources = {
+        'teachings': pd.DataFrame({
+            'AF_ID': [1, 2, 3], 'TEACHING': ['Math', 'Law', 'Art'],
+            'CODICE': ['M1', 'L1', 'A1']}),
+        'degrees_teachings': pd.DataFrame({
+            'AF_ID': [1, 2, 2, 3], 'AR_ID': [10, 20, 20, 30],
+            'CDS_COD': ['A', 'B', 'C', 'C'], 'PDS_COD': ['X'] * 4}),
+        'degrees': pd.DataFrame({
+            'CDS_COD': ['A', 'B', 'C'], 'PDS_COD': ['X'] * 3,
+            'TIPO_CORSO_COD': ['L', 'LM5', 'LM'], 'PDS_DES': ['-'] * 3}),
+        'lectures': pd.DataFrame({
+            'IMPEGNO_ID': [100, 101, 102, 103],
+            'AR_ID': [30, 10, 20, 10], 'AULA_ID': [7, 8, 7, 9]}),
+        'classrooms': pd.DataFrame({
+            'AULA_ID': [7, 8], 'CLASSROOM_NAME': ['Aula 7', 'Aula 8'],
+            'SEDE_ID': [1, 1]}),
+        'locations': pd.DataFrame({
+            'SEDE_ID': [1], 'LOCATION_NAME': ['San Giobbe']}),
+    }
+
+    result = merge_data(sources)
+
+    assert list(result.columns) == [
+        'AF_ID', 'TEACHING', 'TIPO_CORSO_COD', 'IMPEGNO_ID',
+        'CLASSROOM_NAME', 'LOCATION_NAME']
+    # Lecture 102 is dropped, its teaching was first linked to 'LM5',
+    # and lecture 103 has no classroom
+    assert result['IMPEGNO_ID'].tolist() == [101, 100]
+    assert result['TEACHING'].tolist() == ['Math', 'Art']
+    assert result['CLASSROOM_NAME'].tolist() == ['Aula 8', 'Aula 7']
+
+
+def test_create_new_dataframe(tmp_path):
     """
     Test the create_new_dataframe function.
 
     This test checks if the DataFrame created by create_new_dataframe
     has the expected structure and content.
 
+    Parameters:
+    tmp_path: The pytest temporary directory, where the snapshot and the
+    cache are written instead of the working tree.
+
     Asserts:
     The result is a DataFrame.
     The DataFrame is not empty.
@@ -128,7 +376,7 @@ def test_create_new_dataframe():
     # Define the expected headers for the DataFrame
     expected_header = [
         "AF_ID", "TEACHING", "CYCLE", "PARTITION",
-        "SITE", "CREDITS", "DEGREE_TYPE",
+        "SITE", "CREDITS", "DEGREE_TYPE", "IMPEGNO_ID",
         "LECTURE_DAY", "LECTURE_START", "LECTURE_END",
         "LECTURER_NAME", "CLASSROOM_NAME", "LOCATION_NAME",
         "ADDRESS", "DOCENTE_ID", "URL_DOCENTE", "URLS_INSEGNAMENTO",
@@ -136,7 +384,9 @@ def test_create_new_dataframe():
     ]
 
     # Call the function to create the DataFrame
-    result_df = create_new_dataframe('app/dummy.csv')
+    result_df = create_new_dataframe(
+        str(tmp_path / 'dummy.feather'), stats_path=None,
+        cache_dir=str(tmp_path / 'cache'))
 
     # Assert that the result is a DataFrame
     res = "The result should be a DataFrame."
@@ -150,6 +400,35 @@ def test_create_new_dataframe():
     assert list(result_df.columns) == expected_header, outcome
 
 
+def test_create_new_dataframe_fake_sitows(tmp_path):
+    """
+    Test the create_new_dataframe function against the local stand-in
+    sitows service, serving a small synthetic dataset.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The DataFrame is not empty and holds only Bachelor and Master
+    lectures with their ISO 8601 timestamps and their int32 IMPEGNO_ID.
+    Every endpoint is requested once per build.
+    """
+    synthetic.write_dataset(str(tmp_path / "data"), scale=0.02)
+    with FakeSitows(str(tmp_path / "data")) as sitows:
+        for _ in range(2):
+            result_df = create_new_dataframe(
+                str(tmp_path / "final.feather"), incremental_rebuild=False,
+                stats_path=None, base_url=sitows.base_url,
+                cache_dir=str(tmp_path / "cache"))
+
+    assert not result_df.empty
+    assert "START_ISO8601" in result_df.columns
+    assert result_df['IMPEGNO_ID'].dtype == 'int32'
+    assert set(result_df['DEGREE_TYPE']) <= {'Bachelor', 'Master'}
+    assert sitows.requests == {endpoint: 2
+                               for endpoint in SITOWS_SOURCES.values()}
+
+
 def test_file_is_csv():
     """
     Test to verify that the file at 'app/final.csv'
@@ -209,3 +488,47 @@ def test_file_created_within_24_hours():
     # Verify that the file was created less than 24 hours ago
     output = "Il file final.csv è stato creato più di 24 ore fa."
     assert creation_time_dt > twenty_four_hours_ago, output
+
+
+def test_create_new_dataframe_incremental(tmp_path, monkeypatch):
+    """
+    Test that an incremental build of a changed lectures feed gives the
+    same DataFrame as a full rebuild, and keeps its state in the cache
+    directory.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The incremental and the full DataFrames are equal, rows and order.
+    The state is saved under the given cache directory, and never
+    without a cache directory.
+    """
+    synthetic.write_dataset(str(tmp_path / "data"), scale=0.02)
+    lectures_path = tmp_path / "data" / "sitows" / "didattica" / "lezioni"
+    with FakeSitows(str(tmp_path / "data")) as sitows:
+        create_new_dataframe(
+            str(tmp_path / "final.feather"), incremental_rebuild=True,
+            stats_path=None, base_url=sitows.base_url,
+            cache_dir=str(tmp_path / "cache"))
+        assert os.path.exists(tmp_path / "cache" / "incremental"
+                              / "state.json")
+
+        # Move the first lecture to another classroom, drop the second
+        lectures = json.loads(lectures_path.read_text(encoding="utf-8"))
+        lectures[0]["AULA_ID"] = lectures[-1]["AULA_ID"]
+        del lectures[1]
+        lectures_path.write_text(json.dumps(lectures), encoding="utf-8")
+
+        incremental_df = create_new_dataframe(
+            str(tmp_path / "incremental.feather"), incremental_rebuild=True,
+            stats_path=None, base_url=sitows.base_url,
+            cache_dir=str(tmp_path / "cache"))
+        # Neither loaded nor saved without a cache directory
+        monkeypatch.setattr(incremental, "load_state", None)
+        monkeypatch.setattr(incremental, "save_state", None)
+        full_df = create_new_dataframe(
+            str(tmp_path / "full.feather"), incremental_rebuild=True,
+            stats_path=None, base_url=sitows.base_url, cache_dir=None)
+
+    pd.testing.assert_frame_equal(incremental_df, full_df)
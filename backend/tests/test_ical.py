@@ -0,0 +1,113 @@
+"""
+Test module of the ical.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from app.mymodules.ical import calendar_chunks, content_line, escape_text
+from app.mymodules.snapshot import apply_schema
+
+
+def test_escape_and_fold():
+    """
+    Test the escaping of text values and the folding of content lines.
+
+    Asserts:
+    Backslashes, semicolons, commas and newlines are escaped.
+    Lines are folded at 75 octets with CRLF and a space.
+    A multi-byte character is never split by a fold.
+    """
+    assert escape_text('A; B, C\\D\nE') == 'A\\; B\\, C\\\\D\\nE'
+
+    assert content_line('SUMMARY:short') == b'SUMMARY:short\r\n'
+    folded = content_line('DESCRIPTION:' + 'é' * 100)
+    lines = folded.split(b'\r\n')
+    assert lines[-1] == b''
+    assert all(len(line) <= 75 for line in lines)
+    assert all(line.startswith(b' ') for line in lines[1:-1])
+    unfolded = b''.join(line[1:] if number else line
+                        for number, line in enumerate(lines))
+    assert unfolded.decode('utf-8') == 'DESCRIPTION:' + 'é' * 100
+
+
+def test_calendar_chunks():
+    """
+    Test the feed written for some lectures.
+
+    Asserts:
+    The feed is a VCALENDAR with a VTIMEZONE and one VEVENT per lecture.
+    Every line ends with CRLF.
+    The local times are written with the Europe/Rome TZID.
+    Missing values leave their property out.
+    """
+    lectures = apply_schema(pd.DataFrame({
+        'AF_ID': [1031, 1031],
+        'TEACHING': ['LAB OF WEB TECHNOLOGIES'] * 2,
+        'PARTITION': ['A-L', np.nan],
+        'LECTURER_NAME': ['ROSSI MARIO', 'ROSSI MARIO'],
+        'CLASSROOM_NAME': ['Aula 1', 'Aula 2'],
+        'LOCATION_NAME': ['Campus', 'Campus'],
+        'ADDRESS': ['Via Torino, 155', np.nan],
+        'URL_DOCENTE': ['https://www.unive.it/data/persone/1'] * 2,
+        'URLS_INSEGNAMENTO': ['https://www.unive.it/data/insegnamento/1'] * 2,
+        'START_ISO8601': ['2024-10-24T09:45:00', '2024-10-31T09:45:00'],
+        'END_ISO8601': ['2024-10-24T11:15:00', '2024-10-31T11:15:00'],
+    }))
+    published = datetime(2024, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+    feed = b''.join(calendar_chunks(lectures, published, 'LAB'))
+    text = feed.decode('utf-8')
+    assert text.startswith('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n')
+    assert text.endswith('END:VCALENDAR\r\n')
+    assert '\n' not in text.replace('\r\n', '')
+    assert 'BEGIN:VTIMEZONE\r\nTZID:Europe/Rome\r\n' in text
+    assert text.count('BEGIN:VEVENT') == 2
+    assert 'DTSTART;TZID=Europe/Rome:20241024T094500\r\n' in text
+    assert 'DTSTAMP:20241001T120000Z\r\n' in text
+    assert 'LOCATION:Via Torino\\, 155\r\n' in text
+    assert text.count('LOCATION:') == 1
+
+
+def event_uids(lectures: pd.DataFrame) -> list:
+    """
+    Write the feed of some lectures and list the UIDs of its events.
+    """
+    published = datetime(2024, 10, 1, 12, 0, tzinfo=timezone.utc)
+    feed = b''.join(calendar_chunks(apply_schema(lectures), published))
+    return [line[len('UID:'):] for line in feed.decode('utf-8').split('\r\n')
+            if line.startswith('UID:')]
+
+
+def test_event_uid_stable():
+    """
+    Test that the UID of an event follows its lecture.
+
+    Asserts:
+    A lecture moved to another time and room keeps its UID.
+    Different lectures get different UIDs.
+    A lecture repeated on several rows, one per homonymous lecturer,
+    is written as a single event.
+    """
+    lectures = pd.DataFrame({
+        'IMPEGNO_ID': [7000001, 7000002],
+        'AF_ID': [1031, 1031],
+        'TEACHING': ['LAB OF WEB TECHNOLOGIES'] * 2,
+        'CLASSROOM_NAME': ['Aula 1', 'Aula 1'],
+        'START_ISO8601': ['2024-10-24T09:45:00', '2024-10-31T09:45:00'],
+        'END_ISO8601': ['2024-10-24T11:15:00', '2024-10-31T11:15:00'],
+    })
+    moved = lectures.assign(
+        CLASSROOM_NAME=['Aula 2', 'Aula 1'],
+        START_ISO8601=['2024-10-25T14:00:00', '2024-10-31T09:45:00'],
+        END_ISO8601=['2024-10-25T15:30:00', '2024-10-31T11:15:00'])
+
+    uids = event_uids(lectures)
+    assert len(set(uids)) == 2
+    assert event_uids(moved) == uids
+
+    repeated = pd.concat([lectures, lectures.iloc[[0]]], ignore_index=True)
+    assert event_uids(repeated) == uids
@@ -0,0 +1,137 @@
+"""
+Test module of the incremental.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import pandas as pd
+from app.mymodules.incremental import (
+    diff_lectures, patch_final, source_fingerprints,
+    load_state, save_state, cache_state_dir
+)
+
+
+def test_diff_lectures():
+    """
+    Test that diff_lectures finds the inserted, updated and deleted
+    lectures by IMPEGNO_ID.
+
+    Asserts:
+    Only the inserted and updated lectures are returned as changed.
+    The deleted and updated keys are returned for removal.
+    """
+    old = pd.DataFrame({'IMPEGNO_ID': [1, 2, 3],
+                        'AULA_ID': [10, 20, 30],
+                        'NOTE': [None, 'x', None]})
+    new = pd.DataFrame({'IMPEGNO_ID': [1, 2, 4],
+                        'AULA_ID': [10, 25, 40],
+                        'NOTE': [None, 'x', None]})
+
+    changed, removed = diff_lectures(old, new)
+
+    # Lecture 2 moved room and lecture 4 is new
+    assert list(changed['IMPEGNO_ID']) == [2, 4]
+    # Lecture 3 was deleted and lecture 2 has to be replaced
+    assert list(removed) == [2, 3]
+
+
+def test_diff_lectures_schema_change():
+    """
+    Test that a change of the lectures columns requires a full rebuild.
+
+    Asserts:
+    diff_lectures returns None.
+    """
+    old = pd.DataFrame({'IMPEGNO_ID': [1], 'AULA_ID': [10]})
+    new = pd.DataFrame({'IMPEGNO_ID': [1], 'ROOM': [10]})
+
+    assert diff_lectures(old, new) is None
+
+
+def test_patch_final():
+    """
+    Test that patch_final replaces the removed lectures with the new rows.
+
+    Asserts:
+    The patched table holds the kept and the new lectures only, sorted
+    by IMPEGNO_ID whatever the position of the replaced rows.
+    """
+    final = pd.DataFrame({'IMPEGNO_ID': [1, 2, 3, 5],
+                          'CLASSROOM_NAME': ['A', 'B', 'C', 'E']})
+    new_rows = pd.DataFrame({'IMPEGNO_ID': [4, 2],
+                             'CLASSROOM_NAME': ['F', 'D']})
+
+    patched = patch_final(final, pd.Index([2, 3]), new_rows)
+
+    assert patched.to_dict(orient='list') == {
+        'IMPEGNO_ID': [1, 2, 4, 5], 'CLASSROOM_NAME': ['A', 'D', 'F', 'E']}
+    assert list(patched.index) == [0, 1, 2, 3]
+
+
+def test_state_round_trip(tmp_path):
+    """
+    Test that the saved state is loaded back unchanged and that the
+    fingerprints only depend on the content of the sources.
+
+    Parameters:
+    tmp_path: The pytest temporary directory used as state directory.
+
+    Asserts:
+    The fingerprints and the frames are restored from plain JSON and
+    Feather files.
+    """
+    frames = {'locations': pd.DataFrame({'SEDE_ID': [1], 'NOME': ['A']}),
+              'lectures': pd.DataFrame({'IMPEGNO_ID': [1, 2],
+                                        'NOTE': [None, 'x'],
+                                        'AULA_ID': [10.0, None]})}
+    fingerprints = source_fingerprints(frames)
+    assert set(fingerprints) == {'pipeline', 'locations'}
+    assert fingerprints == source_fingerprints(
+        {'locations': frames['locations'].copy()})
+
+    # No state has been saved yet
+    assert load_state(str(tmp_path)) is None
+
+    save_state(fingerprints, frames['lectures'], frames['lectures'],
+               str(tmp_path))
+    state = load_state(str(tmp_path))
+
+    assert state['fingerprints'] == fingerprints
+    pd.testing.assert_frame_equal(state['lectures'], frames['lectures'])
+    pd.testing.assert_frame_equal(state['final'], frames['lectures'])
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'final.feather', 'lectures.feather', 'state.json']
+
+
+def test_pipeline_fingerprint():
+    """
+    Test that a change of the pipeline configuration changes the
+    fingerprints, so that the next build is a full one.
+
+    Asserts:
+    Only the 'pipeline' fingerprint depends on the configuration.
+    """
+    frames = {'locations': pd.DataFrame({'SEDE_ID': [1], 'NOME': ['A']})}
+    old = source_fingerprints(frames, {'EXCLUDED_CYCLES': ['Precorsi']})
+    new = source_fingerprints(frames, {'EXCLUDED_CYCLES': []})
+
+    assert old['pipeline'] != new['pipeline']
+    assert old['locations'] == new['locations']
+    assert old == source_fingerprints(frames,
+                                      {'EXCLUDED_CYCLES': ['Precorsi']})
+
+
+def test_cache_state_dir(tmp_path):
+    """
+    Test that the state is kept in the given source cache directory.
+
+    Parameters:
+    tmp_path: The pytest temporary directory used as cache directory.
+
+    Asserts:
+    The state directory is inside the cache directory, there is none
+    without a cache directory.
+    """
+    assert cache_state_dir(str(tmp_path)) == str(tmp_path / 'incremental')
+    assert cache_state_dir(None) is None
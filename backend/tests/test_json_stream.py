@@ -0,0 +1,72 @@
+"""
+Test module of the json_stream.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import json
+import pandas as pd
+import pytest
+from app.mymodules.json_stream import iter_json_array, read_json_columns
+
+
+def split_chunks(data: bytes, size: int) -> list:
+    """
+    Split a payload in chunks of the given size.
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_read_json_columns_matches_dataframe():
+    """
+    Test that parsing a payload split in tiny chunks gives the same
+    DataFrame as pd.DataFrame on the fully decoded JSON, minus the
+    skipped fields.
+
+    Asserts:
+    The streamed DataFrame equals the reference one.
+    Integer columns are stored as int64.
+    """
+    lectures = [
+        {'IMPEGNO_ID': 1, 'GIORNO': '2024-09-16', 'NOTE': 'x', 'AULA': 'è'},
+        {'IMPEGNO_ID': 2, 'GIORNO': '2024-09-17', 'NOTE': None, 'AULA': None},
+        {'IMPEGNO_ID': 3, 'GIORNO': '2024-09-18', 'NOTE': '', 'AULA': 'A'},
+    ]
+    payload = json.dumps(lectures, ensure_ascii=False).encode('utf-8')
+
+    # Use 3 bytes chunks to split objects and multi-byte characters
+    result = read_json_columns(split_chunks(payload, 3), ['NOTE'])
+
+    expected = pd.DataFrame(lectures).drop(columns=['NOTE'])
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['IMPEGNO_ID'].dtype == 'int64'
+
+
+def test_read_json_columns_missing_fields():
+    """
+    Test that fields missing from some objects are padded with nulls.
+
+    Asserts:
+    Every column has one value per object.
+    """
+    payload = b'[{"A": 1}, {"B": "x"}, {"A": 2.5}]'
+
+    result = read_json_columns([payload])
+
+    assert len(result) == 3
+    assert pd.isna(result['A'][1]) and result['A'][2] == 2.5
+    assert pd.isna(result['B'][0]) and result['B'][1] == 'x'
+
+
+def test_iter_json_array_rejects_invalid_payload():
+    """
+    Test that payloads which are not arrays of objects are rejected.
+
+    Asserts:
+    A ValueError is raised for an object and for a truncated array.
+    """
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"error": "not found"}']))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[{"A": 1}, {"A"']))
@@ -8,7 +8,9 @@ pytest --cov=app --cov-report=html tests/
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from app.main import app
+import app.main as app_module
 import pytest
+import json
 import os
 import pandas as pd
 from datetime import datetime
@@ -79,6 +81,57 @@ def test_read_and_return_df():
             assert item[key] is not None and item[key] != ''
 
 
+def test_read_and_return_df_pages():
+    """
+    Test the pagination, the projection and the NDJSON output
+    of the endpoint "/df_show".
+
+    Asserts:
+    - The pages joined by their cursors are the whole list.
+    - The X-Total-Count header holds the number of lectures.
+    - Only the requested fields are returned.
+    - The NDJSON output holds one lecture per line.
+    - The pagination headers are exposed to cross-origin browsers.
+    - Unknown fields, empty lists of fields and malformed cursors are
+      rejected.
+    """
+    lectures = client.get("/df_show").json()
+
+    pages = []
+    params = {"limit": 1000}
+    while True:
+        response = client.get("/df_show", params=params)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == str(len(lectures))
+        pages.extend(response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = {"limit": 1000, "cursor": response.headers["X-Next-Cursor"]}
+    assert pages == lectures
+
+    response = client.get("/df_show", params={
+        "offset": 2, "limit": 3, "fields": "TEACHING,SITE"})
+    assert response.json() == [
+        {"TEACHING": lecture["TEACHING"], "SITE": lecture["SITE"]}
+        for lecture in lectures[2:5]]
+
+    response = client.get("/df_show", params={"format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == lectures
+
+    response = client.get("/df_show", params={"limit": 1}, headers={
+        "Origin": "http://localhost:8080"})
+    exposed = response.headers["Access-Control-Expose-Headers"]
+    assert "X-Next-Cursor" in exposed and "X-Total-Count" in exposed
+
+    assert client.get("/df_show", params={"fields": "NOPE"}).status_code \
+        == 400
+    assert client.get("/df_show", params={"fields": ","}).status_code \
+        == 400
+    assert client.get("/df_show", params={"cursor": "x"}).status_code == 400
+
+
 def test_csv_creation_date():
     """
     This function tests the endpoint "/csv_creation_date"
@@ -146,6 +199,25 @@ async def test_csv_creation_date_not_exists(monkeypatch):
     assert response.json() == {"detail": "File CSV not found"}
 
 
+def test_get_facets():
+    """
+    Test the endpoint "/facets" used to fill the filters of the calendar.
+
+    Asserts:
+    - The response status code is 200.
+    - The facets are the distinct values served by "/df_show".
+    """
+    response = client.get("/facets")
+    assert response.status_code == 200
+
+    facets = response.json()
+    lectures = client.get("/df_show").json()
+    for column in ['CYCLE', 'DEGREE_TYPE', 'SITE']:
+        assert facets[column] == sorted(
+            {lecture[column] for lecture in lectures} - {'null'})
+    assert 'creation_date' in facets
+
+
 def test_get_all_teachings():
     """
     Test the endpoint "/query/{location_str}/{degreetype_str}/{cycle_str}"
@@ -269,3 +341,146 @@ def test_get_teaching():
     # Check if the returned course data matches the expected course
     for key, value in choosen_teaching.items():
         assert value["TEACHING"] == test_teaching
+
+
+def test_build_stats():
+    """
+    Test the endpoint "/build_stats" to ensure it returns the reports
+    of the last builds and the memory used by the served snapshot.
+
+    Note:
+    - The saved reports are replaced by two fake reports.
+    - It asserts that the 'limit' parameter keeps the last reports.
+    """
+    reports = [{"status": "ok", "stages": []},
+               {"status": "failed", "stages": []}]
+    with patch("app.main.load_reports", return_value=reports):
+        response = client.get("/build_stats", params={"limit": 1})
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["builds"] == [{"status": "failed", "stages": []}]
+    assert "total_bytes" in stats["snapshot"]
+
+
+def test_get_ical():
+    """
+    Test the endpoint "/ical" exporting the lectures of some teachings.
+
+    Asserts:
+    - The response is a text/calendar feed with an ETag.
+    - It holds one event for every lecture of the teachings.
+    - A request with the ETag gets 304 Not Modified.
+    - Unknown teachings are answered with 404.
+    """
+    lectures = client.get("/df_show").json()
+    teachings = sorted({lecture["TEACHING"] for lecture in lectures})[:2]
+
+    response = client.get("/ical", params={"teaching": teachings})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert response.text.count("BEGIN:VEVENT") == sum(
+        lecture["TEACHING"] in teachings for lecture in lectures)
+
+    response = client.get("/ical", params={"teaching": teachings}, headers={
+        "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+    response = client.get("/ical", params={"teaching": "NOT A TEACHING"})
+    assert response.status_code == 404
+
+
+def test_get_timetable():
+    """
+    Test the endpoint "/timetable" returning the lectures of several
+    teachings at once.
+
+    Asserts:
+    - The lectures of the teachings asked by name and by AF_ID are
+      returned together, sorted by start time.
+    - A request without teachings is answered with 400.
+    """
+    lectures = client.get("/df_show").json()
+    first, second = lectures[0], lectures[-1]
+
+    response = client.get("/timetable", params={
+        "teaching": first["TEACHING"], "af_id": second["AF_ID"]})
+    assert response.status_code == 200
+    timetable = response.json()
+    assert timetable == sorted(
+        [lecture for lecture in lectures
+         if lecture["TEACHING"] == first["TEACHING"]
+         or lecture["AF_ID"] == second["AF_ID"]],
+        key=lambda lecture: lecture["START_ISO8601"])
+
+    assert client.get("/timetable").status_code == 400
+
+
+def test_get_teaching_time_range():
+    """
+    Test the start and end filters of the endpoint "/query/{final_teaching}".
+
+    Asserts:
+    - Only the lectures starting in the range are returned.
+    - An empty range, given with a UTC offset, returns an empty object.
+    """
+    lectures = client.get("/df_show").json()
+    teaching = lectures[0]["TEACHING"]
+    starts = sorted(lecture["START_ISO8601"] for lecture in lectures
+                    if lecture["TEACHING"] == teaching)
+    start, end = starts[0], starts[len(starts) // 2]
+
+    response = client.get(f"/query/{teaching}",
+                          params={"start": start, "end": end})
+    assert response.status_code == 200
+    assert sorted(lecture["START_ISO8601"]
+                  for lecture in response.json().values()) == [
+        lecture_start for lecture_start in starts
+        if start <= lecture_start < end]
+
+    response = client.get(f"/query/{teaching}", params={
+        "start": start + "+00:00", "end": start + "+00:00"})
+    assert response.json() == {}
+
+
+def test_search():
+    """
+    Test the endpoint "/search" used for the type-ahead of the teachings.
+
+    Asserts:
+    - A teaching is found first by its name in lower case.
+    - The number of matches is limited.
+    """
+    teaching = client.get("/df_show").json()[0]["TEACHING"]
+
+    response = client.get("/search", params={"q": teaching.lower()})
+    assert response.status_code == 200
+    matches = response.json()
+    assert matches[0]["value"] == teaching
+    assert matches[0]["score"] == 3.0
+    assert len(matches) <= 10
+
+    response = client.get("/search", params={"q": teaching, "limit": 1})
+    assert len(response.json()) == 1
+
+
+def test_get_teaching_brotli():
+    """
+    Test that "/query/{final_teaching}" is sent brotli compressed to
+    a client accepting it, once its variants are ready.
+
+    Asserts:
+    - The response has the br Content-Encoding and a Vary header.
+    - It decodes to the same body as the uncompressed response.
+    """
+    teaching = client.get("/df_show").json()[0]["TEACHING"]
+    identity = client.get(f"/query/{teaching}",
+                          headers={"Accept-Encoding": "identity"})
+    app_module.response_cache.join()
+
+    response = client.get(f"/query/{teaching}",
+                          headers={"Accept-Encoding": "br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    # The test client decodes the body with brotli
+    assert response.content == identity.content
@@ -0,0 +1,127 @@
+"""
+Test module of the refresh.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import os
+import threading
+from app.mymodules.refresh import (
+    RefreshScheduler, SnapshotWatcher, file_lock
+)
+
+
+def test_refresh_retries_then_publishes():
+    """
+    Test that a failed build is retried and the snapshot is published
+    once a build succeeds.
+
+    Asserts:
+    The build is called until it succeeds.
+    Only the successful snapshot is published.
+    """
+    attempts = []
+    published = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("sitows unavailable")
+        return "snapshot"
+
+    scheduler = RefreshScheduler(build, published.append, interval=60,
+                                 retries=3, backoff=0)
+
+    assert scheduler.refresh() is True
+    assert len(attempts) == 3
+    assert published == ["snapshot"]
+    assert scheduler.last_error is None
+
+
+def test_refresh_keeps_old_snapshot_on_failure():
+    """
+    Test that nothing is published when every attempt fails.
+
+    Asserts:
+    refresh returns False, nothing is published and the error is kept.
+    """
+    published = []
+
+    def build():
+        raise ConnectionError("sitows unavailable")
+
+    scheduler = RefreshScheduler(build, published.append, interval=60,
+                                 retries=1, backoff=0)
+
+    assert scheduler.refresh() is False
+    assert published == []
+    assert isinstance(scheduler.last_error, ConnectionError)
+
+
+def test_scheduler_runs_in_background():
+    """
+    Test that the scheduler builds snapshots on its own thread
+    and can be stopped.
+
+    Asserts:
+    A snapshot is published without calling refresh directly.
+    """
+    published = threading.Event()
+    scheduler = RefreshScheduler(lambda: "snapshot",
+                                 lambda snapshot: published.set(),
+                                 interval=60, jitter=5)
+
+    scheduler.start(initial_delay=0)
+    assert published.wait(timeout=5)
+    scheduler.stop(timeout=5)
+
+    # The jittered delay stays within the configured bounds
+    assert 55 <= scheduler.next_delay() <= 65
+
+
+def test_snapshot_watcher_reloads_replaced_file(tmp_path):
+    """
+    Test that the watcher reloads the snapshot only when the file
+    is replaced.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    An unchanged file is not reloaded, a swapped one is.
+    """
+    path = tmp_path / 'final.feather'
+    path.write_text('v1')
+    loads = []
+    watcher = SnapshotWatcher(str(path), lambda: loads.append(1))
+
+    assert watcher.check() is False
+
+    # Publish a new snapshot with an atomic swap
+    (tmp_path / 'final.feather.tmp').write_text('v2')
+    os.replace(tmp_path / 'final.feather.tmp', path)
+
+    assert watcher.check() is True
+    assert watcher.check() is False
+    assert len(loads) == 1
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    """
+    Test that only one holder at a time gets the build lock.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The second attempt fails while the lock is held,
+    and succeeds once it is released.
+    """
+    path = str(tmp_path / 'final.lock')
+    with file_lock(path) as first:
+        with file_lock(path) as second:
+            assert first is True
+            assert second is False
+    with file_lock(path) as third:
+        assert third is True
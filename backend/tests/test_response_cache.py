@@ -0,0 +1,118 @@
+"""
+Test module of the response_cache.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import brotli
+import gzip
+from app.mymodules import response_cache
+from app.mymodules.response_cache import (ResponseCache, choose_encoding,
+                                          compress)
+
+
+def test_least_recently_used_eviction():
+    """
+    Test that the cache stays within its bytes by evicting the least
+    recently used bodies.
+
+    Asserts:
+    A body read recently survives the eviction of an older one.
+    Bodies larger than max_entry_bytes are not cached.
+    Building happens only on a miss.
+    Clearing drops every body.
+    """
+    cache = ResponseCache(max_bytes=10, max_entry_bytes=6)
+    cache.put(('v1', '/query', 'a'), b'aaaa')
+    cache.put(('v1', '/query', 'b'), b'bbbb')
+    assert cache.get(('v1', '/query', 'a')) == {'identity': b'aaaa'}
+
+    cache.put(('v1', '/query', 'c'), b'cccc')
+    assert cache.get(('v1', '/query', 'b')) is None
+    assert cache.get(('v1', '/query', 'a')) == {'identity': b'aaaa'}
+    assert cache.size == 8
+    assert cache.stats()['evictions'] == 1
+
+    cache.put(('v1', '/query', 'd'), b'ddddddd')
+    assert cache.get(('v1', '/query', 'd')) is None
+
+    built = []
+    for _ in range(2):
+        variants = cache.get_or_build(('v2', '/query', 'a'),
+                                      lambda: built.append(1) or b'new')
+        assert variants == {'identity': b'new'}
+    assert built == [1]
+
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+    assert cache.size == 0
+
+
+def test_stream():
+    """
+    Test that a streamed body is cached once it has been sent whole.
+
+    Asserts:
+    The chunks are sent unchanged.
+    A body within max_entry_bytes is cached joined.
+    A larger body is streamed without being cached.
+    """
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=6)
+
+    assert list(cache.stream('small', [b'[1', b',2', b']'])) == [
+        b'[1', b',2', b']']
+    assert cache.get('small') == {'identity': b'[1,2]'}
+
+    assert list(cache.stream('large', [b'[1', b',2', b',3', b']'])) == [
+        b'[1', b',2', b',3', b']']
+    assert cache.get('large') is None
+
+
+def test_compressed_variants(monkeypatch):
+    """
+    Test the compressed variants of the cached bodies.
+
+    Parameters:
+    monkeypatch: The pytest fixture used to disable brotli.
+
+    Asserts:
+    Small bodies are kept uncompressed only.
+    Large bodies get a gzip variant decompressing to the body.
+    The variant is chosen by the Accept-Encoding header and its weights.
+    """
+    monkeypatch.setattr(response_cache, 'brotli', None)
+    assert compress(b'[]') == {'identity': b'[]'}
+
+    body = b'{"TEACHING":"LAB OF WEB TECHNOLOGIES"},' * 100
+    variants = compress(body)
+    assert set(variants) == {'identity', 'gzip'}
+    assert gzip.decompress(variants['gzip']) == body
+
+    assert choose_encoding(None, variants) == 'identity'
+    assert choose_encoding('gzip, deflate, br', variants) == 'gzip'
+    assert choose_encoding('gzip;q=0, deflate', variants) == 'identity'
+    assert choose_encoding('*', variants) == 'gzip'
+    assert choose_encoding('br;q=1.0, gzip;q=0.5',
+                           {'identity': body, 'gzip': b'', 'br': b''}) \
+        == 'br'
+
+
+def test_background_compression():
+    """
+    Test that the variants of a cached body are compressed in the
+    background, without delaying the request that built it.
+
+    Asserts:
+    put returns the identity body at once.
+    The gzip and brotli variants decompress to the body once ready.
+    """
+    cache = ResponseCache(max_bytes=1024 * 1024)
+    body = b'{"TEACHING":"LAB OF WEB TECHNOLOGIES"},' * 100
+
+    assert cache.put('key', body) == {'identity': body}
+    cache.join()
+    variants = cache.get('key')
+    assert gzip.decompress(variants['gzip']) == body
+    assert brotli.decompress(variants['br']) == body
+    assert cache.size == sum(len(variant) for variant in variants.values())
@@ -0,0 +1,80 @@
+"""
+Test module of the search.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import pandas as pd
+from app.mymodules.search import SearchIndex, fold
+
+
+def sample_index() -> SearchIndex:
+    """
+    Index a few teachings and lecturers.
+    """
+    return SearchIndex.from_frame(pd.DataFrame({
+        'TEACHING': ['ECONOMIA AZIENDALE', 'ECONOMETRICS', 'ECONOMETRICS',
+                     'DIRITTO PRIVATO', None],
+        'LECTURER_NAME': ['ROSSI MARIO', 'NICOLÒ BIANCHI', 'ROSSI MARIO',
+                          'VERDI ANNA', 'ROSSI MARIO'],
+    }))
+
+
+def test_fold():
+    """
+    Test the folding of the names compared by the search.
+
+    Asserts:
+    Accents, case and punctuation are ignored.
+    """
+    assert fold('  Nicolò  BIANCHI-Rossi ') == 'nicolo bianchi rossi'
+    assert fold('...') == ''
+
+
+def test_search_ranking():
+    """
+    Test the matches of the search and their order.
+
+    Asserts:
+    Exact names come before name prefixes, then word prefixes.
+    Lecturers lead to the sorted teachings they teach.
+    Accents and typos are tolerated.
+    Empty queries give no matches.
+    """
+    index = sample_index()
+
+    matches = index.search('Econometrics')
+    assert matches[0]['value'] == 'ECONOMETRICS'
+    assert matches[0]['score'] == 3.0
+
+    assert [match['value'] for match in index.search('econ')] == [
+        'ECONOMETRICS', 'ECONOMIA AZIENDALE']
+    assert [match['value'] for match in index.search('aziend')] == [
+        'ECONOMIA AZIENDALE']
+
+    rossi = index.search('rossi', limit=1)[0]
+    assert rossi['field'] == 'LECTURER_NAME'
+    assert rossi['teachings'] == ['ECONOMETRICS', 'ECONOMIA AZIENDALE']
+    assert index.search('nicolo')[0]['value'] == 'NICOLÒ BIANCHI'
+
+    assert index.search('diritto privto')[0]['value'] == 'DIRITTO PRIVATO'
+    assert index.search('') == []
+    assert SearchIndex.from_frame(pd.DataFrame()).search('econ') == []
+
+
+def test_search_short_words():
+    """
+    Test the queries with one letter words.
+
+    Asserts:
+    A one letter query gives no matches.
+    A one letter word narrows the matches of the other query words.
+    """
+    index = sample_index()
+
+    assert index.search('e') == []
+    assert [match['value'] for match in index.search('rossi m')] == [
+        'ROSSI MARIO']
+    assert [match['value'] for match in index.search('e azie')] == [
+        'ECONOMIA AZIENDALE']
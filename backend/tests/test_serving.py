@@ -0,0 +1,258 @@
+"""
+Test module of the serving.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.responses import JSONResponse
+from app.mymodules import serving
+from app.mymodules.serving import (ServingSnapshot, decode_cursor,
+                                   encode_cursor)
+from app.mymodules.snapshot import display_frame, read_snapshot, write_snapshot
+
+
+def sample_snapshot(tmp_path) -> pd.DataFrame:
+    """
+    Write and read back a small snapshot shaped like the output
+    of the pipeline.
+    """
+    path = str(tmp_path / 'final.feather')
+    write_snapshot(pd.DataFrame({
+        'AF_ID': [1031, 1129, 1031, 1200],
+        'TEACHING': ['LAB OF WEB TECHNOLOGIES', 'FUNDAMENTALS OF IT LAW',
+                     'LAB OF WEB TECHNOLOGIES', np.nan],
+        'CYCLE': ['Fall Semester (Sep-Jan)'] * 4,
+        'SITE': ['RONCADE', 'RONCADE', 'RONCADE', 'VENEZIA'],
+        'DEGREE_TYPE': ['Bachelor'] * 4,
+        'PARTITION': ['A-L', np.nan, np.nan, np.nan],
+        'LECTURE_DAY': ['2024-10-24', '2024-10-30', '2024-10-31',
+                        '2024-11-02'],
+        'LECTURE_START': ['09:45', '16:00', '09:45', '10:00'],
+        'START_ISO8601': ['2024-10-24T09:45:00', '2024-10-30T16:00:00',
+                          '2024-10-31T09:45:00', '2024-11-02T10:00:00'],
+    }), path)
+    return read_snapshot(path)
+
+
+def test_teaching_body_matches_filtered_response(tmp_path):
+    """
+    Test that the precomputed body of a teaching is the response
+    the endpoint used to build by filtering the whole snapshot.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    Every teaching body is byte for byte the former JSONResponse body.
+    The lectures keep their row labels and their order.
+    Unknown teachings give an empty JSON object.
+    """
+    snapshot = sample_snapshot(tmp_path)
+    serving = ServingSnapshot(snapshot)
+
+    for teaching in ['LAB OF WEB TECHNOLOGIES', 'FUNDAMENTALS OF IT LAW']:
+        filtered = display_frame(
+            snapshot[snapshot['TEACHING'] == teaching]).fillna("null")
+        expected = JSONResponse(
+            content=filtered.to_dict(orient='index')).body
+        assert serving.teaching_body(teaching) == expected
+
+    lectures = json.loads(serving.teaching_body('LAB OF WEB TECHNOLOGIES'))
+    assert list(lectures) == ['0', '2']
+    assert lectures['2']['PARTITION'] == 'null'
+    assert serving.teaching_body('UNKNOWN') == b'{}'
+
+
+def test_empty_snapshot():
+    """
+    Test that a worker without a published snapshot serves empty answers.
+
+    Asserts:
+    Every teaching gives an empty JSON object.
+    """
+    serving = ServingSnapshot(pd.DataFrame())
+
+    assert serving.teaching_body('LAB OF WEB TECHNOLOGIES') == b'{}'
+
+
+def test_facet_body_lists_sorted_teachings(tmp_path):
+    """
+    Test that the precomputed body of a combination of site,
+    degree type and cycle is the JSON string the endpoint always sent.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The unique teachings are sorted and listed once.
+    Missing teachings are listed as 'null'.
+    Combinations without teachings give an empty object.
+    """
+    serving = ServingSnapshot(sample_snapshot(tmp_path))
+    fall = 'Fall Semester (Sep-Jan)'
+
+    body = serving.facet_body('RONCADE', 'Bachelor', fall)
+    assert json.loads(json.loads(body)) == {
+        'FUNDAMENTALS OF IT LAW': 'FUNDAMENTALS OF IT LAW',
+        'LAB OF WEB TECHNOLOGIES': 'LAB OF WEB TECHNOLOGIES'}
+    assert list(json.loads(json.loads(body))) == [
+        'FUNDAMENTALS OF IT LAW', 'LAB OF WEB TECHNOLOGIES']
+    assert json.loads(serving.facet_body('VENEZIA', 'Bachelor', fall)) == (
+        '{"null": "null"}')
+    assert json.loads(serving.facet_body('RONCADE', 'Master', fall)) == '{}'
+
+
+def test_facets(tmp_path):
+    """
+    Test the facets answered by /facets.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    Every facet lists its distinct values once, sorted.
+    The creation date of the snapshot is included.
+    An empty snapshot gives empty facets.
+    """
+    serving = ServingSnapshot(sample_snapshot(tmp_path),
+                              'Friday, 24-May-2024 10:00:00 CEST')
+
+    assert json.loads(serving.facets_body) == {
+        'CYCLE': ['Fall Semester (Sep-Jan)'],
+        'DEGREE_TYPE': ['Bachelor'],
+        'SITE': ['RONCADE', 'VENEZIA'],
+        'creation_date': 'Friday, 24-May-2024 10:00:00 CEST'}
+    assert ServingSnapshot(pd.DataFrame()).facets == {
+        'CYCLE': [], 'DEGREE_TYPE': [], 'SITE': [], 'creation_date': None}
+
+
+def test_chunks_match_full_response(tmp_path, monkeypatch):
+    """
+    Test that the lectures serialized a chunk at a time are the
+    response /df_show used to build in one go.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+    monkeypatch: The pytest fixture used to shrink the chunks.
+
+    Asserts:
+    The JSON chunks are byte for byte the former JSONResponse body.
+    The NDJSON lines hold the same lectures, one per line.
+    The projected fields are returned in the requested order.
+    An empty range gives an empty list.
+    """
+    monkeypatch.setattr(serving, 'CHUNK_ROWS', 3)
+    snapshot = sample_snapshot(tmp_path)
+    snapshot_serving = ServingSnapshot(snapshot)
+    records = display_frame(snapshot).fillna("null").to_dict(
+        orient='records')
+
+    body = b''.join(snapshot_serving.json_chunks(0, 4))
+    assert body == JSONResponse(content=records).body
+
+    lines = b''.join(snapshot_serving.ndjson_chunks(1, 4)).splitlines()
+    assert [json.loads(line) for line in lines] == records[1:4]
+
+    projected = b''.join(snapshot_serving.json_chunks(
+        2, 4, ['TEACHING', 'AF_ID']))
+    assert json.loads(projected) == [
+        {'TEACHING': 'LAB OF WEB TECHNOLOGIES', 'AF_ID': 1031},
+        {'TEACHING': 'null', 'AF_ID': 1200}]
+    assert b''.join(snapshot_serving.json_chunks(4, 4)) == b'[]'
+
+
+def test_cursor_round_trip():
+    """
+    Test the cursors of the pages of /df_show.
+
+    Asserts:
+    A cursor decodes to its snapshot version and offset.
+    A malformed cursor raises a ValueError.
+    """
+    assert decode_cursor(encode_cursor('18df-626f2', 5000)) == (
+        '18df-626f2', 5000)
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+def test_timetable_body(tmp_path):
+    """
+    Test the lectures of several teachings asked by name and by AF_ID.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The lectures of all the teachings are returned once, by start time.
+    Unknown teachings and AF_IDs are ignored.
+    """
+    serving = ServingSnapshot(sample_snapshot(tmp_path))
+
+    lectures = json.loads(serving.timetable_body(
+        ['FUNDAMENTALS OF IT LAW', 'UNKNOWN'], [1031, 1129, 9999]))
+    assert [(lecture['AF_ID'], lecture['LECTURE_DAY'])
+            for lecture in lectures] == [
+        (1031, '2024-10-24'), (1129, '2024-10-30'), (1031, '2024-10-31')]
+    assert serving.timetable_body(['UNKNOWN']) == b'[]'
+
+
+def test_time_ranges(tmp_path):
+    """
+    Test the lectures of a teaching found in a range of start times.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The range includes its start and excludes its end.
+    The lectures of a teaching by AF_ID and by name are the same.
+    An empty range gives no lectures.
+    """
+    serving = ServingSnapshot(sample_snapshot(tmp_path))
+    start = np.datetime64('2024-10-24T09:45')
+    end = np.datetime64('2024-10-31T09:45')
+
+    assert list(serving.teaching_index.positions(
+        'LAB OF WEB TECHNOLOGIES', start, end)) == [0]
+    assert list(serving.af_id_index.positions(1031, start)) == [0, 2]
+    assert list(json.loads(serving.teaching_body(
+        'LAB OF WEB TECHNOLOGIES', end=end))) == ['0']
+    assert serving.teaching_body('LAB OF WEB TECHNOLOGIES', end, start) \
+        == b'{}'
+    assert serving.teaching_index.positions('UNKNOWN') is None
+
+    lectures = json.loads(serving.timetable_body(
+        [], [1031, 1129], start=np.datetime64('2024-10-25'), limit=1))
+    assert [lecture['LECTURE_DAY'] for lecture in lectures] == [
+        '2024-10-30']
+
+
+def test_hidden_columns(tmp_path):
+    """
+    Test that the IMPEGNO_ID kept in the snapshot is not served.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The lectures of /df_show, /query/{final_teaching} and /timetable
+    hold every column but IMPEGNO_ID.
+    """
+    snapshot = sample_snapshot(tmp_path)
+    keyed = snapshot.assign(IMPEGNO_ID=np.arange(
+        7000000, 7000000 + len(snapshot), dtype='int32'))
+    serving = ServingSnapshot(keyed)
+    columns = list(snapshot.columns)
+
+    assert serving.columns == columns
+    records = json.loads(b''.join(serving.json_chunks(0, len(keyed))))
+    assert [list(record) for record in records] == [columns] * len(keyed)
+    lectures = json.loads(serving.teaching_body('LAB OF WEB TECHNOLOGIES'))
+    assert all(list(lecture) == columns for lecture in lectures.values())
+    lectures = json.loads(serving.timetable_body(['FUNDAMENTALS OF IT LAW']))
+    assert [list(lecture) for lecture in lectures] == [columns]
@@ -0,0 +1,127 @@
+"""
+Test module of the snapshot.py module.
+
+Execute this test by running on the terminal (from the app/) the command:
+pytest --cov=app --cov-report=html tests/
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from app.mymodules.serving import encode_json
+from app.mymodules.snapshot import (
+    write_snapshot, read_snapshot, display_frame, memory_report
+)
+
+
+def sample_dataframe() -> pd.DataFrame:
+    """
+    Build a small DataFrame shaped like the output of the pipeline.
+    """
+    return pd.DataFrame({
+        'AF_ID': [1031, 1031, 1129],
+        'TEACHING': ['LAB OF WEB TECHNOLOGIES'] * 2
+        + ['FUNDAMENTALS OF IT LAW'],
+        'PARTITION': ['A-L', np.nan, np.nan],
+        'CREDITS': [6, 6, 12],
+        'LECTURE_DAY': ['2024-10-24', '2024-10-31', '2024-11-22'],
+        'LECTURE_START': ['09:45', '09:45', '16:00'],
+        'DOCENTE_ID': [90080.0, 90080.0, -1.0],
+        'START_ISO8601': ['2024-10-24T09:45:00', '2024-10-31T09:45:00',
+                          '2024-11-22T16:00:00'],
+    })
+
+
+def test_snapshot_round_trip(tmp_path):
+    """
+    Test that a snapshot is read back with its explicit schema.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    Strings are categoricals, IDs are int32, credits are int16, days
+    are epoch days, times are minutes of the day and ISO timestamps are
+    datetimes.
+    """
+    path = str(tmp_path / 'final.feather')
+    write_snapshot(sample_dataframe(), path)
+
+    snapshot = read_snapshot(path)
+
+    assert isinstance(snapshot['TEACHING'].dtype, pd.CategoricalDtype)
+    assert snapshot['DOCENTE_ID'].dtype == 'int32'
+    assert snapshot['CREDITS'].dtype == 'int16'
+    assert list(snapshot['LECTURE_DAY']) == [20020, 20027, 20049]
+    assert list(snapshot['LECTURE_START']) == [585, 585, 960]
+    assert snapshot['LECTURE_START'].dtype == 'int16'
+    assert snapshot['START_ISO8601'].dtype == 'datetime64[ns]'
+
+
+def test_display_frame_restores_values(tmp_path):
+    """
+    Test that display_frame gives back the values of the pipeline,
+    so that the API responses do not change.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The displayed records match the original ones.
+    """
+    path = str(tmp_path / 'final.feather')
+    write_snapshot(sample_dataframe(), path)
+
+    records = display_frame(read_snapshot(path)).fillna('null')
+
+    expected = sample_dataframe().fillna('null')
+    expected['DOCENTE_ID'] = expected['DOCENTE_ID'].astype('int64')
+    assert records.to_dict(orient='records') == \
+        expected.to_dict(orient='records')
+
+
+def test_memory_report(tmp_path):
+    """
+    Test the memory report of a snapshot.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    The report covers every column and the bytes per lecture.
+    """
+    snapshot = write_snapshot(sample_dataframe(),
+                              str(tmp_path / 'final.feather'))
+
+    report = memory_report(snapshot)
+
+    assert report['rows'] == 3
+    assert set(report['columns']) == set(snapshot.columns)
+    assert report['total_bytes'] == sum(report['columns'].values())
+    assert report['bytes_per_lecture'] == round(report['total_bytes'] / 3, 2)
+
+
+def test_snapshot_missing_integers(tmp_path):
+    """
+    Test that missing values of the integer columns do not stop the
+    snapshot from being written.
+
+    Parameters:
+    tmp_path: The pytest temporary directory.
+
+    Asserts:
+    A column with missing values is stored as a nullable integer.
+    The missing values are displayed as 'null', like the CSV ones were.
+    """
+    dataframe = sample_dataframe().assign(CREDITS=[6, np.nan, 12])
+    path = str(tmp_path / 'final.feather')
+    write_snapshot(dataframe, path)
+
+    snapshot = read_snapshot(path)
+
+    assert snapshot['CREDITS'].dtype == 'Int16'
+    assert snapshot['AF_ID'].dtype == 'int32'
+    records = display_frame(snapshot).fillna('null')
+    assert records['CREDITS'].tolist() == [6, 'null', 12]
+    assert json.loads(encode_json(records.to_dict(orient='records')))[1][
+        'CREDITS'] == 'null'
@@ -133,18 +133,14 @@ def calendar():
     form_lectures = QueryLectures()
     error_message = None
 
-    # Fetch the creation date of the CSV file from the backend
-    creation_csv = f'{FASTAPI_BACKEND_HOST}/csv_creation_date'
-    response_creation_csv = requests.get(creation_csv)
-    datatime_creation_csv = response_creation_csv.json()
-    datatime_csv.datatime = datatime_creation_csv
-
-    # Fetch data from the backend and update form choices
-    url_csv = f'{FASTAPI_BACKEND_HOST}/df_show'
-    response_csv = requests.get(url_csv)
-
-    if response_csv.status_code == 200:
-        data = response_csv.json()
+    # Fetch the filter values and the creation date of the calendar
+    # from the backend and update form choices
+    url_facets = f'{FASTAPI_BACKEND_HOST}/facets'
+    response_facets = requests.get(url_facets)
+
+    if response_facets.status_code == 200:
+        data = response_facets.json()
+        datatime_csv.datatime = data['creation_date']
         form.cycle.choices = get_unique_values(data, 'CYCLE')
         form.degreetype.choices = get_unique_values(data, 'DEGREE_TYPE')
         form.location.choices = get_unique_values(data, 'SITE')
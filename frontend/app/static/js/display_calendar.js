@@ -45,9 +45,9 @@ document.addEventListener('DOMContentLoaded', function() {
         // Retrieve form values and encode them for URL usage
         var final_teaching = encodeURIComponent(document.querySelector('[name="teaching"]').value);
         // Construct the URL with proper encoding
-        var url = `http://localhost:8081/query/${final_teaching}`;
-        // Fetch data from the server
-        fetch(url)
+        var url = `http://localhost:8081/timetable?teaching=${final_teaching}`;
+        // Fetch the first lecture from the server, to open the calendar on its week
+        fetch(`${url}&limit=1`)
            .then(response => {
                 if (!response.ok) {
                     throw new Error('Network response was not ok ', response.statusText);
@@ -55,16 +55,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json();
             })
            .then(data => {
-                console.log(data);
                 var errorMessageEl = document.getElementById('error-message');
-                if (data && Object.keys(data).length > 0) {
+                if (data && data.length > 0) {
                     errorMessageEl.textContent = ''; // Clear any previous error messages
-                    var events = [];
-                    for (var key in data) {
-                        if (data.hasOwnProperty(key)) {
-                            var lesson = data[key];
+                    calendar.removeAllEventSources(); // Clear existing events
+                    // Fetch only the lectures of the visible week: the calendar
+                    // adds its start and end to the URL every time the week changes
+                    calendar.addEventSource({
+                        url: url,
+                        eventDataTransform: function(lesson) {
                             // Create an event object for each lesson
-                            events.push({
+                            return {
                                 title: lesson.TEACHING,
                                 start: lesson.START_ISO8601,
                                 end: lesson.END_ISO8601,
@@ -78,18 +79,11 @@ document.addEventListener('DOMContentLoaded', function() {
                                     end_time: lesson.LECTURE_END,
                                     credits: lesson.CREDITS,
                                 }
-                            });
+                            };
                         }
-                    }
-                    calendar.removeAllEvents(); // Clear existing events
-                    calendar.addEventSource(events); // Add new data
-                    // Find the earliest event date and move the calendar to that date
-                    var earliestEvent = events.reduce((earliest, event) => {
-                        return!earliest || new Date(event.start) < new Date(earliest.start)? event : earliest;
-                    }, null);
-                    if (earliestEvent) {
-                        calendar.gotoDate(new Date(earliestEvent.start));
-                    }
+                    });
+                    // Move the calendar to the earliest lecture
+                    calendar.gotoDate(new Date(data[0].START_ISO8601));
                     // Render the calendar after setting the container height
                     calendar.render();
                 }